@@ -0,0 +1,9 @@
+"""
+benchmarks
+
+Timing suite for the command path and the parsers. Run it with:
+    python -m benchmarks [--quick] [--filter NAME] [--output results.json] [--compare baseline.json]
+
+Network benchmarks run against `utils.mock_server.MockRconServer` on localhost, so they measure PalConnect's own
+overhead (framing, pooling, the cross-thread hop to `rcon_loop`) rather than a real server's.
+"""
@@ -0,0 +1,100 @@
+"""
+Runs the benchmark suite and writes the results as JSON.
+
+    python -m benchmarks                                  # Everything, results to stdout
+    python -m benchmarks --quick --filter players         # Fewer samples, only matching cases
+    python -m benchmarks --output new.json --compare old.json
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+
+from utils.transcript import transcript
+from utils.history import history
+from utils.scheduler import command_scheduler
+from utils.connection_pool import connection_pool
+from utils.event_loop import rcon_loop
+from benchmarks.harness import CASES, compare
+import benchmarks.cases  # Registers the cases
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="PalConnect benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="Take fewer samples, for a fast sanity check")
+    parser.add_argument("--filter", action="append", default=[], help="Only cases whose name contains this")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="Report the change in median time against an earlier results file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown reported as a regression by --compare (default 0.1)")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    return parser
+
+
+def revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_cases(options, names: list) -> dict:
+    results = {}
+    for name in names:
+        print(f"{name} ...", file=sys.stderr, end=" ", flush=True)
+        results[name] = await CASES[name](options)
+        print(f"{results[name]['median'] * 1e6:.1f} us/op", file=sys.stderr)
+    return results
+
+
+def main(argv: list = None) -> int:
+    options = build_parser().parse_args(argv)
+    names = [name for name in CASES if not options.filter or any(part in name for part in options.filter)]
+    if options.list:
+        print("\n".join(names))
+        return 0
+
+    transcript.enabled = False  # Benchmarks should neither pay for nor pollute the session transcript
+    history.enabled = False  # ...nor fill the session history with mock server players
+    command_scheduler.rate = 0  # Time the client, not the rate limit meant to protect a real server
+    try:
+        results = asyncio.run(run_cases(options, names))
+    finally:
+        if rcon_loop.running:
+            rcon_loop.run(connection_pool.close(), timeout=2)
+            rcon_loop.stop()
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": revision(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "quick": options.quick
+        },
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as baseline_file:
+            rows = compare(json.load(baseline_file), report, options.threshold)
+        for name, before, after, ratio, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:40} {before * 1e6:12.1f} -> {after * 1e6:12.1f} us/op  x{ratio:.2f}{flag}", file=sys.stderr)
+        return 1 if any(row[4] for row in rows) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
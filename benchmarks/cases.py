@@ -0,0 +1,242 @@
+"""
+cases
+
+The benchmark cases. Names are "<area>.<what>[<size>]" and stay stable between versions so that result files
+can be compared.
+
+- command.*: `async_send_command` and `async_send_batch` against a local mock server, serial and concurrent,
+  with the response cache bypassed unless the name says otherwise.
+- players.*: `get_player_list` end to end, and with the response served from the response cache (no request is
+  sent) at 32, 1k and 100k rows. players.parser* time the ShowPlayers parser on its own: whole responses, responses
+  where every fifth name contains a comma, and a response fed in 4 KiB pieces.
+- broadcast.*: `format_message`, splitting into packets (`broadcast_packets`) and command validation (`registry.packets`, which replaced `sanitize_input` but
+  keeps its case name) on long broadcasts.
+- roster.*: the diffing done by `refresh_online_players` - `Roster.update` plus building the list mapping that
+  `sync_player_list` hands to the player list widget.
+"""
+import time
+import asyncio
+from contextlib import contextmanager, asynccontextmanager
+
+from utils.application_utilities import async_send_command, async_send_batch, get_player_list, format_message
+from utils.commands import registry
+from utils.button_functions import player_label
+from utils.connection_pool import connection_pool
+from utils.event_loop import rcon_loop
+from utils.mock_server import MockRconServer, make_players
+from utils.players import PlayerListParser, parse_players
+from utils.broadcast import broadcast_packets
+from utils.response_cache import response_cache
+from utils.roster import Roster, player_key
+from benchmarks.harness import case, timed, timed_async, summarise
+
+__all__ = ()
+
+
+PLAYER_COUNTS = (32, 1000, 100_000)
+BROADCAST_LENGTHS = (200, 2000, 20_000)
+CONCURRENCY = 64
+
+
+def scaled(options, full: int, quick: int) -> int:
+    return quick if options.quick else full
+
+
+@contextmanager
+def uncached():
+    """ Send every request to the server for the duration, whatever `config.cache_ttls` says """
+    ttls, response_cache.ttls = response_cache.ttls, {}
+    try:
+        yield
+    finally:
+        response_cache.ttls = ttls
+
+
+@asynccontextmanager
+async def mock_server(**settings):
+    async with MockRconServer(**settings) as server:
+        try:
+            yield server
+        finally:
+            await rcon_loop.call(connection_pool.close(server.credentials))
+
+
+def broadcast_text(length: int) -> str:
+    words = ("Server", "restarting", "for", "the", "weekly", "update,", "please", "log", "off", "now!")
+    text, i = [], 0
+    while sum(map(len, text)) + len(text) < length:
+        text.append(words[i % len(words)])
+        i += 1
+    return " ".join(text)[:length]
+
+
+# - Command path
+
+@case("command.serial")
+async def command_serial(options):
+    async with mock_server() as server:
+        with uncached():
+            await async_send_command(server.credentials, "Info")  # Connect and authenticate outside the timing
+            return await timed_async(lambda: async_send_command(server.credentials, "Info"),
+                                     number=1, repeat=scaled(options, 500, 50))
+
+
+@case("command.serial_cached")
+async def command_serial_cached(options):
+    async with mock_server() as server:
+        await async_send_command(server.credentials, "Info")
+        return await timed_async(lambda: async_send_command(server.credentials, "Info"),
+                                 number=1, repeat=scaled(options, 500, 50))
+
+
+@case("command.concurrent")
+async def command_concurrent(options):
+    """ CONCURRENCY requests in flight at once; per-operation time is the wall time divided between them """
+    async with mock_server() as server:
+        with uncached():
+            await async_send_command(server.credentials, "Info")
+            samples = []
+            for _ in range(scaled(options, 30, 5)):
+                start = time.perf_counter()
+                await asyncio.gather(*(async_send_command(server.credentials, "Info") for _ in range(CONCURRENCY)))
+                samples.append((time.perf_counter() - start) / CONCURRENCY)
+            return summarise(samples, len(samples) * CONCURRENCY, concurrency=CONCURRENCY)
+
+
+@case("command.batch")
+async def command_batch(options):
+    """ CONCURRENCY commands pipelined over one connection with `async_send_batch` """
+    async with mock_server() as server:
+        commands = [("Info", ())] * CONCURRENCY
+        await async_send_batch(server.credentials, commands)
+        samples = []
+        for _ in range(scaled(options, 30, 5)):
+            start = time.perf_counter()
+            await async_send_batch(server.credentials, commands)
+            samples.append((time.perf_counter() - start) / CONCURRENCY)
+        return summarise(samples, len(samples) * CONCURRENCY, batch=CONCURRENCY)
+
+
+@case("command.connect")
+async def command_connect(options):
+    """ First request to a server: TCP connect, authentication and the command itself """
+    async with mock_server() as server:
+        async def cold_request():
+            await rcon_loop.call(connection_pool.close(server.credentials))
+            await async_send_command(server.credentials, "Info")
+
+        with uncached():
+            return await timed_async(cold_request, number=1, repeat=scaled(options, 200, 20))
+
+
+# - Player list
+
+@case("players.get_player_list")
+async def players_end_to_end(options):
+    async with mock_server(players=32) as server:
+        with uncached():
+            await get_player_list(server.credentials)
+            return await timed_async(lambda: get_player_list(server.credentials),
+                                     number=1, repeat=scaled(options, 500, 50), rows=32)
+
+
+async def players_parse(options, rows: int) -> dict:
+    credentials = {"ipaddr": "127.0.0.1", "port": 0, "password": "benchmark"}
+    response = MockRconServer(players=rows).respond("ShowPlayers")
+
+    async def serve():
+        return response
+
+    ttls, response_cache.ttls = response_cache.ttls, {**response_cache.ttls, "ShowPlayers": float("inf")}
+    try:
+        await rcon_loop.call(response_cache.fetch(connection_pool.key(credentials), "ShowPlayers", (), serve))
+        number = max(1, 32_000 // rows) if not options.quick else 1
+        return await timed_async(lambda: get_player_list(credentials), number=number,
+                                 repeat=scaled(options, 20, 3), rows=rows, bytes=len(response))
+    finally:
+        response_cache.ttls = ttls
+        await rcon_loop.call(invalidate(connection_pool.key(credentials)))
+
+
+async def invalidate(server: tuple):
+    response_cache.invalidate(server)
+
+
+for _rows in PLAYER_COUNTS:
+    case(f"players.parse[{_rows}]")(lambda options, rows=_rows: players_parse(options, rows))
+
+
+async def players_parser(options, rows: int, comma_names: bool = False) -> dict:
+    response = MockRconServer(players=rows, comma_names=comma_names).respond("ShowPlayers")
+    return timed(lambda: parse_players(response), number=max(1, 32_000 // rows),
+                 repeat=scaled(options, 20, 3), rows=rows, bytes=len(response))
+
+
+async def players_parser_stream(options, rows: int) -> dict:
+    response = MockRconServer(players=rows).respond("ShowPlayers")
+    chunks = [response[start:start + 4096] for start in range(0, len(response), 4096)]
+
+    def parse():
+        parser = PlayerListParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+
+    return timed(parse, number=max(1, 32_000 // rows), repeat=scaled(options, 20, 3), rows=rows, chunk=4096)
+
+
+for _rows in PLAYER_COUNTS:
+    case(f"players.parser[{_rows}]")(lambda options, rows=_rows: players_parser(options, rows))
+case("players.parser_commas[100000]")(lambda options: players_parser(options, 100_000, comma_names=True))
+case("players.parser_stream[100000]")(lambda options: players_parser_stream(options, 100_000))
+
+
+# - Broadcasts
+
+async def broadcast_format(options, length: int) -> dict:
+    message = broadcast_text(length)
+    return timed(lambda: format_message(message, max_length=40, ret="\n"), number=max(1, 200_000 // length),
+                 repeat=scaled(options, 20, 3), length=length)
+
+
+async def broadcast_split(options, length: int) -> dict:
+    message = broadcast_text(length)
+    return timed(lambda: broadcast_packets(message), number=max(1, 200_000 // length),
+                 repeat=scaled(options, 20, 3), length=length)
+
+
+async def broadcast_sanitize(options, length: int) -> dict:
+    message = broadcast_text(length)
+    return timed(lambda: registry.packets("Broadcast", (message,)), number=max(1, 200_000 // length),
+                 repeat=scaled(options, 20, 3), length=length)
+
+
+for _length in BROADCAST_LENGTHS:
+    case(f"broadcast.format_message[{_length}]")(lambda options, length=_length: broadcast_format(options, length))
+    case(f"broadcast.packets[{_length}]")(lambda options, length=_length: broadcast_split(options, length))
+    case(f"broadcast.sanitize_input[{_length}]")(lambda options, length=_length: broadcast_sanitize(options, length))
+
+
+# - Roster diffing
+
+async def roster_refresh(options, rows: int) -> dict:
+    """ Alternate between two snapshots that differ by ~5% joins, leaves and renames """
+    players = make_players(rows + rows // 20, seed=1)
+    first = players[:rows]
+    second = players[rows // 20:]
+    second = [player._replace(name=f"{player.name}*") if i % 20 == 0 else player for i, player in enumerate(second)]
+    snapshots = (first, second)
+
+    roster, turn = Roster(), [0]
+    roster.update(first)
+
+    def refresh():
+        turn[0] ^= 1
+        if roster.update(snapshots[turn[0]]):
+            {player_key(player): player_label(player) for player in roster}  # What sync_player_list builds
+
+    return timed(refresh, number=max(1, 32_000 // rows), repeat=scaled(options, 20, 3), rows=rows)
+
+
+for _rows in PLAYER_COUNTS:
+    case(f"roster.refresh[{_rows}]")(lambda options, rows=_rows: roster_refresh(options, rows))
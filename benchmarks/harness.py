@@ -0,0 +1,98 @@
+"""
+harness
+
+Registers benchmark cases, times them, and turns the samples into comparable statistics.
+
+Every sample is the time per operation of one timed run, in seconds. A case reports its samples through `timed`
+(synchronous code) or `timed_async` (coroutines), and its result is a flat dict that serialises straight to JSON.
+"""
+import time
+import statistics
+
+__all__ = (
+    "CASES",
+    "case",
+    "timed",
+    "timed_async",
+    "summarise",
+    "compare"
+)
+
+
+CASES = {}  # name -> coroutine function taking the options namespace
+
+
+def case(name: str):
+    """ Register a coroutine function as the benchmark called `name` """
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+
+def summarise(samples: list, operations: int, **extra) -> dict:
+    """Statistics for a list of per-operation timings.
+
+    Args:
+        samples: (list): Seconds per operation, one entry per timed run.
+        operations: (int): Total operations timed across all samples.
+        extra: Case-specific fields to include, e.g. row counts.
+    """
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    result = {
+        "unit": "s/op",
+        "samples": len(ordered),
+        "operations": operations,
+        "min": ordered[0],
+        "median": median,
+        "mean": statistics.fmean(ordered),
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "ops_per_sec": 1 / median if median else None
+    }
+    result.update(extra)
+    return result
+
+
+def timed(func, number: int, repeat: int, **extra) -> dict:
+    """ Time `repeat` runs of `number` calls to `func()` """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return summarise(samples, number * repeat, **extra)
+
+
+async def timed_async(func, number: int, repeat: int, **extra) -> dict:
+    """ Time `repeat` runs of `number` sequential awaits of `func()` """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        samples.append((time.perf_counter() - start) / number)
+    return summarise(samples, number * repeat, **extra)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> list:
+    """Compare two result files by median time per operation.
+
+    Args:
+        baseline: (dict): Results loaded from an earlier run.
+        current: (dict): Results of this run.
+        threshold: (float): Relative slowdown beyond which a case counts as a regression.
+
+    Returns:
+        list: (name, baseline median, current median, ratio, regressed) for each case present in both.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before or 'median' not in before or 'median' not in result:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float("inf")
+        rows.append((name, before['median'], result['median'], ratio, ratio > 1 + threshold))
+    return rows
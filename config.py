@@ -1,5 +1,4 @@
 import os
-import shutil
 
 
 ### - URLs and Links
@@ -14,6 +13,9 @@ default_textbox_text = f"""
 
 welcome_text = "Welcome Text"  # Changed when server checks for connection
 
+console_max_lines = 1000  # Lines kept in the console before the oldest spill to an on-disk backlog
+console_backlog_chunk = 200  # Lines loaded back from the backlog each time the console is scrolled to the top
+
 # Key: Value must be a combined length of less than 95 characters to fit on screen
 valid_commands = {
     "Broadcast": "{MessageText}	Send message to all player in the server.",
@@ -26,13 +28,117 @@ valid_commands = {
     "TeleportToMe": "{SteamID}	Target player teleport to your current location",
     "ShowPlayers": "Show information on all connected players.",
     "Save": "Save the world data.",
+    "Tasks": "List the scheduled tasks. Manage them with: python -m palconnect tasks",
+    "Bans": "List the local ban list. Manage it with: python -m palconnect bans",
+    "SyncBans": "Send the target servers every ban on the local ban list they are missing",
     "Help": "Serve this page"
 }
 
+### - RCON Connection Options
+rcon_timeout = 10  # Seconds to wait on the server before a request is considered timed out
+rcon_idle_timeout = 120  # Seconds a pooled connection may sit unused before it is closed
+rcon_pool_size = 4  # Maximum number of idle connections kept open per server
+
+
+# Read-only commands whose responses are reused for this many seconds
+cache_ttls = {
+    "Info": 60,
+    "ShowPlayers": 3
+}
+# Commands that change the server, and the cached responses they make stale
+cache_invalidated_by = {
+    "KickPlayer": ("ShowPlayers",),
+    "BanPlayer": ("ShowPlayers",),
+    "Shutdown": ("Info", "ShowPlayers"),
+    "DoExit": ("Info", "ShowPlayers")
+}
+
+
+### - Player List Options
+player_poll_interval = 30  # Seconds between player list refreshes while nobody is joining or leaving
+player_poll_min_interval = 5  # Seconds until the next refresh after players joined or left
+player_poll_max_interval = 120  # Longest gap between refreshes while the server is idle or unreachable
+player_poll_backoff = 1.5  # How quickly refreshes slow down while nothing changes
+player_poll_jitter = 0.1  # Randomly spread each delay by this fraction
+
+
+### - Scheduler Options
+# Commands are queued per server by priority - console, then moderation, then player list polls - and rate limited
+scheduler_rate = 10  # Commands per second sent to one server once its burst is used up
+scheduler_burst = 20  # Commands sent to one server without waiting after a quiet spell
+scheduler_max_queue = 64  # Commands waiting per server before polls are dropped and new commands refused
+scheduler_concurrency = 2  # Commands in flight to one server at once
+
+
+### - Moderation Options
+moderation_max_concurrency = 8  # Kick or Ban commands in flight to one server at once, past scheduler_concurrency
+bans_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "bans.json")  # PalConnect's own ban list
+bans_save_delay = 1.0  # Seconds bans applied by BanPlayer are gathered before the ban list is saved
+bans_enforce = True  # Kick players on the ban list as soon as a player list refresh shows them online
+
+
+### - Scheduled Task Options
+# Saves, restarts and announcements PalConnect runs by itself. Manage them with `python -m palconnect tasks`
+tasks_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "tasks.json")
+tasks_restart_warnings = (600, 300, 60, 30)  # Seconds before a restart to broadcast a countdown
+tasks_shutdown_seconds = 10  # Seconds the server waits after the Shutdown command before it stops
+tasks_restart_message = "Server restarting"  # Shown with the countdown when a restart task has no message
+tasks_check_interval = 60  # Seconds between checks for changes made to the tasks file by someone else
+
+
+### - Broadcast Options
+# Palworld's chat box fits about 40 characters per line and cuts long messages short, so longer Broadcasts are
+# wrapped and sent as several packets
+broadcast_line_length = 40  # Characters per chat line
+broadcast_max_lines = 4  # Lines per Broadcast packet
+broadcast_max_bytes = 240  # Bytes per Broadcast packet. RCON text is ISO-8859-1, one byte per character
+broadcast_interval = 1.0  # Seconds between the packets of one message, so the server does not drop them
+
+
+### - Interface Options
+ui_drain_interval = 30  # Milliseconds between applying queued updates from background work to the window
+ui_frame_budget = 8  # Milliseconds the window may spend applying queued updates before it redraws
+
+
+### - Transcript Options
+# Every command, response and player list snapshot is recorded to gzipped, indexed segments in this directory
+transcript_enabled = True
+transcript_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "transcripts")
+transcript_max_bytes = 8 * 1024 * 1024  # Start a new segment once the current one reaches this size
+transcript_max_age = 24 * 60 * 60  # Start a new segment once the current one is this many seconds old
+transcript_flush_interval = 2  # Seconds between writes of buffered records to disk
+
+
+### - History Options
+# Player sessions (who joined and left when) and player list snapshots are kept in this SQLite database
+history_enabled = True
+history_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "history", "sessions.sqlite3")
+history_flush_interval = 2  # Seconds between commits of recorded snapshots
+history_batch_size = 500  # Commit early once this many rows are waiting to be written
+history_gap = 360  # Seconds without a player list after which everyone is treated as having left
+
+
+### - Metrics Options
+metrics_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Latency histogram bounds, in seconds
+# Write metrics in Prometheus text format to this file for node exporter's textfile collector to scrape, e.g.
+#   "/var/lib/node_exporter/textfile_collector/palconnect.prom". None turns the export off.
+metrics_export_path = None
+metrics_export_interval = 15  # Seconds between writes of the metrics file
+metrics_panel_interval = 1000  # Milliseconds between refreshes of the status panel
+
+
+### - Fleet Options
+# Additional servers to manage alongside the one you log in to. The logged-in server is always part of the fleet.
+#   Example: {"name": "Survival EU", "ipaddr": "203.0.113.10", "port": 25575, "password": "hunter2"}
+fleet_servers = []
+fleet_max_concurrency = 4  # Maximum number of servers a fan-out command talks to at once
+
+
 ### - Image Options
 image_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "images")
 logo_png = os.path.join(image_path, "logo.png")
 logo_ico = os.path.join(image_path, "logo.ico")
+asset_cache_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "cache", "images")  # Pre-scaled copies
 
 ## - Dark Theme Images
 dark_image_pattern = os.path.join(image_path, "dark", "pattern_dark.png")
@@ -60,9 +166,7 @@ default_theme = "custom_theme"
 
 
 ### - Terminal Options
-terminal_size = shutil.get_terminal_size()
-terminal_h = shutil.get_terminal_size().columns
-terminal_w = shutil.get_terminal_size().lines
+# terminal_size, terminal_h (columns) and terminal_w (lines) are looked up when first read - see __getattr__ below
 
 
 ### - Window Options
@@ -70,3 +174,13 @@ login_menu_size = "600x440"
 menu_size_w = "1280"
 menu_size_h = "550"
 menu_size = f"{menu_size_w}x{menu_size_h}"
+
+
+def __getattr__(name):
+    """ Terminal options are queried on first use rather than on every import of the config """
+    if name in ("terminal_size", "terminal_h", "terminal_w"):
+        import shutil
+        size = shutil.get_terminal_size()
+        globals().update(terminal_size=size, terminal_h=size.columns, terminal_w=size.lines)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,14 @@
-import asyncio
 import tkinter
-import threading
 
 import customtkinter
 
 from utils.button_functions import *
 from utils.application_utilities import *
-from widgets.scrollable_frames import ScrollableRadiobuttonFrame
+from utils.fleet import Fleet
+from utils.metrics import metrics
+from widgets.scrollable_frames import VirtualizedItemList, ScrollableCheckBoxFrame
+from widgets.console import ConsoleTextbox
+from core.history import open_history
 import config
 
 __all__ = (
@@ -30,9 +32,7 @@ def column_1(screen, rcon_credentials):
         bg_color="#DEDEDE")
     screen.main_frame.place(relx=0.5, rely=0.5, anchor=tkinter.CENTER)
 
-    loop = asyncio.get_event_loop()
-    update_players_thread = threading.Thread(target=update_players, args=(screen, rcon_credentials, loop))
-    update_players_thread.start()
+    screen.player_poller = update_players(screen, rcon_credentials)
     # Column 1
     screen.column_1 = customtkinter.CTkFrame(
         master=screen.main_frame,
@@ -41,25 +41,48 @@ def column_1(screen, rcon_credentials):
         corner_radius=6)
     screen.column_1.place(x=10, y=10)
 
-    screen.player_config_frame = ScrollableRadiobuttonFrame(master=screen.column_1, width=285, command=None,
-                                                            corner_radius=5, height=125,
-                                                            item_list=None,  # fetch_online_players(rcon_credentials)
-                                                            label_text="Players Online")
-    screen.player_config_frame._scrollbar.configure(height=0)
+    screen.player_config_frame = VirtualizedItemList(master=screen.column_1, width=305, height=170,
+                                                     corner_radius=5, label_text="Players Online", multiple=True)
     screen.player_config_frame.place(x=5, y=5)
 
     screen.ban_player_button = customtkinter.CTkButton(master=screen.column_1, width=50, text="Ban Player",
-                                                       command=lambda: testing(screen),
+                                                       command=lambda: ban_players(screen, rcon_credentials, screen.player_config_frame.get_checked_items()),
                                                        corner_radius=6)
 
     screen.ban_player_button.place(x=25, y=183)
 
     screen.kick_player_button = customtkinter.CTkButton(master=screen.column_1, width=50, text="Kick Player",
-                                                        command=lambda: kick_player(screen, rcon_credentials, screen.player_config_frame.get_checked_item(), loop),
+                                                        command=lambda: kick_players(screen, rcon_credentials, screen.player_config_frame.get_checked_items()),
                                                         corner_radius=6)
 
     screen.kick_player_button.place(x=105, y=183)
 
+    screen.auto_refresh_switch = customtkinter.CTkSwitch(master=screen.column_1, width=80, text="Auto Refresh",
+                                                         command=lambda: toggle_player_updates(screen))
+    screen.auto_refresh_switch.select()
+    screen.auto_refresh_switch.place(x=190, y=186)
+
+    screen.target_label = customtkinter.CTkLabel(master=screen.column_1, text="Command Target")
+    screen.target_label.place(x=10, y=220)
+
+    screen.target_selector = customtkinter.CTkSegmentedButton(master=screen.column_1, width=295,
+                                                              values=["This Server", "Selected", "All Servers"],
+                                                              command=lambda value: update_poll_targets(screen))
+    screen.target_selector.set("This Server")
+    screen.target_selector.place(x=10, y=248)
+
+    screen.server_select_frame = ScrollableCheckBoxFrame(master=screen.column_1, width=275, height=85,
+                                                         item_list=screen.fleet.names, corner_radius=5,
+                                                         label_text="Servers",
+                                                         command=lambda: update_poll_targets(screen))
+    screen.server_select_frame.place(x=5, y=285)
+    update_poll_targets(screen)
+
+    screen.status_label = customtkinter.CTkLabel(master=screen.column_1, width=295, text="", justify="left",
+                                                 anchor="w", font=("Consolas", 11))
+    screen.status_label.place(x=10, y=418)
+    update_status_panel(screen)
+
 
 def column_2(screen, rcon_credentials):
     """
@@ -73,9 +96,8 @@ def column_2(screen, rcon_credentials):
         corner_radius=6)
     screen.column_2.place(x=330, y=10)
 
-    screen.text_box = customtkinter.CTkTextbox(master=screen.column_2, width=585, height=370, border_width=2,
-                                               border_color=("#3E454A", "#949A9F"), bg_color="transparent",
-                                               state="disabled")
+    screen.text_box = ConsoleTextbox(master=screen.column_2, width=585, height=370, border_width=2,
+                                     border_color=("#3E454A", "#949A9F"), bg_color="transparent")
     screen.text_box.place(x=10, y=10)
     screen.text_box.tag_config("center", justify="center")
 
@@ -89,6 +111,10 @@ def column_2(screen, rcon_credentials):
                                                  corner_radius=6)
     screen.send_button.place(x=489, y=386)
 
+    screen.history_button = customtkinter.CTkButton(master=screen.column_2, width=91, text="History",
+                                                    command=lambda: open_history(screen), corner_radius=6)
+    screen.history_button.place(x=489, y=422)
+
     screen.error_label = customtkinter.CTkLabel(
         master=screen.column_2,
         text="",
@@ -97,14 +123,17 @@ def column_2(screen, rcon_credentials):
     )
     screen.error_label.place(relx=0.5, y=437, anchor="center")
 
-    screen.text_box.configure(state="normal")
-    screen.text_box.insert(tkinter.END, config.welcome_text, "center")
-    screen.text_box.configure(state="disabled")
+    screen.text_box.append(config.welcome_text, "center")
 
 
 def console_screen(screen: customtkinter.CTk, rcon_credentials: dict):
     """Main command screen for sending RCON commands."""
 
+    screen.primary_server = f"{rcon_credentials['ipaddr']}:{rcon_credentials['port']}"
+    screen.fleet = Fleet([{"name": screen.primary_server, **rcon_credentials}, *config.fleet_servers])
+    metrics.start_export()
+    screen.task_engine = start_task_engine(screen, rcon_credentials)
+
     screen.frame.destroy()
     column_1(screen, rcon_credentials)
     column_2(screen, rcon_credentials)
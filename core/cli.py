@@ -0,0 +1,309 @@
+"""
+Headless entry point. Reuses the same command path as the window, but never imports Tk, customtkinter or PIL,
+so it starts quickly enough to run from cron on a game host.
+
+Usage:
+    python -m palconnect [connection options] exec <Command> [arguments...]
+    python -m palconnect [connection options] run <file>
+    python -m palconnect [connection options] daemon
+    python -m palconnect search [--command C] [--player ID] [--since HOURS]
+    python -m palconnect tasks list | add <name> <save|announce|restart> [options] | remove <name>
+    python -m palconnect [connection options] bans list | add <SteamID> [options] | remove <SteamID> | sync [--all]
+
+Connection options default to the PALCONNECT_HOST, PALCONNECT_PORT and PALCONNECT_PASSWORD environment variables,
+or can name a server from `config.fleet_servers` with --server. `exec --all` sends to every fleet server.
+The daemon also runs the scheduled tasks (see `utils.tasks`) and removes players on the local ban list
+(see `utils.bans`) as they join.
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import argparse
+import threading
+
+from utils.application_utilities import async_send_command, async_send_batch, get_player_list
+from utils.button_functions import check_command, command_help, format_fleet_results
+from utils.event_loop import rcon_loop
+from utils.connection_pool import connection_pool
+from utils.fleet import Fleet
+from utils.metrics import metrics
+from utils.poller import AdaptivePoller
+from utils.roster import Roster
+from utils.transcript import transcript, search
+from utils.history import history
+from utils.bans import ban_list, describe_bans
+from utils.moderation import enforce_bans, sync_bans, describe_sync
+from utils.tasks import ScheduledTask, TaskEngine, load_tasks, save_tasks, describe_tasks, parse_duration, parse_start
+import config
+
+__all__ = (
+    "main",
+)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="palconnect", description="Headless RCON console for PalWorld servers")
+    parser.add_argument("--host", default=os.environ.get("PALCONNECT_HOST"), help="Server IP address")
+    parser.add_argument("--port", type=int, default=os.environ.get("PALCONNECT_PORT"), help="RCON port")
+    parser.add_argument("--password", default=os.environ.get("PALCONNECT_PASSWORD"), help="RCON password")
+    parser.add_argument("--server", help="Use the credentials of this server from config.fleet_servers")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request to stderr")
+
+    commands = parser.add_subparsers(dest="action", required=True)
+
+    run_one = commands.add_parser("exec", help="Send one command and print the response")
+    run_one.add_argument("--all", action="store_true", help="Send to every server in config.fleet_servers")
+    run_one.add_argument("command", nargs=argparse.REMAINDER, help="Command and its arguments, e.g. Broadcast Hi all")
+
+    run_file = commands.add_parser("run", help="Send every command in a file, one per line, over one connection")
+    run_file.add_argument("file", help="Command file. Blank lines and lines starting with # are skipped. - for stdin")
+
+    commands.add_parser("daemon", help="Keep polling the player list, print joins and leaves, and run scheduled tasks")
+
+    find = commands.add_parser("search", help="Search the session transcripts")
+    find.add_argument("--command", help="Only this command")
+    find.add_argument("--player", help="Only records mentioning this SteamID or playeruid")
+    find.add_argument("--since", type=float, help="Only the last SINCE hours")
+
+    tasks = commands.add_parser("tasks", help="Manage scheduled saves, restarts and announcements")
+    task_actions = tasks.add_subparsers(dest="task_action", required=True)
+    task_actions.add_parser("list", help="Show every scheduled task")
+    add = task_actions.add_parser("add", help="Add a task, or replace the one with the same name")
+    add.add_argument("name")
+    add.add_argument("kind", choices=ScheduledTask.KINDS)
+    add.add_argument("--every", type=parse_duration, help="Repeat interval, e.g. 30m, 6h or 1d")
+    add.add_argument("--at", help="First run: a time of day such as 04:00, or a delay such as +10m. "
+                                  "Defaults to one interval from now. Required without --every")
+    add.add_argument("--message", default="", help="Announcement text, or the message shown before a restart")
+    add.add_argument("--seconds", type=int, help="Restart: delay passed to Shutdown")
+    add.add_argument("--warnings", help="Restart: comma separated countdown times before it, e.g. 10m,5m,1m")
+    remove = task_actions.add_parser("remove", help="Remove a task")
+    remove.add_argument("name")
+
+    bans = commands.add_parser("bans", help="Manage the local ban list")
+    ban_actions = bans.add_subparsers(dest="ban_action", required=True)
+    ban_actions.add_parser("list", help="Show every ban")
+    ban = ban_actions.add_parser("add", help="Add a ban to the list. Servers get it on their next sync")
+    ban.add_argument("steamid")
+    ban.add_argument("--name", default="", help="Player name")
+    ban.add_argument("--reason", default="", help="Why they are banned")
+    unban = ban_actions.add_parser("remove", help="Remove a ban from the list. It is not lifted on the servers")
+    unban.add_argument("steamid")
+    sync = ban_actions.add_parser("sync", help="Send a server the bans it is missing")
+    sync.add_argument("--all", action="store_true", help="Sync every server in config.fleet_servers")
+    return parser
+
+
+def resolve_credentials(args) -> dict:
+    """ Credentials from --server, or from --host/--port/--password and their environment variables """
+    if args.server:
+        for server in config.fleet_servers:
+            if server['name'] == args.server:
+                return {"ipaddr": server['ipaddr'], "port": int(server['port']), "password": server['password']}
+        raise SystemExit(f"palconnect: no server named {args.server!r} in config.fleet_servers")
+
+    missing = [name for name in ("host", "port", "password") if getattr(args, name) in (None, "")]
+    if missing:
+        raise SystemExit(f"palconnect: missing {', '.join('--' + name for name in missing)}")
+    return {"ipaddr": args.host, "port": int(args.port), "password": args.password}
+
+
+def parse_command(entry: str) -> tuple:
+    command, arguments = check_command(entry.strip())
+    if not command:
+        raise ValueError(f"Not a valid command: {entry.strip()!r}. Valid commands: {', '.join(config.valid_commands)}")
+    return command, arguments
+
+
+async def run_exec(args) -> int:
+    command, arguments = parse_command(" ".join(args.command))
+    if command == "Help":
+        print(command_help())
+        return 0
+    if command == "Tasks":
+        print(describe_tasks(load_tasks()))
+        return 0
+    if command == "Bans":
+        print(describe_bans(ban_list))
+        return 0
+    if command == "SyncBans":
+        return await run_sync(args)
+    if args.all:
+        results = await Fleet().fan_out(command, arguments)
+        print(format_fleet_results(results))
+        return 1 if any(isinstance(result, Exception) for result in results.values()) else 0
+
+    print(await async_send_command(resolve_credentials(args), command, arguments))
+    return 0
+
+
+async def run_file(args) -> int:
+    source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    with source:
+        entries = [line for line in source if line.strip() and not line.lstrip().startswith("#")]
+
+    commands = [parse_command(entry) for entry in entries]
+    responses = await async_send_batch(resolve_credentials(args), [(command, (arguments,)) for command, arguments in commands])
+    for (command, _), response in zip(commands, responses):
+        print(f"{command}: {response}")
+    return 0
+
+
+def run_daemon(args) -> int:
+    credentials = resolve_credentials(args)
+    roster = Roster()
+
+    def task_ran(task, warning, outcome):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        event = task.name if warning is None else f"{task.name} ({warning:g}s warning)"
+        if isinstance(outcome, Exception):
+            print(f"{stamp} TASK {event} failed - {type(outcome).__name__}: {outcome}", file=sys.stderr, flush=True)
+        else:
+            print(f"{stamp} TASK {event}", flush=True)
+
+    def report(diff):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        for player in diff.joined:
+            print(f"{stamp} JOIN {player.name} {player.steamid}", flush=True)
+        for player in diff.left:
+            print(f"{stamp} LEAVE {player.name} {player.steamid}", flush=True)
+        for old, new in diff.renamed:
+            print(f"{stamp} RENAME {old.name} -> {new.name} {new.steamid}", flush=True)
+        if diff.joined and config.bans_enforce:
+            rcon_loop.submit(remove_evaders(diff.joined))
+
+    async def remove_evaders(players):
+        for player, outcome in await enforce_bans(credentials, players):
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            if isinstance(outcome, Exception):
+                print(f"{stamp} BANNED {player.name} {player.steamid} could not be removed - "
+                      f"{type(outcome).__name__}: {outcome}", file=sys.stderr, flush=True)
+            else:
+                print(f"{stamp} BANNED {player.name} {player.steamid} removed", flush=True)
+
+    roster.subscribe(report)
+
+    async def poll():
+        return roster.update(await get_player_list(credentials))
+
+    def on_error(err):
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} ERROR {type(err).__name__}: {err}", file=sys.stderr, flush=True)
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+    metrics.start_export()
+    poller = AdaptivePoller(poll, on_error=on_error, name="daemon").start()
+    engine = TaskEngine(credentials, on_run=task_ran).start()
+    try:
+        stopping.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        poller.stop()
+        metrics.stop_export()
+    return 0
+
+
+def run_search(args) -> int:
+    start = time.time() - args.since * 3600 if args.since else None
+    for record in search(start=start, command=args.command, player=args.player):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record['t']))
+        if record['kind'] == "players":
+            print(f"{stamp} [{record['server']}] online: {', '.join(record['players']) or 'nobody'}")
+        else:
+            outcome = record.get('error') or record.get('response', '')
+            print(f"{stamp} [{record['server']}] {record['command']} {' '.join(record['args'])} -> {outcome.strip()}")
+    return 0
+
+
+def run_tasks(args) -> int:
+    """ Edit the task definitions file. A running daemon or window picks the changes up within a minute """
+    tasks = {task.name: task for task in load_tasks()}
+    if args.task_action == "list":
+        print(describe_tasks(tasks.values()))
+        return 0
+
+    if args.task_action == "remove":
+        if tasks.pop(args.name, None) is None:
+            raise ValueError(f"No task named {args.name!r}")
+    else:
+        if not args.every and not args.at:
+            raise ValueError(f"{args.name}: a one-off {args.kind} needs --at, e.g. --at 04:00 or --at +10m")
+        warnings = [parse_duration(warning) for warning in args.warnings.split(",")] if args.warnings else None
+        at = parse_start(args.at) if args.at else None
+        tasks[args.name] = ScheduledTask(args.name, args.kind, interval=args.every, at=at, message=args.message,
+                                         seconds=args.seconds, warnings=warnings)
+        print(tasks[args.name].describe())
+    save_tasks(tasks.values())
+    return 0
+
+
+async def run_sync(args) -> int:
+    """ Send the local ban list to one server, or with --all to every fleet server, skipping bans it already has """
+    if args.all:
+        results = await Fleet().sync_bans()
+    else:
+        credentials = resolve_credentials(args)
+        try:
+            results = {f"{credentials['ipaddr']}:{credentials['port']}": await sync_bans(credentials)}
+        except Exception as err:
+            results = {f"{credentials['ipaddr']}:{credentials['port']}": err}
+
+    failed = False
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            failed = True
+            print(f"[{name}] {type(result).__name__}: {result}")
+        else:
+            failed = failed or any(isinstance(outcome, Exception) for _, outcome in result)
+            print(f"[{name}] {describe_sync(result)}")
+    return 1 if failed else 0
+
+
+def run_bans(args) -> int:
+    if args.ban_action == "list":
+        print(describe_bans(ban_list))
+        return 0
+    if args.ban_action == "add":
+        print(ban_list.add(args.steamid, args.name, args.reason).describe())
+        return 0
+    if args.ban_action == "remove":
+        if ban_list.remove(args.steamid) is None:
+            raise ValueError(f"{args.steamid} is not on the ban list")
+        return 0
+    return asyncio.run(run_sync(args))
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format="%(message)s")
+
+    try:
+        if args.action == "search":
+            return run_search(args)
+        if args.action == "tasks":
+            return run_tasks(args)
+        if args.action == "bans":
+            return run_bans(args)
+        if args.action == "daemon":
+            return run_daemon(args)
+        return asyncio.run(run_exec(args) if args.action == "exec" else run_file(args))
+    except ValueError as err:
+        print(f"palconnect: {err}", file=sys.stderr)
+        return 2
+    except Exception as err:
+        print(f"palconnect: {type(err).__name__}: {err}", file=sys.stderr)
+        return 1
+    finally:
+        if rcon_loop.running:
+            rcon_loop.run(connection_pool.close(), timeout=2)
+            rcon_loop.stop()
+        transcript.close()
+        history.close()
+        ban_list.flush()
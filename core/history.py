@@ -0,0 +1,124 @@
+"""
+Session history panel: who played when, read from `utils.history`.
+
+Queries run on a background thread and their results are posted back through the main window's dispatcher, so a
+slow query never freezes the console.
+"""
+import time
+import threading
+
+import customtkinter
+
+from utils.history import history
+from utils.tasks import format_duration
+
+__all__ = (
+    "HistoryWindow",
+    "open_history"
+)
+
+
+def _clock(t: float | None) -> str:
+    return "online" if t is None else time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+
+
+def _session_line(session: dict) -> str:
+    end = time.time() if session['departed'] is None else session['departed']
+    played = format_duration(end - session['joined'])
+    return (f"{_clock(session['joined'])} - {_clock(session['departed']):<19}  {played:<22}"
+            f"{session['name']} ({session['steamid'] or session['playeruid']})")
+
+
+class HistoryWindow(customtkinter.CTkToplevel):
+    """Look up a player's sessions and playtime, or who was online at a given time.
+
+    Args:
+        screen: (customtkinter.CTk): The main window, whose dispatcher delivers query results.
+        server: (str): Only show sessions on this server ("ipaddr:port"). None shows every server.
+    """
+
+    def __init__(self, screen, server: str = None):
+        super().__init__(screen)
+        self.screen = screen
+        self.server = server
+        self.title(f"Session History{f' - {server}' if server else ''}")
+        self.geometry("720x460")
+        self.resizable(False, False)
+
+        self.player_entry = customtkinter.CTkEntry(self, width=300, placeholder_text="SteamID or playeruid")
+        self.player_entry.place(x=10, y=10)
+        self.player_entry.bind("<Return>", lambda event: self.show_player())
+        self.player_button = customtkinter.CTkButton(self, width=110, text="Sessions", command=self.show_player)
+        self.player_button.place(x=320, y=10)
+
+        self.time_entry = customtkinter.CTkEntry(self, width=300, placeholder_text="YYYY-MM-DD HH:MM")
+        self.time_entry.place(x=10, y=48)
+        self.time_entry.bind("<Return>", lambda event: self.show_online_at())
+        self.time_button = customtkinter.CTkButton(self, width=110, text="Online At", command=self.show_online_at)
+        self.time_button.place(x=320, y=48)
+
+        self.results = customtkinter.CTkTextbox(self, width=700, height=360, font=("Consolas", 12), state="disabled")
+        self.results.place(x=10, y=88)
+
+    def show(self, text: str):
+        self.results.configure(state="normal")
+        self.results.delete("1.0", "end")
+        self.results.insert("end", text)
+        self.results.configure(state="disabled")
+
+    def run(self, query):
+        """ Run `query()` on a background thread and show the text it returns """
+        self.show("Searching...")
+
+        def work():
+            try:
+                text = query()
+            except Exception as err:
+                text = f"Could not read the session history - {type(err).__name__}: {err}"
+            self.screen.dispatcher.post(lambda: self.winfo_exists() and self.show(text), key="history-results")
+
+        threading.Thread(target=work, name="history-query", daemon=True).start()
+
+    def show_player(self):
+        player = self.player_entry.get().strip()
+        if not player:
+            self.show("Enter a SteamID or playeruid")
+            return
+
+        def query():
+            sessions = history.sessions(player, self.server)
+            if not sessions:
+                return f"No sessions recorded for {player}"
+            total = history.playtime(player, self.server)
+            return "\n".join([f"Total playtime {format_duration(total)}, latest {len(sessions)} sessions:", "",
+                              *(_session_line(session) for session in sessions)])
+
+        self.run(query)
+
+    def show_online_at(self):
+        text = self.time_entry.get().strip()
+        try:
+            at = time.mktime(time.strptime(text, "%Y-%m-%d %H:%M"))
+        except ValueError:
+            self.show("Enter a time as YYYY-MM-DD HH:MM")
+            return
+
+        def query():
+            sessions = history.online_at(at, self.server)
+            if not sessions:
+                return f"Nobody was online at {text}"
+            return "\n".join([f"{len(sessions)} online at {text}:", "",
+                              *(_session_line(session) for session in sessions)])
+
+        self.run(query)
+
+
+def open_history(screen):
+    """ Open the history panel for the logged-in server, or bring it to the front if it is already open """
+    window = screen.history_window
+    if window is None or not window.winfo_exists():
+        window = screen.history_window = HistoryWindow(screen, screen.primary_server)
+    window.deiconify()
+    window.lift()
+    window.focus()
+    return window
@@ -1,12 +1,13 @@
 import os
 import sys
-import asyncio
 
 import customtkinter as ctk
-from PIL import Image
 
-from utils.application_utilities import *
-from core.app import console_screen
+from utils.window import center_window, open_site
+from utils.ui_dispatch import UiDispatcher
+from utils.assets import image_size, prepare_images
+from utils.startup import startup, preload
+from widgets.cached_image import CachedImage
 import config
 
 __all__ = (
@@ -25,42 +26,98 @@ class ServerConnectionScreen(ctk.CTk):
         self.port_entry = None
         self.password_entry = None
         self.login_button = None
+        self.github_button = None
+        self.discord_button = None
+
+        self.fleet = None
+        self.primary_server = None
+        self.poll_targets = ()  # Servers whose player lists are refreshed, see update_poll_targets
+        self.player_poller = None
+        self.task_engine = None
+        self.history_window = None
+        self.auto_refresh_switch = None
+        self.status_label = None
+        self.status_panel_job = None
 
         self.main_frame = None
         self.column_1 = None
         self.player_config_frame = None
-        self.refresh_players_button = None
 
         self.column_2 = None
         self.text_box = None
         self.command_entry = None
         self.send_button = None
+        self.history_button = None
 
         ctk.set_appearance_mode(config.default_theme)
         ctk.set_default_color_theme(config.custom_theme)  # Themes: config.themes
 
         self.toplevel_window = None
         self.title('PalConnect - Console tool for PalWorld')
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.dispatcher = UiDispatcher(self)
+        self.dispatcher.start()
         self.geometry(center_window(self, 1280, 550, self._get_window_scaling()))
         if not os.name == 'posix':
             self.iconbitmap(config.logo_ico)
 
         # This assumes that the light and dark image are the same size (Which, they should be)
-        bg_dimensions = Image.open(config.dark_image_pattern).size  # -> Returns a tuple as (w, h)
+        bg_dimensions = image_size(config.dark_image_pattern)  # -> Returns a tuple as (w, h)
+
+        # Images are drawn from an on-disk cache of copies scaled for this display. Copies that are missing are
+        # made on a background thread, and the images are only put in place once they are ready
+        self.logo_image = CachedImage(config.logo_png, size=(56, 56))
+        self.background_image = CachedImage(light_image=config.light_image_pattern,
+                                            dark_image=config.dark_image_pattern, size=bg_dimensions)
+        self.github_image = CachedImage(config.github_image)
+        self.discord_image = CachedImage(config.discord_image)
+        scaling = ctk.ScalingTracker.get_widget_scaling(self)
+        prepare_images(self.dispatcher, [(path, image.scaled_size(scaling))
+                                         for image in (self.logo_image, self.background_image, self.github_image,
+                                                       self.discord_image)
+                                         for path in image.paths], self.show_images)
 
         # Sets the maximum and minimum sizes
         max_w, max_h = bg_dimensions
         self.maxsize(max_w, max_h)
         self.minsize(920, 480)
-        self.logo_image = ctk.CTkImage(Image.open(config.logo_png),
-                                                 size=(56, 56))
-        self.background_image = ctk.CTkImage(light_image=Image.open(config.light_image_pattern),
-                                                       dark_image=Image.open(config.dark_image_pattern),
-                                                       size=bg_dimensions)
-        self.label_1 = ctk.CTkLabel(master=self, image=self.background_image, text="")
+        self.label_1 = ctk.CTkLabel(master=self, text="", width=max_w, height=max_h)
         self.label_1.pack()
 
         self.create_credentials_frame()
+        startup.mark("window built")
+        self.after_idle(self.on_first_paint)
+
+    def on_first_paint(self):
+        self.update_idletasks()
+        startup.mark("first paint")
+        # Load the console screen and the RCON stack while the user types their credentials
+        preload("utils.application_utilities", "core.app")
+
+    def show_images(self):
+        """ Put the images in place once `prepare_images` has cached them """
+        self.label_1.configure(image=self.background_image)
+        # After a fast login on a cold cache the credentials frame, and the widgets on it, are already gone
+        if self.frame.winfo_exists():
+            self.title_text.configure(image=self.logo_image)
+            self.github_button.configure(image=self.github_image)
+            self.discord_button.configure(image=self.discord_image)
+
+        startup.mark("images shown")
+        if startup.enabled:
+            startup.report()
+        if startup.quit_when_loaded:
+            self.after_idle(self.close)
+
+    def close(self):
+        if self.status_panel_job is not None:
+            self.after_cancel(self.status_panel_job)
+        # The RCON stack is only shut down if a login or the preload has loaded it, rather than imported to close
+        close_application = getattr(sys.modules.get("utils.button_functions"), "close_application", None)
+        if close_application is not None:
+            close_application(self)
+        self.dispatcher.stop()
+        self.destroy()
 
     # Credentials Frame
     def create_credentials_frame(self):
@@ -77,8 +134,7 @@ class ServerConnectionScreen(ctk.CTk):
             font=('Expose', 20),
             anchor="center",
             justify="center",
-            compound="left",
-            image=self.logo_image)
+            compound="left")
         self.title_text.place(x=20, y=20)
 
         self.error_label = ctk.CTkLabel(
@@ -106,23 +162,20 @@ class ServerConnectionScreen(ctk.CTk):
         self.login_button = ctk.CTkButton(master=self.frame, width=220, text="Login", command=lambda: login_button_function(self), corner_radius=6)
         self.login_button.place(x=50, y=240)
 
-        github_image = ctk.CTkImage(
-            Image.open(config.github_image).resize((20, 20), Image.Resampling.LANCZOS))
-        discord_image = ctk.CTkImage(
-            Image.open(config.discord_image).resize((20, 20), Image.Resampling.LANCZOS))
-        github_button = ctk.CTkButton(master=self.frame, image=github_image, text="Github", width=100, height=20,
-                                      compound="left", command=lambda: open_site(config.gitgub_url),
-                                      fg_color='white', text_color='black', hover_color='#AFAFAF')
-        github_button.place(x=50, y=290)
+        self.github_button = ctk.CTkButton(master=self.frame, text="Github", width=100, height=20,
+                                           compound="left", command=lambda: open_site(config.gitgub_url),
+                                           fg_color='white', text_color='black', hover_color='#AFAFAF')
+        self.github_button.place(x=50, y=290)
 
-        discord_button = ctk.CTkButton(master=self.frame, image=discord_image, text="Discord", width=100,
-                                       height=20, compound="left", command=lambda: open_site(config.discord_url),
-                                       fg_color='white', text_color='black', hover_color='#AFAFAF')
-        discord_button.place(x=170, y=290)
+        self.discord_button = ctk.CTkButton(master=self.frame, text="Discord", width=100,
+                                            height=20, compound="left", command=lambda: open_site(config.discord_url),
+                                            fg_color='white', text_color='black', hover_color='#AFAFAF')
+        self.discord_button.place(x=170, y=290)
 
 
 
 def login_button_function(screen: ctk.CTk):
+    import asyncio  # Deferred with the rest of the RCON stack, which the login screen does not need to paint
 
     async def run_login_handler():
         await login_handler(screen, rcon_credentials)
@@ -147,6 +200,8 @@ def login_button_function(screen: ctk.CTk):
 
 # Handles login asynchronously. May move this functionality to a more general handler
 async def login_handler(screen, rcon_credentials):
+    from utils.application_utilities import valid_input  # Usually already loaded by the preload
+    from core.app import console_screen
 
     if await valid_input(screen, rcon_credentials):
         rcon_credentials = {
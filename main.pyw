@@ -1,8 +1,17 @@
-from core.login import ServerConnectionScreen
-import asyncio
+import sys
+
+from utils.startup import startup  # First, so that startup timing covers every other import
 
 
 def main():
+    if "--startup-time" in sys.argv:
+        startup.enabled = startup.quit_when_loaded = True
+
+    import logging
+    from core.login import ServerConnectionScreen
+    startup.mark("imports")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("Starting Main Program Loop")
     # main_menu = ServerConnectionScreen()
     ServerConnectionScreen().mainloop()
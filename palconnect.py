@@ -0,0 +1,12 @@
+"""
+Headless PalConnect, for scripts, cron jobs and long-running daemons. See core/cli.py for usage.
+
+    python -m palconnect --host 127.0.0.1 --port 25575 --password secret exec ShowPlayers
+"""
+import sys
+
+from core.cli import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import pytest
+
+from utils import application_utilities, moderation
+from utils.bans import BanList, is_steamid, steam_key
+from utils.event_loop import rcon_loop
+from utils.history import history
+from utils.mock_server import MockRconServer
+from utils.players import Player
+from utils.transcript import transcript
+
+ANA = "76561197960265729"
+BOB = "76561197960265730"
+
+
+@pytest.fixture
+def bans(tmp_path) -> BanList:
+    return BanList(str(tmp_path / "bans.json"))
+
+
+def test_steamids():
+    assert is_steamid(ANA) and is_steamid(f"steam_{ANA}")
+    assert not is_steamid("1234") and not is_steamid(f"{ANA}0")
+    assert steam_key(f"steam_{ANA}") == steam_key(f" {ANA} ") == ANA
+
+
+def test_add_is_saved_and_indexed_with_or_without_prefix(bans):
+    bans.add(ANA, "Ana", "Griefing", "server:1")
+    reloaded = BanList(bans.path)
+    assert f"steam_{ANA}" in reloaded and BOB not in reloaded
+    ban = reloaded.get(ANA)
+    assert (ban.name, ban.reason, ban.applied) == ("Ana", "Griefing", {"server:1"})
+
+
+def test_only_steamids_are_kept(bans):
+    with pytest.raises(ValueError):
+        bans.add("1234")
+    bans.record("server:1", "1234")
+    bans.flush()
+    assert len(bans) == 0
+
+
+def test_record_saves_once_on_flush(bans):
+    bans.record("server:1", ANA)
+    bans.record("server:2", ANA)
+    bans.record("server:1", BOB)
+    bans.flush()
+    reloaded = BanList(bans.path)
+    assert reloaded.get(ANA).applied == {"server:1", "server:2"}
+    assert [ban.steamid for ban in reloaded.missing("server:2")] == [BOB]
+
+
+def test_changes_made_elsewhere_are_picked_up_and_pending_records_survive(bans):
+    bans.add(ANA)
+    bans.record("server:2", ANA)
+    BanList(bans.path).add(BOB)  # Another PalConnect, e.g. the command line
+    assert BOB in bans
+    assert bans.get(ANA).applied == {"server:2"}
+    bans.flush()
+    assert BanList(bans.path).get(ANA).applied == {"server:2"}
+
+
+def test_evaders(bans):
+    bans.add(ANA)
+    players = [Player("Ana", "1", f"steam_{ANA}"), Player("Bob", "2", BOB), Player("New", "3", "")]
+    assert [(player.name, ban.steamid) for player, ban in bans.evaders(players)] == [("Ana", ANA)]
+
+
+def test_enforce_bans_bans_where_missing_and_kicks_where_applied(bans, monkeypatch):
+    monkeypatch.setattr(moderation, "ban_list", bans)
+    monkeypatch.setattr(application_utilities, "ban_list", bans)
+    monkeypatch.setattr(history, "enabled", False)
+    monkeypatch.setattr(transcript, "enabled", False)
+    server = MockRconServer(players=3)
+    rcon_loop.run(server.start())
+    try:
+        address = f"{server.credentials['ipaddr']}:{server.credentials['port']}"
+        applied, unapplied, innocent = server.players
+        bans.add(applied.steamid, applied.name, server=address)
+        bans.add(unapplied.steamid, unapplied.name)
+
+        outcomes = rcon_loop.run(moderation.enforce_bans(server.credentials, server.players))
+        assert [player for player, _ in outcomes] == [unapplied, applied]
+        assert server.players == [innocent]
+        assert server.banned == {unapplied.steamid}
+        bans.flush()
+        assert bans.get(unapplied.steamid).applied == {address}
+    finally:
+        rcon_loop.run(server.stop())
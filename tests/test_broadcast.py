@@ -0,0 +1,46 @@
+from utils.broadcast import NBSP, wrap, format_message, broadcast_packets, non_breaking
+from utils.rcon_protocol import ENCODING, Packet
+
+MESSAGE = "Server restarting for the weekly update, please log off now! " * 12
+
+
+def test_wrap_keeps_lines_within_width():
+    lines = wrap(MESSAGE, 40)
+    assert all(len(line) <= 40 for line in lines)
+    assert " ".join(lines).split() == MESSAGE.split()
+
+
+def test_wrap_breaks_long_words():
+    assert wrap("a" * 95, 40) == ["a" * 40, "a" * 40, "a" * 15]
+
+
+def test_wrap_blank_message():
+    assert wrap("  \n ", 40) == []
+    assert format_message("   ") == ""
+
+
+def test_packets_fit_lines_and_bytes():
+    packets = broadcast_packets(MESSAGE, line_length=40, max_lines=4, max_bytes=120)
+    assert len(packets) > 1
+    for packet in packets:
+        lines = packet.split("\n")
+        assert len(lines) <= 4
+        assert all(len(line) <= 40 for line in lines)
+        assert len(packet.encode(ENCODING)) <= 120
+        assert " " not in packet
+    assert " ".join(packet.replace("\n", NBSP).replace(NBSP, " ") for packet in packets).split() == MESSAGE.split()
+
+
+def test_latin1_is_measured_one_byte_per_character():
+    packets = broadcast_packets(f"{'é' * 20} {'é' * 9}", line_length=20, max_lines=4, max_bytes=30)
+    assert packets == [f"{'é' * 20}\n{'é' * 9}"]
+
+
+def test_unencodable_characters_are_replaced_before_sending():
+    packets = broadcast_packets("Hello 你好 😀 " * 20, line_length=40, max_lines=2, max_bytes=80)
+    for packet in packets:
+        Packet.make_command(1, "Broadcast", packet)  # Raises if the packet cannot be encoded
+        assert len(packet.encode(ENCODING)) <= 80
+    assert "?" in packets[0]
+    assert format_message("naïve 😀") == "naïve ?\n"
+    assert non_breaking("a 😀") == f"a{NBSP}?"
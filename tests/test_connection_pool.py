@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from utils.connection_pool import ConnectionPool
+from utils.mock_server import MockRconServer
+from utils.pal_exceptions import EmptyResponse
+
+
+class FlakyServer(MockRconServer):
+    """ A mock server that can hang up on idle connections, or drop a connection after a command arrives """
+
+    def __init__(self, **settings):
+        super().__init__(**settings)
+        self.writers = []
+        self.drop_next = 0  # Commands to hang up on instead of answering
+
+    async def _handle(self, reader, writer):
+        self.writers.append(writer)
+        await super()._handle(reader, writer)
+
+    def respond(self, line: str) -> str:
+        if self.drop_next:
+            self.drop_next -= 1
+            raise ConnectionResetError("Dropped by the test")
+        return super().respond(line)
+
+    async def hang_up(self):
+        for writer in self.writers:
+            writer.close()
+        await asyncio.sleep(0.05)  # Let the client side see the end of the stream
+
+
+def run_against_flaky(operation):
+    async def main():
+        async with FlakyServer() as server:
+            pool = ConnectionPool(timeout=2)
+            try:
+                return server, await operation(pool, server)
+            finally:
+                await pool.close()
+
+    return asyncio.run(main())
+
+
+def test_connection_is_reused():
+    async def operation(pool, server):
+        return [await pool.run(server.credentials, "Info") for _ in range(3)]
+
+    server, responses = run_against_flaky(operation)
+    assert len(responses) == 3 and server.connections == 1
+
+
+def test_command_is_retried_when_the_idle_connection_was_closed_before_it_was_sent():
+    async def operation(pool, server):
+        await pool.run(server.credentials, "Info")
+        await server.hang_up()
+        return await pool.run(server.credentials, "Broadcast", "hello")
+
+    server, response = run_against_flaky(operation)
+    assert response == "Broadcasted: hello\n"
+    assert server.commands.count("Broadcast hello") == 1 and server.connections == 2
+
+
+def test_read_only_command_is_retried_after_it_was_sent():
+    async def operation(pool, server):
+        server.drop_next = 1
+        return await pool.run(server.credentials, "Info")
+
+    server, response = run_against_flaky(operation)
+    assert response.startswith("Welcome to Pal Server")
+    assert server.commands == ["Info", "Info"]
+
+
+def test_command_that_changes_the_server_is_not_sent_twice():
+    async def operation(pool, server):
+        server.drop_next = 1
+        with pytest.raises((ConnectionError, EmptyResponse)):
+            await pool.run(server.credentials, "Broadcast", "once")
+        return None
+
+    server, _ = run_against_flaky(operation)
+    assert server.commands == ["Broadcast once"]
+
+
+def test_batch_is_only_retried_when_every_command_is_read_only():
+    async def operation(pool, server):
+        server.drop_next = 1
+        responses = await pool.run_batch(server.credentials, [("Info", ()), ("ShowPlayers", ())])
+        server.drop_next = 1
+        with pytest.raises((ConnectionError, EmptyResponse)):
+            await pool.run_batch(server.credentials, [("Info", ()), ("Save", ())])
+        return responses
+
+    server, responses = run_against_flaky(operation)
+    assert responses[0].startswith("Welcome to Pal Server") and responses[1].startswith("name,playeruid,steamid")
+    assert server.commands.count("Info") == 3  # The mixed batch was not sent a second time
@@ -0,0 +1,49 @@
+import asyncio
+
+from utils.connection_pool import ConnectionPool
+from utils.mock_server import MockRconServer
+from utils.players import parse_players
+
+
+def run_against_mock(operation, **settings):
+    async def main():
+        async with MockRconServer(**settings) as server:
+            pool = ConnectionPool(timeout=5)
+            try:
+                return server, await operation(pool, server)
+            finally:
+                await pool.close()
+
+    return asyncio.run(main())
+
+
+def test_run_batch_matches_responses_without_echoed_ids():
+    commands = [("Info", ()), ("Broadcast", ("one",)), ("Save", ()), ("Broadcast", ("two",))]
+    _, responses = run_against_mock(lambda pool, server: pool.run_batch(server.credentials, commands),
+                                    echo_ids=False)
+    assert responses[0].startswith("Welcome to Pal Server")
+    assert responses[1:] == ["Broadcasted: one\n", "Complete Save\n", "Broadcasted: two\n"]
+
+
+def test_run_batch_with_latency_keeps_order():
+    commands = [("Broadcast", (str(i),)) for i in range(20)]
+    _, responses = run_against_mock(lambda pool, server: pool.run_batch(server.credentials, commands),
+                                    echo_ids=False, latency=(0.0, 0.005))
+    assert responses == [f"Broadcasted: {i}\n" for i in range(20)]
+
+
+def test_show_players_round_trip_with_comma_names():
+    server, response = run_against_mock(lambda pool, server: pool.run(server.credentials, "ShowPlayers"),
+                                        players=12, comma_names=True)
+    assert parse_players(response) == server.players
+    assert any("," in player.name for player in server.players)
+
+
+def test_kick_removes_the_player():
+    async def kick(pool, server):
+        target = server.players[1]
+        return target, await pool.run(server.credentials, "KickPlayer", target.steamid)
+
+    server, (target, response) = run_against_mock(kick, players=3)
+    assert response == f"Kicked: {target.steamid}\n"
+    assert target not in server.players
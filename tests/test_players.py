@@ -0,0 +1,51 @@
+from utils.players import Player, PlayerListParser, parse_players
+
+
+def test_plain_rows():
+    assert parse_players("name,playeruid,steamid\nZoë,123,7656\nAna,456,7657\n") == [
+        Player("Zoë", "123", "7656"), Player("Ana", "456", "7657")]
+
+
+def test_last_row_without_newline():
+    assert parse_players("name,playeruid,steamid\nAna,1,2") == [Player("Ana", "1", "2")]
+
+
+def test_commas_in_names():
+    response = "name,playeruid,steamid\nBob, the Brave,1,2\na,b,c,3,4\n"
+    assert parse_players(response) == [Player("Bob, the Brave", "1", "2"), Player("a,b,c", "3", "4")]
+
+
+def test_reordered_header():
+    response = "steamid,name,playeruid\n2,Bob, the Brave,1\n4,Ana,3\n"
+    assert parse_players(response) == [Player("Bob, the Brave", "1", "2"), Player("Ana", "3", "4")]
+
+
+def test_missing_column_is_empty():
+    assert parse_players("name,steamid\nAna,2\n") == [Player("Ana", "", "2")]
+
+
+def test_quoted_name():
+    assert parse_players('name,playeruid,steamid\n"A, b",1,2\n') == [Player("A, b", "1", "2")]
+
+
+def test_unmatched_quote_is_dropped():
+    assert parse_players('name,playeruid,steamid\n"Quote,1,2\n') == [Player("Quote", "1", "2")]
+
+
+def test_no_header():
+    assert parse_players("Ana,1,2\n") == [Player("Ana", "1", "2")]
+
+
+def test_malformed_rows_are_skipped():
+    assert parse_players("name,playeruid,steamid\nAna,1\nBob,3,4\n") == [Player("Bob", "3", "4")]
+
+
+def test_incremental_feed_matches_whole_response():
+    response = "name,playeruid,steamid\n" + "".join(f"P{i}, x,{i},{i + 100}\n" for i in range(50))
+    parser = PlayerListParser()
+    players = []
+    for start in range(0, len(response), 7):
+        players += parser.feed(response[start:start + 7])
+    players += parser.close()
+    assert players == parse_players(response)
+    assert len(players) == 50
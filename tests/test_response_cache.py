@@ -0,0 +1,118 @@
+import asyncio
+
+from utils.response_cache import ResponseCache
+
+SERVER = ("127.0.0.1", 25575, "password")
+
+
+def make_cache() -> ResponseCache:
+    return ResponseCache(ttls={"Info": 60, "ShowPlayers": 60}, invalidated_by={"KickPlayer": ("ShowPlayers",)})
+
+
+class Server:
+    """ Counts requests, answering each one after `release` is set """
+
+    def __init__(self):
+        self.requests = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    def request(self, response: str):
+        async def run():
+            self.requests += 1
+            await self.release.wait()
+            return f"{response} {self.requests}"
+        return run
+
+
+def test_responses_are_reused_within_their_ttl():
+    async def main():
+        cache, server = make_cache(), Server()
+        first = await cache.fetch(SERVER, "Info", (), server.request("info"))
+        second = await cache.fetch(SERVER, "Info", (), server.request("info"))
+        return first, second, server.requests
+
+    assert asyncio.run(main()) == ("info 1", "info 1", 1)
+
+
+def test_uncached_commands_always_reach_the_server():
+    async def main():
+        cache, server = make_cache(), Server()
+        for _ in range(3):
+            await cache.fetch(SERVER, "Save", (), server.request("saved"))
+        return server.requests
+
+    assert asyncio.run(main()) == 3
+
+
+def test_concurrent_requests_share_one_round_trip():
+    async def main():
+        cache, server = make_cache(), Server()
+        server.release.clear()
+        waiters = [asyncio.ensure_future(cache.fetch(SERVER, "ShowPlayers", (), server.request("players")))
+                   for _ in range(5)]
+        await asyncio.sleep(0)
+        server.release.set()
+        return await asyncio.gather(*waiters), server.requests
+
+    assert asyncio.run(main()) == (["players 1"] * 5, 1)
+
+
+def test_cancelling_one_waiter_does_not_cancel_the_request():
+    async def main():
+        cache, server = make_cache(), Server()
+        server.release.clear()
+        first = asyncio.ensure_future(cache.fetch(SERVER, "Info", (), server.request("info")))
+        second = asyncio.ensure_future(cache.fetch(SERVER, "Info", (), server.request("info")))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        server.release.set()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == ("info 1", True)
+
+
+def test_mutating_command_drops_the_responses_it_affects():
+    async def main():
+        cache, server = make_cache(), Server()
+        await cache.fetch(SERVER, "Info", (), server.request("info"))
+        await cache.fetch(SERVER, "ShowPlayers", (), server.request("players"))
+        await cache.fetch(SERVER, "KickPlayer", ("1",), server.request("kicked"))
+        players = await cache.fetch(SERVER, "ShowPlayers", (), server.request("players"))
+        info = await cache.fetch(SERVER, "Info", (), server.request("info"))
+        return players, info
+
+    assert asyncio.run(main()) == ("players 4", "info 1")
+
+
+def test_read_in_flight_during_an_invalidation_is_not_cached():
+    async def main():
+        cache, server = make_cache(), Server()
+        server.release.clear()
+        inflight = asyncio.ensure_future(cache.fetch(SERVER, "ShowPlayers", (), server.request("players")))
+        await asyncio.sleep(0)
+        cache.invalidate(SERVER, "ShowPlayers")
+        server.release.set()
+        stale = await inflight
+        return stale, await cache.fetch(SERVER, "ShowPlayers", (), server.request("players"))
+
+    assert asyncio.run(main()) == ("players 1", "players 2")
+
+
+def test_failures_are_not_cached():
+    async def main():
+        cache, calls = make_cache(), []
+
+        async def failing():
+            calls.append(1)
+            raise ConnectionError("down")
+
+        for _ in range(2):
+            try:
+                await cache.fetch(SERVER, "Info", (), failing)
+            except ConnectionError:
+                pass
+        return len(calls)
+
+    assert asyncio.run(main()) == 2
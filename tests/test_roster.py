@@ -0,0 +1,44 @@
+from utils.players import Player
+from utils.roster import Roster, player_key
+
+ANA = Player("Ana", "1", "76561197960265729")
+BOB = Player("Bob", "2", "76561197960265730")
+NEW = Player("New", "3", "")
+
+
+def test_first_snapshot_is_all_joins():
+    diff = Roster().update([ANA, BOB])
+    assert diff.joined == [ANA, BOB] and not diff.left and not diff.renamed
+
+
+def test_joins_leaves_and_renames():
+    roster = Roster()
+    roster.update([ANA, BOB])
+    renamed = ANA._replace(name="Ana2")
+    diff = roster.update([renamed, NEW])
+    assert diff.joined == [NEW]
+    assert diff.left == [BOB]
+    assert diff.renamed == [(ANA, renamed)]
+    assert roster.get(player_key(renamed)) == renamed
+
+
+def test_unchanged_snapshot_is_empty_and_not_published():
+    roster = Roster()
+    seen = []
+    roster.subscribe(seen.append)
+    roster.update([ANA])
+    diff = roster.update([ANA])
+    assert not diff
+    assert len(seen) == 1
+
+
+def test_player_without_steamid_is_keyed_by_playeruid():
+    assert player_key(NEW) == "3"
+    assert player_key(ANA) == ANA.steamid
+
+
+def test_clear_reports_everyone_leaving():
+    roster = Roster()
+    roster.update([ANA, BOB])
+    assert roster.clear().left == [ANA, BOB]
+    assert len(roster) == 0
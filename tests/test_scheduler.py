@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from utils.pal_exceptions import QueueFull
+from utils.scheduler import CommandScheduler, Priority, TokenBucket
+
+SERVER = ("127.0.0.1", 25575, "password")
+
+
+class Recorder:
+    """ Requests that note the order they start in, and optionally wait for `release` before answering """
+
+    def __init__(self):
+        self.started = []
+        self.release = asyncio.Event()
+
+    def request(self, name, hold: bool = False):
+        async def run():
+            self.started.append(name)
+            if hold:
+                await self.release.wait()
+            return name
+        return run
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_priority_order_then_queue_order():
+    async def main():
+        scheduler = CommandScheduler(rate=0, concurrency=1)
+        recorder = Recorder()
+        first = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("first", hold=True)))
+        await settle()
+        queued = [asyncio.ensure_future(scheduler.submit(SERVER, recorder.request(name), priority))
+                  for name, priority in (("poll", Priority.POLLING), ("kick", Priority.MODERATION),
+                                         ("console", Priority.INTERACTIVE), ("ban", Priority.MODERATION))]
+        await settle()
+        recorder.release.set()
+        await asyncio.gather(first, *queued)
+        return recorder.started
+
+    assert asyncio.run(main()) == ["first", "console", "kick", "ban", "poll"]
+
+
+def test_concurrency_limit():
+    async def main():
+        scheduler = CommandScheduler(rate=0, concurrency=2)
+        recorder = Recorder()
+        jobs = [asyncio.ensure_future(scheduler.submit(SERVER, recorder.request(i, hold=True))) for i in range(5)]
+        await settle()
+        in_flight = len(recorder.started)
+        recorder.release.set()
+        return in_flight, await asyncio.gather(*jobs)
+
+    assert asyncio.run(main()) == (2, [0, 1, 2, 3, 4])
+
+
+def test_stale_poll_is_replaced_and_both_callers_get_the_new_response():
+    async def main():
+        scheduler = CommandScheduler(rate=0, concurrency=1)
+        recorder = Recorder()
+        busy = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("busy", hold=True)))
+        await settle()
+        old = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("old"), Priority.POLLING,
+                                                     coalesce=("ShowPlayers", ())))
+        new = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("new"), Priority.POLLING,
+                                                     coalesce=("ShowPlayers", ())))
+        await settle()
+        recorder.release.set()
+        return await asyncio.gather(busy, old, new), recorder.started
+
+    assert asyncio.run(main()) == (["busy", "new", "new"], ["busy", "new"])
+
+
+def test_full_queue_drops_a_poll_for_a_more_urgent_command():
+    async def main():
+        scheduler = CommandScheduler(rate=0, max_queue=1, concurrency=1)
+        recorder = Recorder()
+        busy = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("busy", hold=True)))
+        await settle()
+        poll = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("poll"), Priority.POLLING))
+        await settle()
+        with pytest.raises(QueueFull):
+            await scheduler.submit(SERVER, recorder.request("another poll"), Priority.POLLING)
+        console = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("console")))
+        await settle()
+        recorder.release.set()
+        results = await asyncio.gather(busy, poll, console, return_exceptions=True)
+        return [type(result) if isinstance(result, Exception) else result for result in results]
+
+    assert asyncio.run(main()) == ["busy", QueueFull, "console"]
+
+
+def test_cancelling_one_waiter_leaves_the_other_its_result():
+    async def main():
+        scheduler = CommandScheduler(rate=0, concurrency=1)
+        recorder = Recorder()
+        busy = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("busy", hold=True)))
+        await settle()
+        key = ("ShowPlayers", ())
+        first = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("poll"), Priority.POLLING,
+                                                       coalesce=key))
+        second = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("poll"), Priority.POLLING,
+                                                        coalesce=key))
+        await settle()
+        second.cancel()
+        await settle()
+        recorder.release.set()
+        return await first, second.cancelled()
+
+    assert asyncio.run(main()) == ("poll", True)
+
+
+def test_abandoned_request_is_never_sent():
+    async def main():
+        scheduler = CommandScheduler(rate=0, concurrency=1)
+        recorder = Recorder()
+        busy = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("busy", hold=True)))
+        await settle()
+        waiting = asyncio.ensure_future(scheduler.submit(SERVER, recorder.request("abandoned")))
+        await settle()
+        waiting.cancel()
+        await settle()
+        recorder.release.set()
+        await busy
+        await settle()
+        return recorder.started, scheduler.depth(SERVER)
+
+    assert asyncio.run(main()) == (["busy"], 0)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.delay() == 0
+    bucket.take()
+    bucket.take()
+    assert 0 < bucket.delay() <= 0.1
+    assert TokenBucket(rate=0, burst=1).delay(5) == 0
+
+
+def test_moderation_goes_past_the_concurrency_limit():
+    async def main():
+        scheduler = CommandScheduler(rate=0, concurrency=2, moderation_concurrency=4)
+        recorder = Recorder()
+        polls = [asyncio.ensure_future(scheduler.submit(SERVER, recorder.request(f"poll {i}", hold=True),
+                                                        Priority.POLLING)) for i in range(3)]
+        await settle()
+        kicks = [asyncio.ensure_future(scheduler.submit(SERVER, recorder.request(f"kick {i}", hold=True),
+                                                        Priority.MODERATION)) for i in range(4)]
+        await settle()
+        started = list(recorder.started)
+        recorder.release.set()
+        await asyncio.gather(*polls, *kicks)
+        return started
+
+    assert asyncio.run(main()) == ["poll 0", "poll 1", "kick 0", "kick 1"]
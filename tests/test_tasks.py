@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from utils.tasks import ScheduledTask, TaskEngine, save_tasks, parse_duration, parse_start
+import config
+
+CREDENTIALS = {"ipaddr": "127.0.0.1", "port": 1, "password": ""}
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_parse_duration():
+    assert parse_duration("90") == 90
+    assert parse_duration("1h30m") == 5400
+    assert parse_duration("1d") == 86400
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+
+def test_parse_start():
+    now = time.mktime((2026, 1, 1, 12, 0, 0, 0, 0, -1))
+    assert parse_start("+10m", now) == now + 600
+    assert parse_start("13:00", now) == now + 3600
+    assert parse_start("11:00", now) == now + 23 * 3600
+
+
+def test_one_off_task_needs_a_start_time():
+    with pytest.raises(ValueError):
+        ScheduledTask("restart", "restart")
+    assert ScheduledTask("restart", "restart", at=time.time() + 60).interval is None
+
+
+def test_idle_engine_picks_up_tasks_written_to_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "tasks_check_interval", 0.05)
+    path = str(tmp_path / "tasks.json")
+    engine = TaskEngine(CREDENTIALS, path).start()
+    try:
+        assert wait_until(lambda: engine.active)
+        assert not engine.tasks and not engine._heap
+
+        save_tasks([ScheduledTask("save", "save", interval=3600)], path)
+        assert wait_until(lambda: "save" in engine.tasks)
+        assert wait_until(lambda: any(name == "save" for _, _, _, name, _ in engine._heap))
+    finally:
+        engine.stop()
+        assert wait_until(lambda: not engine.active)
@@ -0,0 +1,64 @@
+import json
+import asyncio
+
+import pytest
+
+from utils import application_utilities
+from utils.application_utilities import async_send_command, get_player_list
+from utils.event_loop import rcon_loop
+from utils.history import history
+from utils.mock_server import MockRconServer
+from utils.players import Player
+from utils.transcript import TranscriptWriter, INDEX_NAME, search
+
+STEAMID = "76561197960265729"
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    writer = TranscriptWriter(directory=str(tmp_path))
+    writer.enabled = True
+    monkeypatch.setattr(application_utilities, "transcript", writer)
+    monkeypatch.setattr(history, "enabled", False)
+    return writer
+
+
+def read_records(writer) -> list:
+    writer.close()
+    return list(search(writer.directory))
+
+
+def test_only_player_command_arguments_are_indexed(writer):
+    writer.record_command("server:1", "Shutdown", ("30", "Restarting"), response="The server will shut down\n")
+    writer.record_command("server:1", "KickPlayer", (STEAMID,), response=f"Kicked: {STEAMID}\n")
+    writer.record_players("server:1", [Player("Ana", "1234", "76561197960265730")])
+    writer.close()
+
+    with open(f"{writer.directory}/{INDEX_NAME}", encoding="utf-8") as index:
+        entry = json.loads(index.readline())
+    assert entry['players'] == [STEAMID, "76561197960265730"]
+    assert [record['command'] for record in search(writer.directory, player=STEAMID)] == ["KickPlayer"]
+    assert list(search(writer.directory, player="30")) == []
+
+
+def test_show_players_from_the_console_is_transcribed_once(writer):
+    server = MockRconServer(players=2)
+    rcon_loop.run(server.start())
+    try:
+        response = rcon_loop.run(async_send_command(server.credentials, "ShowPlayers"))
+        players = rcon_loop.run(get_player_list(server.credentials))
+    finally:
+        rcon_loop.run(server.stop())
+
+    records = read_records(writer)
+    assert [record['kind'] for record in records] == ["command", "players"]
+    assert records[0]['command'] == "ShowPlayers" and records[0]['response'] == response
+    assert records[1]['players'] == [player.steamid for player in players]
+
+
+def test_errors_are_transcribed_even_for_polls(writer):
+    credentials = {"ipaddr": "127.0.0.1", "port": 1, "password": ""}
+    with pytest.raises((ConnectionError, OSError, asyncio.TimeoutError)):
+        rcon_loop.run(get_player_list(credentials))
+    records = read_records(writer)
+    assert records[0]['command'] == "ShowPlayers" and "error" in records[0]
@@ -1,3 +1,30 @@
-from .application_utilities import *
-from .pal_exceptions import *
-from .button_functions import *
+"""
+utils
+
+The public helpers of every submodule below are available as `utils.<name>`, but submodules are only imported on
+first use: importing a single module such as `utils.ui_dispatch` does not pull in the whole RCON stack.
+"""
+import importlib
+
+_SUBMODULES = (
+    "application_utilities",
+    "pal_exceptions",
+    "roster",
+    "fleet",
+    "button_functions"
+)
+
+
+def __getattr__(name: str):
+    if name == "__all__":
+        names = tuple(exported for module in _SUBMODULES
+                      for exported in importlib.import_module(f"{__name__}.{module}").__all__)
+        globals()['__all__'] = names
+        return names
+
+    for module in _SUBMODULES:
+        module = importlib.import_module(f"{__name__}.{module}")
+        if name in module.__all__:
+            value = globals()[name] = getattr(module, name)
+            return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,18 +1,30 @@
 import re
-import webbrowser
+import time
 import asyncio
-import concurrent.futures
 from logging import getLogger
-
-import customtkinter
-import rcon
-from rcon.source.client import Client, Packet
+from typing import TYPE_CHECKING
 
 from utils.pal_exceptions import *
+from utils.connection_pool import connection_pool
+from utils.event_loop import rcon_loop
+from utils.transcript import transcript
+from utils.history import history
+from utils.bans import ban_list
+from utils.response_cache import response_cache
+from utils.scheduler import Priority, command_scheduler
+from utils.metrics import metrics
+from utils.window import center_window, open_site  # Re-exported, they used to live here
+from utils.broadcast import format_message
+from utils.commands import registry
+from utils.players import Player, parse_players
 import config
 
+if TYPE_CHECKING:  # Only needed for annotations - keeps Tk out of headless imports
+    import customtkinter
+
 __all__ = (
     "async_send_command",
+    "async_send_batch",
     "valid_input",
     "is_valid_ip",
     "center_window",
@@ -25,130 +37,156 @@ __all__ = (
 LOGGER = getLogger(__file__)
 
 
-class MyClient(Client):
-    # Palworld does not respond, so was killing the program. Have to make our own
-    def read(self):
-        with self._socket.makefile("rb") as file:
-            response = Packet.read(file)
-            return response
-
-
-async def async_send_command(credentials: dict, command: str, *arguments: str) -> str:
+async def async_send_command(credentials: dict, command: str, *arguments: str,
+                             priority: Priority = Priority.INTERACTIVE, transcribe: bool = True) -> str:
     """
     Send an RCON command to a server.
 
     Args:
     - credentials (dict): Dictionary containing RCON connection details (ipaddr, port, password).
     - command (str): RCON command to be executed.
-    - arguments (str): Arguments for the command.
+    - arguments (str): Arguments for the command - one argument string as typed, or already split.
+    - priority (Priority): Where the command is queued for the server (see `utils.scheduler`).
+    - transcribe (bool): Record the response in the transcript. Errors are recorded either way.
 
-    Internal Functions:
-    - run_command() -> None: Function that allows async operation of the RCON connection on a separate thread.
-    """
-    ipaddr = credentials['ipaddr']
-    port = credentials['port']
-    password = credentials['password']
+    Raises:
+    - ValueError: Not a valid server command, or arguments that do not fit it (see `utils.commands`).
+    - QueueFull: Too many commands are already waiting for the server.
 
-    command, arguments = sanitize_input(command, arguments)
+    Note:
+    - Can be awaited from any event loop. The command itself always runs on `rcon_loop`, which owns the
+      pooled connections. Cancelling the caller cancels the request, unless another caller is waiting for the
+      same response - a cached read already in flight, or a poll it replaced in the queue.
+    - A Broadcast too long for one packet is sent as several, `config.broadcast_interval` seconds apart, and
+      their responses are joined.
+    """
+    command, packets = registry.packets(command, arguments)
+    server = f"{credentials['ipaddr']}:{credentials['port']}"
 
-    response = ""
+    responses = []
+    for index, arguments in enumerate(packets):
+        if index:
+            await asyncio.sleep(config.broadcast_interval)
+        responses.append(await _send_packet(credentials, server, command, arguments, priority, transcribe))
+    return "".join(responses)
 
-    def run_command():
-        """
-        Internal function to execute the RCON command in a separate thread.
 
-        Returns:
-        - bool: True if the command is successfully sent, False otherwise.
-        """
-        nonlocal response
+async def _send_packet(credentials: dict, server: str, command: str, arguments: tuple, priority: Priority,
+                       transcribe: bool) -> str:
+    """ Send one validated command, recording it in the metrics and the transcript """
+    LOGGER.debug(f"Starting Communication to Server...\nCommand: {command}\nArguments: {arguments if arguments else 'None Provided'}\nConnecting to: {server}")
 
-        print(f"Starting Communication to Server...\nCommand: {command}\nArguments: {arguments if arguments else 'None Provided'}\nConnecting to: {credentials['ipaddr']}:{credentials['port']}")
+    key = connection_pool.key(credentials)
+    coalesce = (command, arguments) if priority is Priority.POLLING else None
+    start = time.perf_counter()
 
-        try:
-            with Client(ipaddr, port, passwd=password) as client:
-                request = client.run(command, *arguments, encoding="ISO-8859-1", enforce_id=False)
-                # request = Packet.make_command(command, *arguments, encoding="ISO-8859-1")
-                # client.send(request)
-
-            print(request)
-            response = request
-            return response
-        except rcon.exceptions.WrongPassword as err:
-            print(err)
-            raise rcon.exceptions.WrongPassword
-        except rcon.exceptions.SessionTimeout as err:
-            print(f"Session Timed Out - {err}")
-            raise rcon.exceptions.SessionTimeout
-        except TimeoutError as err:
-            print(f"Request Timed Out - {err}")
-            raise TimeoutError
-        except asyncio.CancelledError as err:
-            print(f"Request Cancelled - {err}")
-            return asyncio.CancelledError
-        except Exception as err:
-            print(f"Unhandled Exception: {err}")
-            raise Exception
-        finally:
-            print("Finished Communication to Server. Closing connection")
+    try:
+        response = await rcon_loop.call(response_cache.fetch(
+            key, command, arguments,
+            lambda: command_scheduler.submit(key, lambda: connection_pool.run(credentials, command, *arguments),
+                                             priority, coalesce=coalesce)))
+    except asyncio.CancelledError:
+        LOGGER.info("Request Cancelled")
+        raise
+    except Exception as err:
+        if isinstance(err, WrongPassword):
+            LOGGER.warning(err)
+        elif isinstance(err, SessionTimeout):
+            LOGGER.warning(f"Session Timed Out - {err}")
+        elif isinstance(err, TimeoutError):
+            LOGGER.warning(f"Request Timed Out - {err}")
+        elif isinstance(err, QueueFull):
+            LOGGER.warning(f"Request Not Sent - {err}")
+        else:
+            LOGGER.error(f"Unhandled Exception: {err}")
+        metrics.record_command(server, command, time.perf_counter() - start, error=err)
+        transcript.record_command(server, command, arguments, error=f"{type(err).__name__}: {err}")
+        raise
+    finally:
+        LOGGER.debug("Finished Communication to Server.")
+
+    metrics.record_command(server, command, time.perf_counter() - start)
+    LOGGER.debug(response)
+    if transcribe:
+        transcript.record_command(server, command, arguments, response=response)
+    _record_ban(server, command, arguments, response)
+    return response
 
-    loop = asyncio.get_event_loop()
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        try:
-            return await loop.run_in_executor(executor, run_command)
-        except asyncio.CancelledError:
-            print("Task Cancelled (outside run_in_executor)")
 
-    return response
+def _record_ban(server: str, command: str, arguments: tuple, response: str):
+    """ Keep the local ban list in step with every BanPlayer the server carried out. Bans by playeruid are skipped """
+    if command == "BanPlayer" and not response.startswith("Failed"):
+        ban_list.record(server, arguments[0])
 
 
-def sanitize_input(command: str, args: tuple) -> tuple:
-    """Sanitizes the input of the `async_send_command()` function. This is to prevent arbitrary input,
-        and verify that only correct commands are being served. Handles each command differently.
+async def async_send_batch(credentials: dict, commands: list, priority: Priority = Priority.INTERACTIVE) -> list:
+    """
+    Send several RCON commands to a server back-to-back over a single connection.
 
     Args:
-        command: (str): The command that should be checked.
-        args: (tuple): A tuple of arguments. This is passed as (args,).
+    - credentials (dict): Dictionary containing RCON connection details (ipaddr, port, password).
+    - commands (list): Ordered (command, arguments) pairs, where arguments is a tuple of strings.
+    - priority (Priority): Where the batch is queued for the server. Each back-to-back run is queued as one entry.
 
     Returns:
-        tuple: Will return a tuple of (command, args) to be passed to rcon
+    - list: The responses, in the same order as `commands`.
 
     Note:
-    - If a new command is added to config.valid_commands, a new check must be added here. This might not be the best way.
+    - A Broadcast too long for one packet is sent as several. The batch pauses `config.broadcast_interval` seconds
+      before each packet after a message's first, and the message's responses are joined.
     """
-    if command.lower() == "broadcast":
-        message_raw = args[0]
-        if len(message_raw) > 39:
-            message = format_message(message_raw, max_length=40, ret="\n")  # Breaks message into 40 character long strings with newlines to fit in PalWorld chat
-            message = message.replace(" ", "\u00A0")
-        else:
-            message = message_raw.replace(" ", "\u00A0")
-
-        return "Broadcast", (message,)
-
-    elif command.lower() == "info":
-        return "Info", ""
-
-    elif command.lower() == "kickplayer":
-        return "KickPlayer", args
-
-    elif command.lower() == "showplayers":
-        return "ShowPlayers", ""
-
-    elif command.lower() == "shutdown":
-        message_raw = args[0]
-        message_split = message_raw.split(maxsplit=1)
-        time = message_split[0]
-        try:
-            time = int(time)
-        except ValueError:
-            return "Info", ""  # Returning info until we get a way to communicate
-        message = message_split[1].replace(" ", "\u00A0")
-        message = (time, message)
-
-        return "Shutdown", message
+    # Each run is sent back-to-back. A new run starts at every continuation packet, so there is a pause before it
+    runs, owners = [[]], []
+    for owner, (command, arguments) in enumerate(commands):
+        command, packets = registry.packets(command, tuple(arguments))
+        for index, arguments in enumerate(packets):
+            if index:
+                runs.append([])
+            runs[-1].append((command, arguments))
+            owners.append(owner)
+    commands = [packet for run in runs for packet in run]
+
+    LOGGER.debug(f"Starting Batch Communication to Server...\nCommands: {[command for command, _ in commands]}\nConnecting to: {credentials['ipaddr']}:{credentials['port']}")
+
+    server = f"{credentials['ipaddr']}:{credentials['port']}"
+    key = connection_pool.key(credentials)
+    start = time.perf_counter()
 
-
-async def valid_input(screen: customtkinter.CTk, credentials: dict) -> bool | str:
+    try:
+        responses = []
+        for index, run in enumerate(runs):
+            if index:
+                await asyncio.sleep(config.broadcast_interval)
+            responses += await rcon_loop.call(command_scheduler.submit(
+                key, lambda run=run: connection_pool.run_batch(credentials, run), priority, cost=len(run)))
+    except asyncio.CancelledError:
+        LOGGER.info("Batch Cancelled")
+        raise
+    except Exception as err:
+        LOGGER.warning(f"Batch Failed - {type(err).__name__}: {err}")
+        for command, arguments in commands:
+            metrics.record_command(server, command, time.perf_counter() - start, error=err)
+            transcript.record_command(server, command, arguments, error=f"{type(err).__name__}: {err}")
+        raise
+    finally:
+        mutated = [command for command, _ in commands if command in response_cache.invalidated_by]
+        for command in mutated:
+            rcon_loop.call_soon(response_cache.invalidate, connection_pool.key(credentials),
+                                *response_cache.invalidated_by[command])
+        LOGGER.debug("Finished Batch Communication to Server.")
+
+    elapsed = time.perf_counter() - start
+    LOGGER.debug(responses)
+    joined = [""] * (owners[-1] + 1 if owners else 0)
+    for (command, arguments), owner, response in zip(commands, owners, responses):
+        metrics.record_command(server, command, elapsed)
+        transcript.record_command(server, command, arguments, response=response)
+        _record_ban(server, command, arguments, response)
+        joined[owner] += response
+    return joined
+
+
+async def valid_input(screen: "customtkinter.CTk", credentials: dict) -> bool | str:
     """Test if the provided credentials were accurate, and of correct type.
 
     Args:
@@ -207,7 +245,7 @@ async def valid_input(screen: customtkinter.CTk, credentials: dict) -> bool | st
             else:
                 valid_cred.append(False)
                 print("Appending False")
-        except rcon.exceptions.WrongPassword as err:
+        except WrongPassword as err:
             screen.password_entry.delete(0, len(screen.password_entry.get()))
             screen.password_entry.configure(border_color='#E53030')
             screen.error_label.configure(text="[ Error ]\nInvalid Password")
@@ -226,24 +264,25 @@ async def valid_input(screen: customtkinter.CTk, credentials: dict) -> bool | st
     return False
 
 
-async def get_player_list(credentials) -> list[tuple]:
-
-    players_online = []
+async def get_player_list(credentials, priority: Priority = Priority.POLLING) -> list[Player]:
+    """Fetch the players online on a server.
 
-    player_info_string = await async_send_command(credentials, "ShowPlayers")
-
-    lines = player_info_string.split("\n")
-
-    header = lines[0].split(",")
-    lines = lines[1:]
+    Args:
+        credentials: (dict): RCON connection details (ipaddr, port, password).
+        priority: (Priority): Polls by default, so an identical poll still waiting in the queue is replaced.
 
-    for line in lines:
-        values = line.split(",")
-        player_info = tuple(values)
-        players_online.append(player_info)
+    Returns:
+        list[Player]: (name, playeruid, steamid) records, in the order the server listed them.
+    """
+    # Recorded as a parsed snapshot rather than the raw response
+    players_online = parse_players(await async_send_command(credentials, "ShowPlayers", priority=priority,
+                                                            transcribe=False))
 
-    print(f"Get Player List: {players_online}")
-    return players_online[:-1]
+    server = f"{credentials['ipaddr']}:{credentials['port']}"
+    transcript.record_players(server, players_online)
+    history.record_players(server, players_online)
+    LOGGER.debug(f"Get Player List: {players_online}")
+    return players_online
 
 
 def is_valid_ip(ip) -> bool:
@@ -252,47 +291,3 @@ def is_valid_ip(ip) -> bool:
         return True
     else:
         raise InvalidIpAddress
-
-
-def center_window(screen: customtkinter.CTk, width: int, height: int, scale_factor: float = 1.0) -> str:
-    screen_width = screen.winfo_screenwidth()
-    screen_height = screen.winfo_screenheight()
-    x = int(((screen_width/2) - (width/2)) * scale_factor)
-    y = int(((screen_height/2) - (height/1.5)) * scale_factor)
-
-    return f"{width}x{height}+{x}+{y}"
-
-
-def format_message(message, max_length=40, ret="\n") -> str:
-    """
-    Break a message into lines, ensuring each line is no longer than the specified maximum length.
-
-    Parameters:
-    - message (str): The input message to be broken into lines.
-    - max_length (int): The maximum length for each line (default is 40).
-    - ret (str): The string used to separate lines (default is "\n").
-
-    Returns:
-    - str: The formatted message with lines no longer than max_length.
-    """
-    result = []
-    current_line = ""
-
-    for word in message.split():
-        if len(current_line) + len(word) + 1 <= max_length:
-            current_line += f"{word} "
-        else:
-            result.append(current_line.strip())
-            current_line = f"{word} "
-
-    if current_line:
-        result.append(current_line.strip())
-    current = ""
-    for line in result:
-        current = f"{current + line}{ret}"
-    return current
-
-
-def open_site(url):
-    """ Opens provided website """
-    webbrowser.open_new(url)
@@ -0,0 +1,186 @@
+"""
+assets
+
+Loads the window's images without holding up the first paint.
+
+Images are shown from an on-disk cache of copies already scaled to the display (`AssetCache`), so a normal
+launch never decodes or resamples the full-size sources. Missing entries are created on a background thread
+(`prepare_images`) before the images are put on screen. Sizes needed to lay the window out are read straight
+from the file header.
+"""
+import os
+import shutil
+import struct
+import hashlib
+import threading
+
+import config
+
+__all__ = (
+    "image_size",
+    "AssetCache",
+    "prepare_images",
+    "asset_cache"
+)
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_JPEG_SIGNATURE = b"\xff\xd8"
+_JPEG_FRAME_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}  # SOFn; C4, C8 and CC are not frames
+
+
+def image_size(path: str) -> tuple:
+    """Read an image's (width, height) from its header, without decoding it.
+
+    Only PNG and JPEG are understood - the background patterns are JPEGs despite their extension.
+
+    Raises:
+        ValueError: The file is neither, or its header is damaged.
+    """
+    with open(path, "rb") as image:
+        header = image.read(24)
+        if header[:8] == _PNG_SIGNATURE and header[12:16] == b"IHDR":
+            return struct.unpack(">II", header[16:24])
+        if header[:2] == _JPEG_SIGNATURE:
+            return _jpeg_size(image, path)
+    raise ValueError(f"Not a PNG or JPEG image: {path}")
+
+
+def _jpeg_size(image, path: str) -> tuple:
+    """ Walk the JPEG segments up to the frame header, which holds the size """
+    image.seek(2)
+    while True:
+        marker = image.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF:
+            raise ValueError(f"Damaged JPEG header: {path}")
+        if marker[1] == 0xFF:
+            image.seek(-3, 1)  # Fill byte before the marker
+            continue
+        length = struct.unpack(">H", marker[2:])[0]
+        if marker[1] in _JPEG_FRAME_MARKERS:
+            height, width = struct.unpack(">xHH", image.read(5))
+            return width, height
+        image.seek(length - 2, 1)
+
+
+def _has_transparency(image) -> bool:
+    if image.mode in ("RGBA", "LA"):
+        return image.getchannel("A").getextrema()[0] < 255
+    return "transparency" in image.info  # Palette images and colour-keyed RGB
+
+
+class AssetCache:
+    """Pre-scaled, pre-decoded copies of image assets on disk, one per source image and pixel size.
+
+    Opaque images are stored as PPM and images with transparency as uncompressed PNG, both of which Tk reads
+    natively - so a cached image is shown without PIL decoding or resampling anything. Entries are keyed by the
+    source's path, modification time and target size, so editing an image or changing the display scaling
+    creates a new entry, and the entry it replaces is deleted.
+
+    Args:
+        directory: (str): Where cached images are kept. Defaults to `config.asset_cache_path`.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = config.asset_cache_path if directory is None else directory
+        self._lock = threading.Lock()
+
+    def _prefix(self, source: str, size: tuple) -> str:
+        source = os.path.abspath(source)
+        digest = hashlib.blake2s(source.encode("utf-8"), digest_size=4).hexdigest()
+        stem = os.path.splitext(os.path.basename(source))[0]
+        return f"{stem}-{digest}-{size[0]}x{size[1]}-"
+
+    def lookup(self, source: str, size: tuple) -> str | None:
+        """ The cached file for `source` at `size`, or None if it has not been created yet """
+        prefix = self._prefix(source, size)
+        mtime = os.stat(source).st_mtime_ns
+        for extension in (".ppm", ".png"):
+            path = os.path.join(self.directory, f"{prefix}{mtime}{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def ensure(self, source: str, size: tuple) -> str:
+        """Return the cached file for `source` scaled to `size` pixels, creating it first if needed.
+
+        Safe to call from any thread. Creating an entry decodes and resamples the source with PIL.
+        """
+        path = self.lookup(source, size)
+        if path is not None:
+            return path
+
+        from PIL import Image
+
+        with self._lock:
+            path = self.lookup(source, size)  # Another thread may have just created it
+            if path is not None:
+                return path
+
+            os.makedirs(self.directory, exist_ok=True)
+            mtime = os.stat(source).st_mtime_ns
+            with Image.open(source) as image:
+                transparent = _has_transparency(image)
+                image = image.convert("RGBA" if transparent else "RGB").resize(size, Image.Resampling.LANCZOS)
+            extension, options = (".png", {"compress_level": 0}) if transparent else (".ppm", {})
+
+            prefix = self._prefix(source, size)
+            path = os.path.join(self.directory, f"{prefix}{mtime}{extension}")
+            temporary = f"{path}.{os.getpid()}.tmp"
+            image.save(temporary, format=extension[1:].upper(), **options)
+            os.replace(temporary, path)
+            self._remove_stale(prefix, path)
+            return path
+
+    def _remove_stale(self, prefix: str, current: str):
+        """ Delete entries for the same source and size made from an older version of the source """
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(prefix) and path != current and not name.endswith(".tmp"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def photo_image(self, source: str, size: tuple):
+        """ Load the cached `source` at `size` as a Tk image. Must be called on the Tk main loop """
+        import tkinter
+        return tkinter.PhotoImage(file=self.ensure(source, size))
+
+    def clear(self):
+        """ Delete every cached image """
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+
+
+def prepare_images(dispatcher, images: list, callback, cache: AssetCache = None):
+    """Make sure images are cached at the sizes they will be shown at, then call `callback()` on the Tk main loop.
+
+    On a warm cache this only checks that the files exist; on a cold one the decoding and resampling happen on a
+    background thread instead of while the window is painting.
+
+    Args:
+        dispatcher: (UiDispatcher): Used to call `callback` on the main loop.
+        images: (list): (source path, (width, height) in pixels) pairs.
+        callback: Called with no arguments once every image is ready.
+        cache: (AssetCache): Defaults to `asset_cache`.
+
+    Returns:
+        threading.Thread: The thread preparing the images.
+    """
+    cache = asset_cache if cache is None else cache
+
+    def run():
+        for source, size in images:
+            try:
+                cache.ensure(source, size)
+            except (OSError, ValueError) as err:
+                print(f"Could not cache image {source} - {err}")
+        dispatcher.post(callback)
+
+    thread = threading.Thread(target=run, name="prepare-images", daemon=True)
+    thread.start()
+    return thread
+
+
+asset_cache = AssetCache()
@@ -0,0 +1,259 @@
+"""
+bans
+
+PalConnect's own record of whom it has banned. Palworld keeps its ban list to itself, so every successful
+BanPlayer - from the console, the Ban Player button or the command line - is recorded here with its reason, time,
+the server it was issued on and every server it has since been applied to.
+
+Bans are kept in a dict keyed by SteamID, so checking a player list against them costs O(1) per player however
+long the list grows. That is what lets every player list refresh look for ban evaders (see
+`utils.moderation.enforce_bans`), and lets a sync send a server only the bans it is missing.
+
+The list is stored in `config.bans_path`. It is read again whenever another PalConnect (say, the command line
+while the window is open) has changed the file, so neither overwrites the other's bans.
+"""
+import os
+import re
+import json
+import time
+import threading
+
+import config
+
+__all__ = (
+    "Ban",
+    "BanList",
+    "ban_list",
+    "steam_key",
+    "is_steamid",
+    "describe_bans"
+)
+
+
+_STEAMID = re.compile(r"(?:steam_)?\d{17}")  # A SteamID64, which a playeruid never looks like
+
+
+def steam_key(steamid: str) -> str:
+    """ Index key of a SteamID, which Palworld reports with or without a "steam_" prefix """
+    steamid = steamid.strip()
+    return steamid[6:] if steamid.startswith("steam_") else steamid
+
+
+def is_steamid(value: str) -> bool:
+    """ Whether `value` is a SteamID, rather than a playeruid that KickPlayer and BanPlayer also accept """
+    return _STEAMID.fullmatch(value.strip()) is not None
+
+
+def describe_bans(bans) -> str:
+    """ One line per ban, for the console and `palconnect bans list` """
+    return "\n".join(ban.describe() for ban in bans) or "No bans"
+
+
+class Ban:
+    """One banned player.
+
+    Attributes:
+        steamid: (str): SteamID, as it is sent to BanPlayer.
+        name: (str): Player name at the time of the ban, if it was known.
+        reason: (str): Why they were banned.
+        banned_at: (float): UNIX time of the ban.
+        server: (str): "ipaddr:port" of the server the ban was issued on.
+        applied: (set): "ipaddr:port" of every server the ban has been sent to.
+    """
+
+    __slots__ = ("steamid", "name", "reason", "banned_at", "server", "applied")
+
+    def __init__(self, steamid: str, name: str = "", reason: str = "", banned_at: float = None, server: str = "",
+                 applied=()):
+        self.steamid = steamid
+        self.name = name
+        self.reason = reason
+        self.banned_at = time.time() if banned_at is None else banned_at
+        self.server = server
+        self.applied = set(applied)
+        if server:
+            self.applied.add(server)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Ban":
+        return cls(data['steamid'], data.get('name', ""), data.get('reason', ""), data.get('banned_at'),
+                   data.get('server', ""), data.get('applied', ()))
+
+    def to_dict(self) -> dict:
+        return {"steamid": self.steamid, "name": self.name, "reason": self.reason, "banned_at": self.banned_at,
+                "server": self.server, "applied": sorted(self.applied)}
+
+    def describe(self) -> str:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.banned_at))
+        return (f"{self.steamid:<20} {self.name or '-':<20} {when}  on {self.server or '-'}"
+                f" ({len(self.applied)} server{'' if len(self.applied) == 1 else 's'})"
+                f"{f' - {self.reason}' if self.reason else ''}")
+
+    def __repr__(self) -> str:
+        return f"Ban({self.steamid!r}, {self.name!r}, applied={sorted(self.applied)})"
+
+
+class BanList:
+    """The local ban list, indexed by SteamID. Safe to use from any thread.
+
+    Args:
+        path: (str): The JSON file the list is kept in. Defaults to `config.bans_path`.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = config.bans_path if path is None else path
+        self._bans = {}  # steam_key -> Ban
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._mtime = None  # Modification time of the file as last read or written, None while there is no file
+        self._pending = []  # (server, steamid) applications made since the last save
+        self._timer = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._reload_if_changed()
+            return len(self._bans)
+
+    def __contains__(self, steamid: str) -> bool:
+        return self.get(steamid) is not None
+
+    def __iter__(self):
+        """ Bans, oldest first """
+        with self._lock:
+            self._reload_if_changed()
+            return iter(sorted(self._bans.values(), key=lambda ban: ban.banned_at))
+
+    def get(self, steamid: str) -> Ban | None:
+        with self._lock:
+            self._reload_if_changed()
+            return self._bans.get(steam_key(steamid))
+
+    def add(self, steamid: str, name: str = "", reason: str = "", server: str = "") -> Ban:
+        """Ban a player, or fill in the details of an existing ban. Saved straight away.
+
+        Args:
+            steamid: (str): SteamID of the player.
+            name: (str): Player name, if known.
+            reason: (str): Why they are banned.
+            server: (str): "ipaddr:port" of the server the ban was sent to, if it was.
+
+        Raises:
+            ValueError: `steamid` is not a SteamID.
+        """
+        if not is_steamid(steamid):
+            raise ValueError(f"Not a SteamID: {steamid}")
+        with self._lock:
+            self._reload_if_changed()
+            ban = self._bans.get(steam_key(steamid))
+            if ban is None:
+                ban = self._bans[steam_key(steamid)] = Ban(steamid, name, reason, server=server)
+            else:
+                ban.name = name or ban.name
+                ban.reason = reason or ban.reason
+                ban.server = ban.server or server
+                if server:
+                    ban.applied.add(server)
+            self._save()
+            return ban
+
+    def remove(self, steamid: str) -> Ban | None:
+        """ Forget a ban. It is not lifted on the servers it was applied to """
+        with self._lock:
+            self._reload_if_changed()
+            ban = self._bans.pop(steam_key(steamid), None)
+            if ban is not None:
+                self._save()
+            return ban
+
+    def record(self, server: str, steamid: str):
+        """Note that `server` accepted a BanPlayer for `steamid`, adding the ban if it is new.
+
+        Called from the command path for every successful BanPlayer, so the file is written shortly after rather
+        than once per command - a sync of hundreds of bans saves once. A ban by playeruid is not kept: the list is
+        matched and synced by SteamID only.
+        """
+        if not is_steamid(steamid):
+            return
+        with self._lock:
+            self._reload_if_changed()
+            self._apply(server, steamid)
+            self._pending.append((server, steamid))
+            if self._timer is None:
+                self._timer = threading.Timer(config.bans_save_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _apply(self, server: str, steamid: str):
+        ban = self._bans.get(steam_key(steamid))
+        if ban is None:
+            self._bans[steam_key(steamid)] = Ban(steamid, server=server)
+        else:
+            ban.server = ban.server or server
+            ban.applied.add(server)
+
+    def flush(self):
+        """ Save bans recorded since the last save """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending:
+                self._reload_if_changed()
+                self._save()
+
+    def evaders(self, players) -> list:
+        """Players on the ban list.
+
+        Args:
+            players: Records with a `steamid`, such as `Player` or the players who joined in a `RosterDiff`.
+
+        Returns:
+            list: (player, Ban) pairs, in the order of `players`.
+        """
+        with self._lock:
+            self._reload_if_changed()
+            bans = self._bans
+            return [(player, bans[key]) for player in players
+                    if player.steamid and (key := steam_key(player.steamid)) in bans]
+
+    def missing(self, server: str) -> list:
+        """ Bans that have not been applied to `server` ("ipaddr:port"), oldest first """
+        return [ban for ban in self if server not in ban.applied]
+
+    # - File
+
+    def _modified(self) -> float | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _reload_if_changed(self):
+        """ Read the file if it was never read, or was changed by someone else since """
+        modified = self._modified()
+        if self._loaded and modified == self._mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                # Bans by playeruid, recorded before only SteamIDs were kept, are dropped
+                bans = [ban for ban in map(Ban.from_dict, json.load(file)) if is_steamid(ban.steamid)]
+        except FileNotFoundError:
+            bans = []
+        self._bans = {steam_key(ban.steamid): ban for ban in bans}
+        self._loaded, self._mtime = True, modified
+        for server, steamid in self._pending:  # Applications not saved yet are not lost to the reload
+            self._apply(server, steamid)
+
+    def _save(self):
+        """ Replace the file in one step, so a crash cannot leave it half written """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump([ban.to_dict() for ban in sorted(self._bans.values(), key=lambda ban: ban.banned_at)],
+                      file, indent=2)
+        os.replace(temporary, self.path)
+        self._mtime = self._modified()
+        self._pending.clear()
+
+
+ban_list = BanList()
@@ -0,0 +1,116 @@
+"""
+broadcast
+
+Formatting for in-game chat messages. Palworld shows Broadcast text in a narrow chat box, cuts long messages short
+and treats a plain space in the command line as the end of the message. So messages are wrapped to short lines
+with their words joined by non-breaking spaces, and anything longer than one packet is split across several
+Broadcast packets (see Broadcast Options in config), which `async_send_command` sends a short interval apart.
+
+RCON payloads are ISO-8859-1 (see `utils.rcon_protocol`), so packets are measured in that encoding, and characters
+it cannot represent are replaced with "?" before a message is split - a message never fails halfway through being
+sent because a later packet could not be encoded.
+
+Wrapping is a single pass over the words. Words are joined once per line, never appended to a growing string, and
+the non-breaking spaces are the join separator rather than a replacement pass afterwards.
+"""
+from utils.rcon_protocol import ENCODING
+import config
+
+__all__ = (
+    "NBSP",
+    "wrap",
+    "encodable",
+    "non_breaking",
+    "format_message",
+    "broadcast_packets"
+)
+
+
+NBSP = "\u00A0"
+_NON_BREAKING = str.maketrans({" ": NBSP, "\t": NBSP})
+
+
+def wrap(message: str, width: int, separator: str = " ") -> list:
+    """Break a message into lines no longer than `width` characters.
+
+    Words are kept whole unless a single word is longer than `width`, which is broken across lines.
+
+    Args:
+        message: (str): Any text. Runs of whitespace, including newlines, count as one space.
+        width: (int): Longest line, in characters.
+        separator: (str): Put between the words of a line. Must be one character long.
+
+    Returns:
+        list: The lines, without trailing separators. Empty for a blank message.
+    """
+    lines, words, length = [], [], -1  # length counts the separator before the first word of the line
+    for word in message.split():
+        if length + 1 + len(word) > width:
+            if words:
+                lines.append(separator.join(words))
+                words, length = [], -1
+            while len(word) > width:
+                lines.append(word[:width])
+                word = word[width:]
+        words.append(word)
+        length += 1 + len(word)
+    if words:
+        lines.append(separator.join(words))
+    return lines
+
+
+def encodable(text: str) -> str:
+    """ Replace the characters an RCON payload cannot carry (anything outside ISO-8859-1) with "?" """
+    return text.encode(ENCODING, "replace").decode(ENCODING)
+
+
+def non_breaking(text: str) -> str:
+    """ Replace the spaces and tabs of a message with non-breaking spaces, and make it encodable """
+    return encodable(text).translate(_NON_BREAKING)
+
+
+def format_message(message, max_length=40, ret="\n") -> str:
+    """
+    Break a message into lines, ensuring each line is no longer than the specified maximum length.
+
+    Parameters:
+    - message (str): The input message to be broken into lines.
+    - max_length (int): The maximum length for each line (default is 40).
+    - ret (str): The string used to separate lines (default is "\n").
+
+    Returns:
+    - str: The formatted message with lines no longer than max_length, each followed by ret. Characters that
+      cannot be sent over RCON are replaced with "?".
+    """
+    lines = wrap(encodable(message), max_length)
+    return f"{ret.join(lines)}{ret}" if lines else ""
+
+
+def broadcast_packets(message: str, line_length: int = None, max_lines: int = None, max_bytes: int = None) -> list:
+    """Wrap a Broadcast message and split it into packets that each fit in the chat box.
+
+    Args:
+        message: (str): The message as typed.
+        line_length: (int): Characters per line. Defaults to `config.broadcast_line_length`.
+        max_lines: (int): Lines per packet. Defaults to `config.broadcast_max_lines`.
+        max_bytes: (int): Encoded bytes per packet. Defaults to `config.broadcast_max_bytes`.
+
+    Returns:
+        list: The text of each packet, lines separated by newlines and words by non-breaking spaces. Characters
+            that cannot be sent over RCON are replaced with "?".
+    """
+    line_length = config.broadcast_line_length if line_length is None else line_length
+    max_lines = config.broadcast_max_lines if max_lines is None else max_lines
+    max_bytes = config.broadcast_max_bytes if max_bytes is None else max_bytes
+
+    packets, lines, size = [], [], -1  # size counts the newline before the first line of the packet
+    for line in wrap(encodable(message), line_length, NBSP):
+        line_size = len(line.encode(ENCODING))
+        if lines and (len(lines) == max_lines or size + 1 + line_size > max_bytes):
+            packets.append("\n".join(lines))
+            lines, size = [], -1
+        lines.append(line)
+        size += 1 + line_size
+    if lines:
+        packets.append("\n".join(lines))
+    return packets
@@ -1,74 +1,151 @@
 import time
 import asyncio
-import tkinter
-import threading
-
-import customtkinter
+from logging import getLogger
 
 from utils.application_utilities import *
+from utils.event_loop import rcon_loop
+from utils.roster import player_key
+from utils.players import Player
+from utils.poller import AdaptivePoller
+from utils.connection_pool import connection_pool
+from utils.transcript import transcript
+from utils.history import history
+from utils.metrics import metrics
+from utils.commands import registry
+from utils.scheduler import Priority
+from utils.moderation import ACTIONS, moderate, enforce_bans, describe_sync
+from utils.bans import ban_list, describe_bans
+from utils.tasks import TaskEngine, describe_tasks
 import config
 
 __all__ = (
-    "sending",
     "rcon_query_button_function",
+    "run_console_command",
+    "console_write",
+    "show_error",
     "check_command",
+    "command_help",
+    "get_command_targets",
+    "update_poll_targets",
+    "format_fleet_results",
     "on_button_click",
-    "fetch_online_players",
+    "player_label",
+    "sync_player_list",
     "update_players",
-    "kick_player",
-    "testing"
+    "refresh_online_players",
+    "refresh_fleet_players",
+    "remove_ban_evaders",
+    "sync_ban_list",
+    "toggle_player_updates",
+    "status_text",
+    "update_status_panel",
+    "start_task_engine",
+    "close_application",
+    "moderate_players",
+    "kick_players",
+    "ban_players"
 )
 
 
-def sending(creds, command, *args):
-
-    loop = asyncio.get_event_loop()
-
-    async def run_sending():
-        if not loop.is_running():
-            result = loop.run_until_complete(async_send_command(creds, command, *args))
-            return result
-        else:
-            result = await async_send_command(creds, command, *args)
-            return result
-
-    if not loop.is_running():
-        return loop.run_until_complete(run_sending())
-    else:
-        return asyncio.create_task(run_sending())
+LOGGER = getLogger(__file__)
 
 
 def rcon_query_button_function(screen, rcon_credentials):
 
-    current_time = time.time()
-    local_time_struct = time.localtime(current_time)
-    formatted_local_time = time.strftime("%H:%M:%S", local_time_struct)
     screen.error_label.configure(text="")  # Reset error text
     entry_text = screen.command_entry.get()
-    try:
-        command, arguments = check_command(entry_text)
-        if not command:
-            screen.error_label.configure(text="[ ERROR ]\nCommand not valid. Type Help for info\n")
+    command, arguments = check_command(entry_text)
+    if not command:
+        screen.error_label.configure(text="[ ERROR ]\nCommand not valid. Type Help for info\n")
+        return
+    if not registry.get(command).local:
+        try:
+            registry.get(command).parse(arguments)  # Catch bad arguments before the line is cleared
+        except ValueError as err:
+            screen.error_label.configure(text=f"[ ERROR ]\nInvalid arguments\n{err}")
             return
 
-        print(f"Command: {command} Arguments: {arguments}")
+    print(f"Command: {command} Arguments: {arguments}")
+    screen.command_entry.delete(0, len(screen.command_entry.get()))
 
-        if command.lower() != "help":
-            result = sending(rcon_credentials, command, arguments)
-        else:
-            result = "Server Commands\n" + "\n".join([f"{key}: {value}" for key, value in config.valid_commands.items()])
+    if command.lower() == "help":
+        console_write(screen, command_help())
+        return
+    if command.lower() == "tasks":
+        console_write(screen, describe_tasks(list(screen.task_engine.tasks.values())))
+        return
+    if command.lower() == "bans":
+        console_write(screen, describe_bans(ban_list))
+        return
+    if command.lower() == "syncbans":
+        rcon_loop.submit(sync_ban_list(screen, get_command_targets(screen)))
+        return
+
+    # Runs on the background loop so the window stays responsive while the server answers
+    rcon_loop.submit(run_console_command(screen, rcon_credentials, command, arguments, get_command_targets(screen)))
 
-        text_entry = f"\n[ {formatted_local_time} ] - {result}\n"
-        screen.text_box.configure(state="normal")
-        screen.text_box.insert(tkinter.END, text_entry)
-        screen.text_box.see(tkinter.END)
-        screen.text_box.configure(state="disabled")
-        screen.command_entry.delete(0, len(screen.command_entry.get()))
+
+async def run_console_command(screen, rcon_credentials, command, arguments, targets):
+    """ Send a console command to its target servers, then post the result back to the console """
+    try:
+        if targets == [screen.primary_server]:
+            result = await async_send_command(rcon_credentials, command, arguments)
+        else:
+            result = format_fleet_results(await screen.fleet.fan_out(command, arguments, targets=targets))
+        console_write(screen, result)
 
     except ValueError as err:
-        screen.error_label.configure(text=f"[ ERROR ]\nNo command entered. Type Help for info\n{err}")
+        show_error(screen, f"[ ERROR ]\nInvalid arguments. Type Help for info\n{err}")
     except Exception as err:
-        screen.error_label.configure(text=f"[ ERROR ]\nUnexpected error. Please report on GitHub\n{err}")
+        show_error(screen, f"[ ERROR ]\nUnexpected error. Please report on GitHub\n{err}")
+
+
+def console_write(screen, text: str):
+    """ Append a timestamped entry to the console. Safe to call from any thread """
+    formatted_local_time = time.strftime("%H:%M:%S", time.localtime(time.time()))
+    screen.dispatcher.post_batched("console", lambda entries: _flush_console(screen, entries),
+                                   f"\n[ {formatted_local_time} ] - {text}\n")
+
+
+def _flush_console(screen, entries: list):
+    screen.text_box.append("".join(entries))
+
+
+def show_error(screen, text: str):
+    """ Show an error under the console. Safe to call from any thread """
+    screen.dispatcher.post(lambda: screen.error_label.configure(text=text), key="error-label")
+
+
+def get_command_targets(screen) -> list:
+    """Work out which servers of the fleet a console command should go to.
+
+    Returns:
+        list: Server names, based on the target selector - the logged-in server, the checked servers, or all.
+    """
+    mode = screen.target_selector.get()
+    if mode == "All Servers":
+        return screen.fleet.names
+    if mode == "Selected":
+        return screen.server_select_frame.get_checked_items() or [screen.primary_server]
+    return [screen.primary_server]
+
+
+def update_poll_targets(screen):
+    """Note which servers the player list poller refreshes, whenever the command target changes.
+
+    Called on the main thread, as the poller runs on `rcon_loop` and must not read the widgets itself.
+    """
+    screen.poll_targets = tuple(get_command_targets(screen))
+
+
+def format_fleet_results(results: dict) -> str:
+    """ Format the per-server results of a fan-out command for the console """
+    lines = []
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            result = f"Failed - {type(result).__name__}: {result}"
+        lines.append(f"[{name}] {result}")
+    return "\n".join(lines)
 
 
 def on_button_click(screen, rcon_credentials):
@@ -76,103 +153,192 @@ def on_button_click(screen, rcon_credentials):
 
 
 def check_command(entry: str) -> tuple:
-    valid_commands = [key.lower() for key in config.valid_commands.keys()]
-
-    if " " in entry:
-        command, arguments = entry.split(" ", maxsplit=1)
-    else:
-        command, arguments = entry, ""
+    """Look up the command a console line starts with.
 
-    if command.lower() in valid_commands:
-        return command, arguments
-    else:
+    Returns:
+        tuple: (command name, argument string), or (None, None) if it is not a valid command.
+    """
+    command, arguments = registry.split(entry)
+    if command is None:
         return None, None
+    return command.name, arguments
 
 
-# update_players loop updates every 30 seconds. Makes call to the server to see who's online
-def update_players(screen, rcon_credentials, loop):
-    time.sleep(5)
-    while True:
-        try:
-            fetch_online_players(screen, rcon_credentials, loop)
-        except (IOError, TimeoutError) as err:
-            print(f"Timed out. Retrying in 30 seconds")
-        time.sleep(30)
-        print("Update Players Loop - Updating")
+def command_help() -> str:
+    return "Server Commands\n" + "\n".join(f"{command.name}: {command.description}" for command in registry)
+
+
+def update_players(screen, rcon_credentials) -> AdaptivePoller:
+    """Start refreshing the player list in the background.
+
+    Refreshes speed up while players are joining or leaving, and slow down while nothing changes or the server
+    cannot be reached. See `utils.poller` and the player list options in `config`. Other servers the console is
+    targeting have their rosters refreshed alongside, so ban evaders are removed from them too.
+
+    Returns:
+        AdaptivePoller: The running poller, which can be paused, resumed or stopped.
+    """
+    async def poll():
+        others = [name for name in screen.poll_targets if name != screen.primary_server]
+        if not others:
+            return await refresh_online_players(screen, rcon_credentials)
+        diff, _ = await asyncio.gather(refresh_online_players(screen, rcon_credentials),
+                                       refresh_fleet_players(screen, others))
+        return diff
+
+    def on_error(err):
+        print(f"Update Players Loop - {type(err).__name__}: {err}. Backing off")
+
+    return AdaptivePoller(poll, initial_delay=5, on_error=on_error, name="update-players").start()
 
 
-players_shown = []
+async def refresh_online_players(screen, rcon_credentials, priority: Priority = Priority.POLLING):
+    """ Fetch the player list and apply whatever changed to the screen. Returns the `RosterDiff` """
+    result = await get_player_list(rcon_credentials, priority)
+    diff = screen.fleet[screen.primary_server].roster.update(result)
+    if diff:
+        # Several refreshes before the next redraw collapse into a single sync
+        screen.dispatcher.post(sync_player_list, screen, key="player-list")
+    if diff.joined and config.bans_enforce:
+        rcon_loop.submit(remove_ban_evaders(screen, rcon_credentials, diff.joined))
+    return diff
 
 
-def fetch_online_players(screen, rcon_credentials, loop):
+async def refresh_fleet_players(screen, names: list):
+    """ Refresh the rosters of other fleet servers, removing players on the local ban list who joined them """
+    for name, diff in (await screen.fleet.refresh_players(names)).items():
+        if isinstance(diff, Exception):
+            LOGGER.warning(f"Could not refresh the players of {name} - {type(diff).__name__}: {diff}")
+        elif diff.joined and config.bans_enforce:
+            rcon_loop.submit(remove_ban_evaders(screen, screen.fleet[name].credentials, diff.joined))
 
-    async def run_get_players():
-        players = await get_player_list(rcon_credentials)
-        return players
 
-    if not loop.is_running():
-        print("No event loop running")
-        result = loop.run_until_complete(run_get_players())
+async def remove_ban_evaders(screen, rcon_credentials, players):
+    """ Kick players who joined although they are on the local ban list, and say so in the console """
+    for player, outcome in await enforce_bans(rcon_credentials, players):
+        if isinstance(outcome, Exception):
+            console_write(screen, f"Could not remove banned player {player.name} - {type(outcome).__name__}: {outcome}")
+        else:
+            console_write(screen, f"Removed banned player {player.name} ({player.steamid})")
+
+
+async def sync_ban_list(screen, targets: list):
+    """ Send each target server the bans on the local ban list it is missing, then report per server """
+    results = await screen.fleet.sync_bans(targets)
+    console_write(screen, "\n".join(
+        f"[{name}] {f'{type(result).__name__}: {result}' if isinstance(result, Exception) else describe_sync(result)}"
+        for name, result in results.items()))
+
+
+def toggle_player_updates(screen):
+    """ Pause or resume background player list refreshes to match the auto-refresh switch """
+    if screen.auto_refresh_switch.get():
+        screen.player_poller.resume()
+        screen.player_poller.wake()
     else:
-        print("Event loop running")
-        result = asyncio.run_coroutine_threadsafe(run_get_players(), loop).result()
-    current_players = []
-
-    for player in result:
-        if player not in current_players:
-            current_players.append(player)
-        if player not in players_shown:
-            screen.player_config_frame.add_item(f"{player[0]} - {player[2]}")
-            players_shown.append(player)
-
-    for player in players_shown:
-        if player not in result:
-            screen.player_config_frame.radiobutton_variable.set("")
-            players_shown.remove(player)
-            screen.player_config_frame.remove_item(f"{player[0]} - {player[2]}")
-
-    # for player in players_shown:
-    #     if player not in players_shown and player in result:
-    #         screen.player_config_frame.add_item(f"{player[0]} - {player[2]}")
-    #         players_shown.append(player)
-    print(f"Current Players: {current_players}")
-    print(f"Players Shown: {players_shown}")
-    print(f"Result: {result}")
-
-
-def kick_player(screen, rcon_credentials, player_info, loop):
-
-    current_time = time.time()
-    local_time_struct = time.localtime(current_time)
-    formatted_local_time = time.strftime("%H:%M:%S", local_time_struct)
-    screen.error_label.configure(text="")  # Reset error text
-    player_name = player_info.split(' - ')[0]
-    player_uuid = player_info.split(' - ')[1]
+        screen.player_poller.pause()
 
-    async def run_kick_players():
-        try:
-            message = format_message(f"{player_name} was kicked from the server!")
-            await async_send_command(rcon_credentials, "KickPlayer", f"{player_uuid}")
-            await async_send_command(rcon_credentials, "Broadcast", message)
-            return True
 
-        except Exception as err:
-            print(err)
-            return False
+def status_text(summary: dict) -> str:
+    """ Two-line status panel text for a `Metrics.summary()` """
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1000:.0f} ms"
 
+    errors = ", ".join(f"{name} {count}" for name, count in sorted(summary['errors_by_type'].items()))
+    return (f"Requests {summary['commands']}   Errors {summary['errors']}{f' ({errors})' if errors else ''}\n"
+            f"Latency p50 {ms(summary['p50'])}  p95 {ms(summary['p95'])}   "
+            f"Connect {ms(summary['connect'])}  Auth {ms(summary['auth'])}")
+
+
+def update_status_panel(screen):
+    """ Refresh the status panel from the RCON metrics, then schedule the next refresh """
+    screen.status_label.configure(text=status_text(metrics.summary()))
+    screen.status_panel_job = screen.after(config.metrics_panel_interval, update_status_panel, screen)
+
+
+def start_task_engine(screen, rcon_credentials) -> TaskEngine:
+    """ Run the scheduled tasks against the logged-in server, reporting each run in the console """
+    def task_ran(task, warning, outcome):
+        event = task.name if warning is None else f"{task.name} ({warning:g}s warning)"
+        if isinstance(outcome, Exception):
+            console_write(screen, f"Scheduled task {event} failed - {type(outcome).__name__}: {outcome}")
+        else:
+            console_write(screen, f"Scheduled task {event}: {''.join(outcome).strip()}")
+
+    return TaskEngine(rcon_credentials, on_run=task_ran).start()
+
+
+def close_application(screen):
+    """ Stop background work and release server connections. `ServerConnectionScreen.close` then destroys the window """
+    if screen.player_poller is not None:
+        screen.player_poller.stop()
+    if screen.task_engine is not None:
+        screen.task_engine.stop()
+    metrics.stop_export()
     try:
-        loop = asyncio.get_running_loop()
-        asyncio.create_task(run_kick_players())
-    except RuntimeError:
-        loop = asyncio.get_event_loop()
-        asyncio.run_coroutine_threadsafe(run_kick_players(), loop)
+        rcon_loop.run(connection_pool.close(), timeout=2)
+    except Exception as err:
+        print(f"Could not close connections cleanly - {err}")
+    rcon_loop.stop()
+    transcript.close()
+    history.close()
+    ban_list.flush()
+
+
+def player_label(player: Player) -> str:
+    """ Text shown for a player in the player list """
+    return f"{player.name} - {player.steamid}"
 
-    kicked = f"\n[ {formatted_local_time} ] - Kicked {player_name} from the server!\n"
-    screen.text_box.configure(state="normal")
-    screen.text_box.insert(tkinter.END, kicked)
-    screen.text_box.see(tkinter.END)
-    screen.text_box.configure(state="disabled")
 
+def sync_player_list(screen):
+    """ Bring the player list in line with the roster, redrawing only the players that changed """
+    roster = screen.fleet[screen.primary_server].roster
+    screen.player_config_frame.sync({player_key(player): player_label(player) for player in roster})
 
-def testing(screen):
-    screen.player_config_frame.radiobutton_variable.set("")
+
+def moderate_players(screen, rcon_credentials, selected_keys: list, command: str):
+    """Kick or ban every selected player, several at a time, then announce them in one Broadcast.
+
+    Args:
+        screen: (customtkinter.CTk): The main window.
+        rcon_credentials: (dict): RCON connection details of the logged-in server.
+        selected_keys: (list): Player list keys of the checked players.
+        command: (str): "KickPlayer" or "BanPlayer".
+    """
+    screen.error_label.configure(text="")  # Reset error text
+    roster = screen.fleet[screen.primary_server].roster
+    players = [player for player in (roster.get(key) for key in selected_keys) if player is not None]
+    if not players:
+        screen.error_label.configure(text="[ ERROR ]\nNo player selected\n")
+        return
+    action, done, _ = ACTIONS[command]
+
+    async def run_moderation():
+        outcomes, announcement = await moderate(rcon_credentials, command, players)
+        failed = []
+        for player, outcome in outcomes:
+            if isinstance(outcome, Exception):
+                failed.append(player.name)
+                console_write(screen, f"Could not {action} {player.name} - {type(outcome).__name__}: {outcome}")
+            else:
+                console_write(screen, f"{done} {player.name} from the server!")
+        errors = [f"Could not {action} {', '.join(failed)}"] if failed else []
+        if isinstance(announcement, Exception):
+            errors.append(f"Could not announce it - {announcement}")
+        if errors:
+            show_error(screen, "[ ERROR ]\n" + "\n".join(errors) + "\n")
+
+        succeeded = [player_key(player) for player, outcome in outcomes if not isinstance(outcome, Exception)]
+        screen.dispatcher.post(lambda: screen.player_config_frame.set_checked(succeeded, False))
+        if screen.player_poller is not None:
+            screen.player_poller.wake()  # Kicked and banned players drop off the list straight away
+
+    rcon_loop.submit(run_moderation())
+
+
+def kick_players(screen, rcon_credentials, selected_keys: list):
+    moderate_players(screen, rcon_credentials, selected_keys, "KickPlayer")
+
+
+def ban_players(screen, rcon_credentials, selected_keys: list):
+    moderate_players(screen, rcon_credentials, selected_keys, "BanPlayer")
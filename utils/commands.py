@@ -0,0 +1,175 @@
+"""
+commands
+
+The registry of RCON commands PalConnect will send, built once from `config.valid_commands`.
+
+Each command's arguments are read from the placeholders at the start of its description, e.g.
+    "Shutdown": "{Seconds} {MessageText} Shut down the after {Seconds}, ..."
+and compiled into a single regular expression when the registry is built, so an unknown placeholder fails at
+import rather than when the command is first used. Looking a command up is a dict lookup on its lowercased name.
+
+Argument types:
+- SteamID: a SteamID64, optionally prefixed with "steam_".
+- Seconds: a whole number of seconds, converted to int.
+- MessageText: free text, always last. Its spaces are made non-breaking. Broadcast messages are also wrapped, and
+  split into several packets if they are too long for one (see `utils.broadcast`).
+"""
+import re
+
+from utils.broadcast import non_breaking, broadcast_packets
+import config
+
+__all__ = (
+    "ArgumentType",
+    "Command",
+    "CommandRegistry",
+    "registry"
+)
+
+
+class ArgumentType:
+    """ How one placeholder in a command description is matched and converted """
+
+    __slots__ = ("name", "pattern", "convert", "greedy")
+
+    def __init__(self, name: str, pattern: str, convert=str, greedy: bool = False):
+        self.name = name
+        self.pattern = pattern
+        self.convert = convert
+        self.greedy = greedy  # Takes the rest of the line, so it must be the last argument
+
+
+ARGUMENT_TYPES = {argument.name: argument for argument in (
+    ArgumentType("SteamID", r"(?:steam_)?\d{1,20}"),
+    ArgumentType("Seconds", r"\d{1,9}", int),
+    ArgumentType("MessageText", r"\S.*", greedy=True)
+)}
+
+# Commands handled by PalConnect itself rather than sent to the server
+LOCAL_COMMANDS = frozenset({"Help", "Tasks", "Bans", "SyncBans"})
+
+# Per-command changes to the converted arguments before they are sent. Each returns the arguments of every packet
+NORMALISERS = {
+    "Broadcast": lambda message: [(packet,) for packet in broadcast_packets(message)],
+    "Shutdown": lambda seconds, message: [(seconds, non_breaking(message))]
+}
+
+_PLACEHOLDERS = re.compile(r"\s*((?:\{\w+\}\s*)*)")
+_SEPARATOR = r"[ \t]+"  # Not \s - that would also match the non-breaking spaces of a normalised message
+
+
+class Command:
+    """A server command and its compiled argument schema.
+
+    Args:
+        name: (str): The command as Palworld spells it.
+        description: (str): Its entry in `config.valid_commands`, starting with its argument placeholders.
+        local: (bool): Handled by PalConnect instead of being sent to the server.
+        normaliser: Optional callable taking the converted arguments and returning a list of argument tuples,
+            one per packet to send.
+
+    Raises:
+        ValueError: The description uses an unknown placeholder, or free text before the last argument.
+    """
+
+    __slots__ = ("name", "description", "arguments", "local", "_normaliser", "_pattern")
+
+    def __init__(self, name: str, description: str, local: bool = False, normaliser=None):
+        self.name = name
+        self.description = description
+        self.local = local
+        self._normaliser = normaliser
+
+        placeholders = re.findall(r"\{(\w+)\}", _PLACEHOLDERS.match(description).group(1))
+        unknown = [placeholder for placeholder in placeholders if placeholder not in ARGUMENT_TYPES]
+        if unknown:
+            raise ValueError(f"{name}: unknown argument {', '.join(unknown)}. Known: {', '.join(ARGUMENT_TYPES)}")
+        self.arguments = tuple(ARGUMENT_TYPES[placeholder] for placeholder in placeholders)
+        if any(argument.greedy for argument in self.arguments[:-1]):
+            raise ValueError(f"{name}: free text can only be the last argument")
+
+        groups = _SEPARATOR.join(f"({argument.pattern})" for argument in self.arguments)
+        self._pattern = re.compile(groups, re.DOTALL)
+
+    @property
+    def usage(self) -> str:
+        return " ".join((self.name, *(f"{{{argument.name}}}" for argument in self.arguments)))
+
+    def parse(self, text: str) -> tuple:
+        """Validate and convert an argument string.
+
+        Returns:
+            tuple: The converted arguments, e.g. (30, "Restarting") for Shutdown.
+
+        Raises:
+            ValueError: The arguments do not fit the command.
+        """
+        match = self._pattern.fullmatch(text.strip(" \t"))
+        if match is None:
+            raise ValueError(f"Usage: {self.usage}")
+        return tuple(argument.convert(value) for argument, value in zip(self.arguments, match.groups()))
+
+    def packets(self, arguments: tuple) -> list:
+        """Validate arguments - either one argument string, or already split - and return the ones to send.
+
+        Returns:
+            list: The arguments of each packet. Only a Broadcast too long for one packet gives more than one.
+        """
+        converted = self.parse(" ".join(str(argument) for argument in arguments if argument != ""))
+        return self._normaliser(*converted) if self._normaliser else [converted]
+
+
+class CommandRegistry:
+    """ Commands by lowercased name """
+
+    def __init__(self, commands=()):
+        self._commands = {}
+        for command in commands:
+            self.add(command)
+
+    @classmethod
+    def from_config(cls, valid_commands: dict = None) -> "CommandRegistry":
+        valid_commands = config.valid_commands if valid_commands is None else valid_commands
+        return cls(Command(name, description, name in LOCAL_COMMANDS, NORMALISERS.get(name))
+                   for name, description in valid_commands.items())
+
+    def add(self, command: Command):
+        self._commands[command.name.lower()] = command
+
+    def __iter__(self):
+        return iter(self._commands.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._commands
+
+    def get(self, name: str) -> Command | None:
+        return self._commands.get(name.lower())
+
+    def split(self, entry: str) -> tuple:
+        """Split a console line into its command and argument string.
+
+        Returns:
+            tuple: (Command, arguments), or (None, None) if the line does not start with a known command.
+        """
+        name, _, arguments = entry.strip().partition(" ")
+        command = self._commands.get(name.lower())
+        return (command, arguments) if command is not None else (None, None)
+
+    def packets(self, name: str, arguments: tuple) -> tuple:
+        """Validate a server command and its arguments.
+
+        Returns:
+            tuple: (canonical name, list of the arguments of each packet to send).
+
+        Raises:
+            ValueError: Unknown or local command, or arguments that do not fit it.
+        """
+        command = self._commands.get(name.lower())
+        if command is None:
+            raise ValueError(f"Not a valid command: {name}")
+        if command.local:
+            raise ValueError(f"{command.name} is not a server command")
+        return command.name, command.packets(arguments)
+
+
+registry = CommandRegistry.from_config()
@@ -0,0 +1,169 @@
+"""
+connection_pool
+
+Keeps authenticated RCON connections open between commands so that a refresh, a kick or a console command
+does not pay for a TCP handshake, an auth round-trip and a teardown every time.
+
+Connections are pooled per (ipaddr, port, password). A connection that has been idle for longer than
+`config.rcon_idle_timeout` is closed the next time the pool is touched, and a connection that fails is thrown away.
+
+A command is retried once, on a freshly authenticated connection, only when that cannot run it twice: when the
+pooled connection was found closed before the command was written, or when the command is read-only (see
+`RETRY_SAFE`). A Broadcast, kick, ban or shutdown that fails after it was written may already have been carried
+out, so the error is raised instead.
+
+The pool is not thread-safe: use it from `utils.event_loop.rcon_loop`, which owns every connection.
+"""
+import time
+from contextlib import asynccontextmanager
+
+from utils.rcon_protocol import RconConnection
+from utils.pal_exceptions import SessionTimeout, EmptyResponse, StaleConnection
+from utils.metrics import metrics
+import config
+
+__all__ = (
+    "RETRY_SAFE",
+    "ConnectionPool",
+    "connection_pool"
+)
+
+
+# Commands that change nothing on the server, so running one twice after a failed read is harmless
+RETRY_SAFE = frozenset({"Info", "ShowPlayers"})
+
+
+class _PooledConnection:
+    """ An authenticated connection together with the time it was last handed back to the pool """
+
+    __slots__ = ("connection", "last_used")
+
+    def __init__(self, connection: RconConnection):
+        self.connection = connection
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Pool of authenticated RCON connections keyed by (ipaddr, port, password).
+
+    Args:
+        max_idle: (float): Seconds a connection may sit unused before it is closed.
+        max_size: (int): Maximum number of idle connections kept per server.
+        timeout: (float): Seconds to wait on the server for each response.
+    """
+
+    def __init__(self, max_idle: float = None, max_size: int = None, timeout: float = None):
+        self.max_idle = config.rcon_idle_timeout if max_idle is None else max_idle
+        self.max_size = config.rcon_pool_size if max_size is None else max_size
+        self.timeout = config.rcon_timeout if timeout is None else timeout
+        self._idle = {}
+
+    @staticmethod
+    def key(credentials: dict) -> tuple:
+        return credentials['ipaddr'], int(credentials['port']), credentials['password']
+
+    async def _checkout(self, key: tuple) -> _PooledConnection:
+        now = time.monotonic()
+        idle = self._idle.get(key, [])
+        while idle:
+            pooled = idle.pop()
+            if now - pooled.last_used <= self.max_idle and not pooled.connection.closed:
+                return pooled
+            await pooled.connection.close()
+
+        ipaddr, port, password = key
+        connection = await RconConnection.open(ipaddr, port, password, self.timeout)
+        metrics.record_connect(f"{ipaddr}:{port}", connection.connect_time, connection.auth_time)
+        return _PooledConnection(connection)
+
+    async def _checkin(self, key: tuple, pooled: _PooledConnection):
+        pooled.last_used = time.monotonic()
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_size and not pooled.connection.closed:
+            idle.append(pooled)
+        else:
+            await pooled.connection.close()
+
+    @asynccontextmanager
+    async def connection(self, credentials: dict):
+        """Hand out an authenticated connection for the duration of an `async with` block.
+
+        The connection goes back to the pool when the block exits normally, and is closed if the block raised.
+        """
+        key = self.key(credentials)
+        pooled = await self._checkout(key)
+        try:
+            yield pooled.connection
+        except BaseException:
+            await pooled.connection.close()
+            raise
+        await self._checkin(key, pooled)
+
+    async def run(self, credentials: dict, command: str, *arguments) -> str:
+        """Run a single command on a pooled connection, retrying once on a fresh one where that is safe.
+
+        Returns:
+            str: The decoded response from the server.
+        """
+        server = f"{credentials['ipaddr']}:{credentials['port']}"
+        for attempt in range(2):
+            try:
+                async with self.connection(credentials) as connection:
+                    start = time.perf_counter()
+                    response = await connection.run(command, *arguments)
+                    metrics.record_roundtrip(server, command, time.perf_counter() - start)
+                    return response
+            except (ConnectionError, EmptyResponse, SessionTimeout) as err:
+                await self._before_retry(credentials, err, attempt, command in RETRY_SAFE)
+
+    async def run_batch(self, credentials: dict, commands: list) -> list:
+        """Pipeline several commands over one pooled connection. See `RconConnection.run_batch`.
+
+        Returns:
+            list: The decoded responses, in the same order as `commands`.
+        """
+        server = f"{credentials['ipaddr']}:{credentials['port']}"
+        for attempt in range(2):
+            try:
+                async with self.connection(credentials) as connection:
+                    start = time.perf_counter()
+                    responses = await connection.run_batch(commands)
+                    # Pipelined, so each command's share of the batch stands in for its round trip
+                    share = (time.perf_counter() - start) / max(1, len(commands))
+                    for command, _ in commands:
+                        metrics.record_roundtrip(server, command, share)
+                    return responses
+            except (ConnectionError, EmptyResponse, SessionTimeout) as err:
+                await self._before_retry(credentials, err, attempt,
+                                         all(command in RETRY_SAFE for command, _ in commands))
+
+    async def _before_retry(self, credentials: dict, err: Exception, attempt: int, read_only: bool):
+        """ Re-raise `err` unless the command may be sent again, otherwise make way for a fresh connection """
+        if attempt or not (read_only or isinstance(err, StaleConnection)):
+            raise err
+        # The server dropped an idle socket - the rest of that server's idle sockets are suspect too, so drop them
+        # and retry once on a fresh, re-authenticated connection
+        metrics.record_reconnect(f"{credentials['ipaddr']}:{credentials['port']}")
+        await self.close(credentials)
+
+    async def prune(self):
+        """ Close every connection that has been idle for longer than `max_idle` """
+        now = time.monotonic()
+        for idle in self._idle.values():
+            expired = [pooled for pooled in idle if now - pooled.last_used > self.max_idle]
+            idle[:] = [pooled for pooled in idle if now - pooled.last_used <= self.max_idle]
+            for pooled in expired:
+                await pooled.connection.close()
+
+    async def close(self, credentials: dict = None):
+        """ Close pooled connections for one server, or every server if no credentials are given """
+        if credentials is None:
+            closing = [pooled for idle in self._idle.values() for pooled in idle]
+            self._idle.clear()
+        else:
+            closing = self._idle.pop(self.key(credentials), [])
+        for pooled in closing:
+            await pooled.connection.close()
+
+
+connection_pool = ConnectionPool()
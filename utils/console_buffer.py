@@ -0,0 +1,116 @@
+"""
+console_buffer
+
+The model behind the console: a bounded window onto every line the session has produced.
+
+Every line gets a sequence number. The newest `max_lines` lines are held in memory; older lines spill to an
+on-disk backlog (a temporary file, removed when the session ends) so memory stays flat however long the session
+runs. The console shows lines [view_start, total); scrolling back up past the top loads older lines from the
+backlog on demand, in chunks, without ever reading the whole file.
+"""
+import tempfile
+from array import array
+from collections import deque
+from itertools import islice
+
+import config
+
+__all__ = (
+    "ConsoleBuffer",
+)
+
+
+class ConsoleBuffer:
+    """A ring buffer of console lines with an on-disk backlog.
+
+    Args:
+        max_lines: (int): Lines kept in memory and shown by default. Defaults to `config.console_max_lines`.
+    """
+
+    def __init__(self, max_lines: int = None):
+        self.max_lines = config.console_max_lines if max_lines is None else max_lines
+        self._lines = deque()
+        self._spilled = 0  # Lines [0, spilled) are on disk, lines [spilled, total) are in memory
+        self._backlog = None
+        self._offsets = array("q")  # Byte offset of each spilled line in the backlog file
+        self.view_start = 0
+
+    @property
+    def total(self) -> int:
+        return self._spilled + len(self._lines)
+
+    @property
+    def has_older(self) -> bool:
+        """ True when there are lines above the top of the view that can be loaded """
+        return self.view_start > 0
+
+    def append(self, text: str, trim: bool = True) -> int:
+        """Add text to the end of the console.
+
+        Args:
+            text: (str): One or more lines. A trailing newline does not create an empty line.
+            trim: (bool): Shrink the view back to `max_lines`. Pass False while the user is reading older lines.
+
+        Returns:
+            int: How many lines dropped off the top of the view and should be removed from the widget.
+        """
+        self._lines.extend(text.splitlines())
+
+        overflow = len(self._lines) - self.max_lines
+        if overflow > 0:
+            self._spill(overflow)
+
+        if not trim:
+            return 0
+        trimmed = max(0, self.total - self.max_lines - self.view_start)
+        self.view_start += trimmed
+        return trimmed
+
+    def load_older(self, count: int = None) -> list:
+        """Extend the view upwards by up to `count` lines from the backlog.
+
+        Returns:
+            list: The loaded lines, oldest first, to be inserted at the top of the widget.
+        """
+        count = config.console_backlog_chunk if count is None else count
+        start = max(0, self.view_start - count)
+        lines = self._read(start, self.view_start)
+        self.view_start = start
+        return lines
+
+    def view(self) -> list:
+        """ Every line currently in view, oldest first """
+        return self._read(self.view_start, self.total)
+
+    def _spill(self, count: int):
+        if self._backlog is None:
+            self._backlog = tempfile.TemporaryFile("w+b", prefix="palconnect-console-")
+        self._backlog.seek(0, 2)
+        position = self._backlog.tell()
+        chunk = []
+        for _ in range(count):
+            data = self._lines.popleft().encode("utf-8") + b"\n"
+            self._offsets.append(position)
+            position += len(data)
+            chunk.append(data)
+        self._backlog.write(b"".join(chunk))
+        self._spilled += count
+
+    def _read(self, start: int, end: int) -> list:
+        lines = []
+        if start < self._spilled:
+            self._backlog.seek(self._offsets[start])
+            if end < self._spilled:
+                data = self._backlog.read(self._offsets[end] - self._offsets[start])
+            else:
+                data = self._backlog.read()
+            lines.extend(data.decode("utf-8").splitlines())
+        if end > self._spilled:
+            lines.extend(islice(self._lines, max(start, self._spilled) - self._spilled, end - self._spilled))
+        return lines
+
+    def close(self):
+        """ Delete the on-disk backlog """
+        if self._backlog is not None:
+            self._backlog.close()
+            self._backlog = None
@@ -0,0 +1,100 @@
+"""
+event_loop
+
+Runs one asyncio event loop on a daemon thread for all RCON traffic. Tk owns the main thread, so the GUI hands
+coroutines to this loop instead of blocking in `run_until_complete`, and every pooled connection lives on the
+loop that created it.
+"""
+import asyncio
+import threading
+import concurrent.futures
+
+__all__ = (
+    "BackgroundLoop",
+    "rcon_loop"
+)
+
+
+class BackgroundLoop:
+    """An asyncio event loop running on its own daemon thread. The thread is started on first use.
+
+    Args:
+        name: (str): Name given to the loop's thread.
+    """
+
+    def __init__(self, name: str = "rcon-loop"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                ready = threading.Event()
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run, args=(self._loop, ready), name=self.name,
+                                                daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    @property
+    def running(self) -> bool:
+        """ True once the loop has been started, until it is stopped """
+        loop = self._loop
+        return loop is not None and not loop.is_closed()
+
+    def in_loop(self) -> bool:
+        """ True when called from a coroutine or callback running on this loop """
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """ Schedule a coroutine on the loop from any thread, returning a thread-safe future for its result """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """ Run a coroutine on the loop and block the calling thread until it finishes """
+        if self.in_loop():
+            raise RuntimeError("BackgroundLoop.run() would deadlock when called from its own loop")
+        return self.submit(coro).result(timeout)
+
+    async def call(self, coro):
+        """Await a coroutine on this loop from whichever loop the caller is running on.
+
+        Cancelling the caller cancels the coroutine on the background loop as well.
+        """
+        if self.in_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def call_soon(self, callback, *args):
+        """ Thread-safe equivalent of `loop.call_soon` """
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout: float = 5.0):
+        """ Stop the loop and wait for its thread to exit """
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
+
+rcon_loop = BackgroundLoop()
@@ -0,0 +1,149 @@
+"""
+fleet
+
+Lets PalConnect manage several Palworld servers at once. Each server in the fleet has a name, its own
+credentials (and therefore its own pooled connection) and its own roster of online players.
+
+Commands can be fanned out to one, some, or all servers concurrently, with `config.fleet_max_concurrency`
+bounding how many servers are talked to at the same time. Results come back per server, with failures returned
+as the exception that was raised rather than aborting the whole fan-out.
+"""
+import asyncio
+
+from utils.application_utilities import async_send_command, get_player_list
+from utils.moderation import sync_bans
+from utils.roster import Roster
+import config
+
+__all__ = (
+    "FleetServer",
+    "Fleet"
+)
+
+
+class FleetServer:
+    """A named server within the fleet.
+
+    Args:
+        name: (str): Display name of the server, unique within the fleet.
+        credentials: (dict): RCON connection details (ipaddr, port, password).
+    """
+
+    def __init__(self, name: str, credentials: dict):
+        self.name = name
+        self.credentials = {
+            "ipaddr": credentials['ipaddr'],
+            "port": int(credentials['port']),
+            "password": credentials['password']
+        }
+        self.roster = Roster()
+
+    @property
+    def players(self) -> list:
+        return self.roster.players
+
+    def __repr__(self) -> str:
+        return f"FleetServer({self.name!r}, {self.credentials['ipaddr']}:{self.credentials['port']})"
+
+
+class Fleet:
+    """An ordered collection of named servers.
+
+    Args:
+        servers: (list): Server definitions as dicts with name, ipaddr, port and password keys.
+                         Defaults to `config.fleet_servers`.
+        max_concurrency: (int): Maximum number of servers a fan-out talks to at once.
+    """
+
+    def __init__(self, servers: list = None, max_concurrency: int = None):
+        self.max_concurrency = config.fleet_max_concurrency if max_concurrency is None else max_concurrency
+        self._servers = {}
+        for server in config.fleet_servers if servers is None else servers:
+            self.add(server['name'], server)
+
+    def __iter__(self):
+        return iter(self._servers.values())
+
+    def __len__(self) -> int:
+        return len(self._servers)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._servers
+
+    def __getitem__(self, name: str) -> FleetServer:
+        return self._servers[name]
+
+    @property
+    def names(self) -> list:
+        return list(self._servers)
+
+    def add(self, name: str, credentials: dict) -> FleetServer:
+        """ Add a server to the fleet, replacing any server already registered under the same name """
+        server = FleetServer(name, credentials)
+        self._servers[name] = server
+        return server
+
+    def remove(self, name: str):
+        self._servers.pop(name, None)
+
+    def select(self, targets=None) -> list:
+        """Resolve a target specification to a list of servers.
+
+        Args:
+            targets: None for every server, a single server name, or an iterable of server names.
+
+        Raises:
+            KeyError: A named server is not part of the fleet.
+        """
+        if targets is None:
+            return list(self._servers.values())
+        if isinstance(targets, str):
+            targets = (targets,)
+        return [self._servers[name] for name in targets]
+
+    async def fan_out(self, command: str, *arguments: str, targets=None) -> dict:
+        """Send the same command to several servers concurrently.
+
+        Args:
+            command: (str): RCON command to be executed.
+            arguments: (str): Arguments for the command.
+            targets: Servers to send to - see `select()`. Defaults to every server.
+
+        Returns:
+            dict: Server name -> response string, or the exception raised for that server. Ordered as the fleet.
+        """
+        return await self._gather(self.select(targets),
+                                  lambda server: async_send_command(server.credentials, command, *arguments))
+
+    async def refresh_players(self, targets=None) -> dict:
+        """Fetch the player list of several servers concurrently, updating each server's roster.
+
+        Returns:
+            dict: Server name -> `RosterDiff` for that server, or the exception raised for it.
+        """
+
+        async def fetch(server: FleetServer):
+            return server.roster.update(await get_player_list(server.credentials))
+
+        return await self._gather(self.select(targets), fetch)
+
+    async def sync_bans(self, targets=None) -> dict:
+        """Send several servers, concurrently, the bans on the local ban list each of them is missing.
+
+        Returns:
+            dict: Server name -> `sync_bans` outcomes for that server, or the exception raised for it.
+        """
+        return await self._gather(self.select(targets), lambda server: sync_bans(server.credentials))
+
+    async def _gather(self, servers: list, operation) -> dict:
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+
+        async def bounded(server: FleetServer):
+            async with semaphore:
+                try:
+                    return await operation(server)
+                except Exception as err:
+                    return err
+
+        results = await asyncio.gather(*(bounded(server) for server in servers))
+        return {server.name: result for server, result in zip(servers, results)}
@@ -0,0 +1,313 @@
+"""
+history
+
+Player session history in a local SQLite database, so PalConnect can answer "who was online at 02:00" or "how
+long has this SteamID played" long after the snapshots that showed it are gone.
+
+Every ShowPlayers snapshot is handed to `history.record_players`, which only queues it. A background thread
+compares it with the sessions it has open - in memory, so the cost of a refresh does not grow with the history -
+and turns the difference into session rows: a row is inserted when a player joins and closed when they leave.
+The snapshot itself is kept as (server, time, players online). Writes are committed in batches of up to
+`config.history_batch_size` operations, or every `config.history_flush_interval` seconds.
+
+If a server goes unanswered for longer than `config.history_gap` seconds, or PalConnect closes, open sessions are
+closed at the last snapshot that saw them, rather than at whenever the next snapshot happens to arrive.
+
+Queries (`online_at`, `sessions`, `playtime`) open their own read-only connection, so they can be run from any
+thread while the writer is busy.
+"""
+import os
+import time
+import queue
+import sqlite3
+import threading
+from logging import getLogger
+
+from utils.roster import player_key
+import config
+
+__all__ = (
+    "SessionHistory",
+    "history"
+)
+
+
+LOGGER = getLogger(__file__)
+
+_CLOSE = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    server TEXT NOT NULL,
+    player TEXT NOT NULL,
+    steamid TEXT,
+    playeruid TEXT,
+    name TEXT,
+    joined REAL NOT NULL,
+    departed REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_steamid ON sessions (steamid, joined);
+CREATE INDEX IF NOT EXISTS sessions_playeruid ON sessions (playeruid, joined);
+CREATE INDEX IF NOT EXISTS sessions_server ON sessions (server, joined);
+CREATE INDEX IF NOT EXISTS sessions_joined ON sessions (joined);
+CREATE INDEX IF NOT EXISTS sessions_open ON sessions (server, player) WHERE departed IS NULL;
+CREATE INDEX IF NOT EXISTS sessions_open_joined ON sessions (joined) WHERE departed IS NULL;
+CREATE TABLE IF NOT EXISTS snapshots (
+    server TEXT NOT NULL,
+    t REAL NOT NULL,
+    online INTEGER NOT NULL,
+    PRIMARY KEY (server, t)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+_COLUMNS = "server, player, steamid, playeruid, name, joined, departed"
+
+
+class SessionHistory:
+    """Records player sessions and snapshots to SQLite on a background thread, and queries them.
+
+    Args:
+        path: (str): The database file. Defaults to `config.history_path`.
+        flush_interval: (float): Seconds between commits of queued snapshots.
+        batch_size: (int): Commit early once this many writes are pending.
+        gap: (float): Seconds without a snapshot of a server after which its open sessions are closed.
+    """
+
+    def __init__(self, path: str = None, flush_interval: float = None, batch_size: int = None, gap: float = None):
+        self.path = config.history_path if path is None else path
+        self.flush_interval = config.history_flush_interval if flush_interval is None else flush_interval
+        self.batch_size = config.history_batch_size if batch_size is None else batch_size
+        self.gap = config.history_gap if gap is None else gap
+        self.enabled = config.history_enabled
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._db = None
+        self._open = {}  # server -> {player key: (name, joined)} of sessions still open
+        self._last = {}  # server -> time of its latest snapshot
+        self._longest = 0.0  # Longest closed session, which bounds how far back `online_at` has to look
+        self._pending = 0
+
+    # - Producer side, safe to call from any thread
+
+    def record_players(self, server: str, players):
+        """ Queue a ShowPlayers snapshot of `server` ("ipaddr:port") """
+        if not self.enabled:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="history", daemon=True)
+                    self._thread.start()
+        self._queue.put((server, time.time(), tuple(players)))
+
+    def close(self, timeout: float = 5.0):
+        """ Write queued snapshots, close open sessions at their last snapshot and close the database """
+        if self._thread is not None:
+            self._queue.put(_CLOSE)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # - Writer thread
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer, nor it them
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        return db
+
+    def _run(self):
+        try:
+            self._db = self._connect()
+            self._db.execute("BEGIN")
+            self._recover()
+        except sqlite3.Error as err:
+            LOGGER.error(f"Session history disabled - could not open {self.path}: {err}")
+            self.enabled = False
+            return
+
+        last_commit = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            try:
+                if item is _CLOSE:
+                    for server in list(self._open):
+                        self._close_sessions(server, self._last.get(server))
+                    self._db.execute("COMMIT")
+                    self._db.close()
+                    return
+                if item is not None:
+                    self._apply(*item)
+                if self._pending and (self._pending >= self.batch_size
+                                      or time.monotonic() - last_commit >= self.flush_interval):
+                    self._db.execute("COMMIT")
+                    self._db.execute("BEGIN")
+                    self._pending = 0
+                    last_commit = time.monotonic()
+            except sqlite3.Error as err:
+                LOGGER.error(f"Could not write session history - {err}")
+                if not self._db.in_transaction:
+                    self._db.execute("BEGIN")
+
+    def _recover(self):
+        """ Close sessions left open by a session of PalConnect that did not shut down cleanly """
+        longest = self._db.execute(
+            "SELECT MAX(COALESCE((SELECT MAX(t) FROM snapshots WHERE snapshots.server = sessions.server), joined)"
+            " - joined) FROM sessions WHERE departed IS NULL").fetchone()[0]
+        self._db.execute(
+            "UPDATE sessions SET departed = COALESCE("
+            "(SELECT MAX(t) FROM snapshots WHERE snapshots.server = sessions.server), joined) WHERE departed IS NULL")
+        stored = self._db.execute("SELECT value FROM meta WHERE key = 'longest_session'").fetchone()
+        self._longest = max(stored[0] if stored else 0.0, longest or 0.0)
+        self._store_longest()
+
+    def _store_longest(self):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('longest_session', ?)", (self._longest,))
+
+    def _apply(self, server: str, t: float, players: tuple):
+        """ Turn a snapshot into session changes. Costs O(players online), however long the history is """
+        last = self._last.get(server)
+        if last is not None and t - last > self.gap:
+            self._close_sessions(server, last)
+        open_sessions = self._open.setdefault(server, {})
+        execute = self._db.execute
+
+        current = {}
+        for player in players:
+            key = player_key(player)
+            current[key] = player
+            session = open_sessions.get(key)
+            if session is None:
+                execute(f"INSERT INTO sessions ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                        (server, key, player.steamid, player.playeruid, player.name, t))
+                open_sessions[key] = (player.name, t)
+            elif session[0] != player.name:
+                execute("UPDATE sessions SET name = ? WHERE server = ? AND player = ? AND departed IS NULL",
+                        (player.name, server, key))
+                open_sessions[key] = (player.name, session[1])
+
+        for key in [key for key in open_sessions if key not in current]:
+            self._close_session(server, key, t)
+
+        execute("INSERT OR REPLACE INTO snapshots (server, t, online) VALUES (?, ?, ?)", (server, t, len(current)))
+        self._last[server] = t
+        self._pending += len(players) + 1
+
+    def _close_session(self, server: str, key: str, t: float):
+        _, joined = self._open[server].pop(key)
+        self._db.execute("UPDATE sessions SET departed = ? WHERE server = ? AND player = ? AND departed IS NULL",
+                         (t, server, key))
+        if t - joined > self._longest:
+            self._longest = t - joined
+            self._store_longest()
+
+    def _close_sessions(self, server: str, t: float):
+        for key in list(self._open.get(server, ())):
+            self._close_session(server, key, t)
+
+    # - Queries, safe to call from any thread
+
+    def _read(self) -> sqlite3.Connection | None:
+        if not os.path.exists(self.path):
+            return None
+        db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def online_at(self, t: float, server: str = None) -> list:
+        """Who was online at a point in time.
+
+        Args:
+            t: (float): UNIX time.
+            server: (str): Only this server ("ipaddr:port").
+
+        Returns:
+            list: Session rows (dicts with server, player, steamid, playeruid, name, joined and departed).
+        """
+        db = self._read()
+        if db is None:
+            return []
+        with db:
+            longest = db.execute("SELECT value FROM meta WHERE key = 'longest_session'").fetchone()
+            # Closed sessions online at t joined at most `longest` seconds before it, so only that slice of the
+            # joined index is read. Sessions still open are found through the partial index of open sessions
+            earliest = t - (longest[0] if longest else 0.0)
+            where, parameters = ("server = ? AND ", [server]) if server else ("", [])
+            rows = db.execute(
+                f"SELECT {_COLUMNS} FROM sessions WHERE {where}joined BETWEEN ? AND ? AND departed > ?"
+                f" UNION ALL "
+                f"SELECT {_COLUMNS} FROM sessions INDEXED BY sessions_open_joined"
+                f" WHERE {where}departed IS NULL AND joined <= ?"
+                f" ORDER BY joined",
+                (*parameters, earliest, t, t, *parameters, t)).fetchall()
+        db.close()
+        return [dict(row) for row in rows]
+
+    def sessions(self, player: str = None, server: str = None, start: float = None, end: float = None,
+                 limit: int = 200) -> list:
+        """Sessions, newest first.
+
+        Args:
+            player: (str): Only this SteamID or playeruid.
+            server: (str): Only this server ("ipaddr:port").
+            start: (float): Only sessions that had not ended by this UNIX time.
+            end: (float): Only sessions that had begun by this UNIX time.
+            limit: (int): Most rows returned.
+        """
+        clauses, parameters = [], []
+        if player:
+            clauses.append("(steamid = ? OR playeruid = ?)")
+            parameters += [player, player]
+        if server:
+            clauses.append("server = ?")
+            parameters.append(server)
+        if start is not None:
+            clauses.append("(departed IS NULL OR departed >= ?)")
+            parameters.append(start)
+        if end is not None:
+            clauses.append("joined <= ?")
+            parameters.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        db = self._read()
+        if db is None:
+            return []
+        with db:
+            rows = db.execute(f"SELECT {_COLUMNS} FROM sessions {where} ORDER BY joined DESC LIMIT ?",
+                              (*parameters, limit)).fetchall()
+        db.close()
+        return [dict(row) for row in rows]
+
+    def playtime(self, player: str, server: str = None, start: float = None, end: float = None) -> float:
+        """Seconds a player has been online, counting a session still open up to now.
+
+        Args:
+            player: (str): SteamID or playeruid.
+            server: (str): Only this server ("ipaddr:port").
+            start: (float): Only count time from this UNIX time.
+            end: (float): Only count time up to this UNIX time.
+        """
+        now = time.time()
+        total = 0.0
+        for session in self.sessions(player, server, start, end, limit=-1):
+            joined = session['joined'] if start is None else max(session['joined'], start)
+            departed = now if session['departed'] is None else session['departed']
+            total += max(0.0, min(departed, now if end is None else end) - joined)
+        return total
+
+
+history = SessionHistory()
@@ -0,0 +1,249 @@
+"""
+metrics
+
+Counters and latency histograms for the RCON path, kept in memory and exported in Prometheus text format.
+
+What is measured:
+- palconnect_command_duration_seconds: end-to-end time of every command sent through `async_send_command` and
+  `async_send_batch`, per server and command, including time queued in the scheduler and waiting for a pooled
+  connection.
+- palconnect_command_errors_total: failed commands, per server, command and exception type.
+- palconnect_roundtrip_duration_seconds: time from writing a command to reading its response on the wire.
+- palconnect_connect_duration_seconds / palconnect_auth_duration_seconds: TCP connect and authentication time of
+  every new connection.
+- palconnect_reconnects_total: commands retried on a fresh connection after a pooled one failed.
+
+Recording is cheap and thread-safe. `Metrics.start_export` writes the whole set to `config.metrics_export_path`
+every `config.metrics_export_interval` seconds, for node exporter's textfile collector to pick up.
+"""
+import os
+import bisect
+import threading
+
+import config
+
+__all__ = (
+    "Histogram",
+    "Metrics",
+    "metrics"
+)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram.
+
+    Args:
+        buckets: (tuple): Sorted upper bounds of the buckets, in seconds. An overflow bucket is added for the rest.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """ Estimate a quantile by interpolating within its bucket, like PromQL's histogram_quantile """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]  # Beyond the largest bucket, nothing better is known
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def merge(self, other: "Histogram"):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def prometheus(self, name: str, labels: str) -> list:
+        separator = "," if labels else ""
+        lines, cumulative = [], 0
+        for bound, count in zip((*map(repr, self.buckets), "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum!r}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def _labels(**labels) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+
+
+class Metrics:
+    """In-memory registry of RCON metrics.
+
+    Args:
+        buckets: (tuple): Histogram bucket bounds in seconds. Defaults to `config.metrics_buckets`.
+    """
+
+    def __init__(self, buckets: tuple = None):
+        self.buckets = tuple(sorted(config.metrics_buckets if buckets is None else buckets))
+        self._lock = threading.Lock()
+        self._commands = {}  # (server, command) -> Histogram
+        self._errors = {}  # (server, command, error type) -> count
+        self._roundtrips = {}  # (server, command) -> Histogram
+        self._connects = {}  # server -> Histogram
+        self._auths = {}  # server -> Histogram
+        self._reconnects = {}  # server -> count
+        self._exporter = None
+        self._stop_export = threading.Event()
+
+    def _observe(self, histograms: dict, key, seconds: float):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    # - Recording, safe to call from any thread
+
+    def record_command(self, server: str, command: str, seconds: float, error: BaseException = None):
+        with self._lock:
+            self._observe(self._commands, (server, command), seconds)
+            if error is not None:
+                key = (server, command, type(error).__name__)
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def record_roundtrip(self, server: str, command: str, seconds: float):
+        with self._lock:
+            self._observe(self._roundtrips, (server, command), seconds)
+
+    def record_connect(self, server: str, connect_seconds: float, auth_seconds: float):
+        with self._lock:
+            self._observe(self._connects, server, connect_seconds)
+            self._observe(self._auths, server, auth_seconds)
+
+    def record_reconnect(self, server: str):
+        with self._lock:
+            self._reconnects[server] = self._reconnects.get(server, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            for values in (self._commands, self._errors, self._roundtrips, self._connects, self._auths,
+                           self._reconnects):
+                values.clear()
+
+    # - Reading
+
+    def summary(self) -> dict:
+        """Totals across every server, for the status panel.
+
+        Returns:
+            dict: "commands" and "errors" counts, "errors_by_type" {type: count}, the "p50" and "p95" command
+            latency, the "connect" and "auth" median, and "by_command" {command: (count, p50, p95)}.
+        """
+        with self._lock:
+            overall, connects, auths, by_command = Histogram(self.buckets), Histogram(self.buckets), \
+                Histogram(self.buckets), {}
+            for (_, command), histogram in self._commands.items():
+                overall.merge(histogram)
+                by_command.setdefault(command, Histogram(self.buckets)).merge(histogram)
+            for histogram in self._connects.values():
+                connects.merge(histogram)
+            for histogram in self._auths.values():
+                auths.merge(histogram)
+            errors_by_type = {}
+            for (_, _, error), count in self._errors.items():
+                errors_by_type[error] = errors_by_type.get(error, 0) + count
+
+        return {
+            "commands": overall.count,
+            "errors": sum(errors_by_type.values()),
+            "errors_by_type": errors_by_type,
+            "p50": overall.quantile(0.5),
+            "p95": overall.quantile(0.95),
+            "connect": connects.quantile(0.5),
+            "auth": auths.quantile(0.5),
+            "by_command": {command: (histogram.count, histogram.quantile(0.5), histogram.quantile(0.95))
+                           for command, histogram in by_command.items()}
+        }
+
+    def prometheus(self) -> str:
+        """ Every metric in Prometheus text exposition format """
+        lines = []
+
+        def histograms(name: str, description: str, values: dict, label_names: tuple):
+            lines.extend((f"# HELP {name} {description}", f"# TYPE {name} histogram"))
+            for key, histogram in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                lines.extend(histogram.prometheus(name, _labels(**dict(zip(label_names, key)))))
+
+        def counters(name: str, description: str, values: dict, label_names: tuple):
+            lines.extend((f"# HELP {name} {description}", f"# TYPE {name} counter"))
+            for key, count in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f"{name}{{{_labels(**dict(zip(label_names, key)))}}} {count}")
+
+        with self._lock:
+            histograms("palconnect_command_duration_seconds", "End-to-end time of RCON commands.",
+                       self._commands, ("server", "command"))
+            counters("palconnect_command_errors_total", "RCON commands that failed, by exception type.",
+                     self._errors, ("server", "command", "error"))
+            histograms("palconnect_roundtrip_duration_seconds", "Time from sending a command to its response.",
+                       self._roundtrips, ("server", "command"))
+            histograms("palconnect_connect_duration_seconds", "TCP connect time of new RCON connections.",
+                       self._connects, ("server",))
+            histograms("palconnect_auth_duration_seconds", "Authentication time of new RCON connections.",
+                       self._auths, ("server",))
+            counters("palconnect_reconnects_total", "Commands retried after a pooled connection failed.",
+                     self._reconnects, ("server",))
+        return "\n".join(lines) + "\n"
+
+    # - Export
+
+    def export(self, path: str = None):
+        """ Write the metrics file, replacing the old one atomically so a scrape never sees half a file """
+        path = config.metrics_export_path if path is None else path
+        temporary = f"{path}.{os.getpid()}.tmp"  # The textfile collector only reads *.prom
+        with open(temporary, "w", encoding="utf-8") as output:
+            output.write(self.prometheus())
+        os.replace(temporary, path)
+
+    def start_export(self, path: str = None, interval: float = None):
+        """ Export every `interval` seconds on a background thread. Does nothing if no path is configured """
+        path = config.metrics_export_path if path is None else path
+        interval = config.metrics_export_interval if interval is None else interval
+        if not path or self._exporter is not None:
+            return
+        self._stop_export.clear()
+
+        def run():
+            while not self._stop_export.wait(interval):
+                self._export_quietly(path)
+            self._export_quietly(path)
+
+        self._exporter = threading.Thread(target=run, name="metrics-export", daemon=True)
+        self._exporter.start()
+
+    def _export_quietly(self, path: str):
+        try:
+            self.export(path)
+        except OSError as err:
+            print(f"Could not export metrics to {path} - {err}")
+
+    def stop_export(self, timeout: float = 5.0):
+        """ Stop the export thread after a final write """
+        if self._exporter is not None:
+            self._stop_export.set()
+            self._exporter.join(timeout)
+            self._exporter = None
+
+
+metrics = Metrics()
@@ -0,0 +1,227 @@
+"""
+mock_server
+
+A local stand-in for a Palworld RCON server, for exercising the connection, parsing and UI code without a live
+server, and for load tests and benchmarks.
+
+It speaks Source RCON framing and reproduces Palworld's quirks:
+- The empty SERVERDATA_RESPONSE_VALUE packet some clients send to find the end of a response is never answered.
+- Optionally, command responses do not echo the request ID (`echo_ids=False`).
+- Payloads are ISO-8859-1, and player names can include Latin-1 characters and commas, which Palworld does not
+  quote in ShowPlayers output.
+
+Network conditions are configurable: per-response latency, packet loss (commands that are silently never
+answered), and rejecting the first N logins.
+
+Run standalone with:
+    python -m utils.mock_server --port 25575 --password secret --players 32 --latency 0.05
+"""
+import random
+import asyncio
+import argparse
+
+from utils.rcon_protocol import (Packet, ENCODING, SERVERDATA_AUTH, SERVERDATA_AUTH_RESPONSE,
+                                 SERVERDATA_EXECCOMMAND, SERVERDATA_RESPONSE_VALUE)
+from utils.pal_exceptions import EmptyResponse
+from utils.players import Player
+
+__all__ = (
+    "make_players",
+    "MockRconServer"
+)
+
+
+_NAMES = ("Zoë", "Björn", "Ana", "François", "Ngozi", "Kenji", "Søren", "Mateo", "Amélie", "Olu")
+
+
+def make_players(count: int, comma_names: bool = False, seed: int = 0) -> list:
+    """Generate `Player` records shaped like Palworld's.
+
+    Args:
+        count: (int): How many players to generate.
+        comma_names: (bool): Give every fifth player a name containing a comma.
+        seed: (int): Seed for the generated IDs, so runs are reproducible.
+    """
+    rng = random.Random(seed)
+    players = []
+    for i in range(count):
+        name = f"{_NAMES[i % len(_NAMES)]}{i}"
+        if comma_names and i % 5 == 0:
+            name = f"{name}, the Brave"
+        players.append(Player(name, str(rng.randrange(10 ** 8, 10 ** 10)),
+                              str(76561197960265728 + rng.randrange(10 ** 9))))
+    return players
+
+
+class MockRconServer:
+    """An in-process Palworld RCON server.
+
+    Args:
+        password: (str): The RCON admin password.
+        players: Number of players to generate, or a list of (name, playeruid, steamid) records.
+        latency: Seconds to wait before each response; a (low, high) tuple picks uniformly in that range.
+        packet_loss: (float): Probability that a command is silently never answered.
+        auth_failures: (int): Reject this many logins, even with the right password, before accepting any.
+        echo_ids: (bool): Echo request IDs on command responses. Palworld does not always.
+        comma_names: (bool): When generating players, include names with commas.
+        seed: (int): Seed for generated players, latency and packet loss.
+    """
+
+    def __init__(self, password: str = "admin", players=0, latency=0.0, packet_loss: float = 0.0,
+                 auth_failures: int = 0, echo_ids: bool = True, comma_names: bool = False, seed: int = 0):
+        self.password = password
+        self.players = make_players(players, comma_names, seed) if isinstance(players, int) else \
+            [Player(*player) for player in players]
+        self.latency = latency
+        self.packet_loss = packet_loss
+        self.auth_failures = auth_failures
+        self.echo_ids = echo_ids
+        self.random = random.Random(seed)
+
+        self.host = "127.0.0.1"
+        self.port = None
+        self.commands = []  # Every command received, as decoded payloads
+        self.connections = 0
+        self.banned = set()
+        self._server = None
+
+    @property
+    def credentials(self) -> dict:
+        return {"ipaddr": self.host, "port": self.port, "password": self.password}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "MockRconServer":
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "MockRconServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    # - Roster changes, for testing join/leave handling
+
+    def join(self, count: int = 1) -> list:
+        joined = make_players(len(self.players) + count, seed=self.random.randrange(1 << 30))[-count:]
+        self.players.extend(joined)
+        return joined
+
+    def leave(self, count: int = 1) -> list:
+        left, self.players = self.players[:count], self.players[count:]
+        return left
+
+    # - Protocol
+
+    async def _delay(self):
+        latency = self.random.uniform(*self.latency) if isinstance(self.latency, tuple) else self.latency
+        if latency:
+            await asyncio.sleep(latency)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        authenticated = False
+        try:
+            while True:
+                try:
+                    request = await Packet.read(reader)
+                except (EmptyResponse, ConnectionError):
+                    return
+
+                if request.type == SERVERDATA_AUTH:
+                    authenticated = self._authenticate(request.payload.decode(ENCODING))
+                    await self._delay()
+                    writer.write(bytes(Packet(request.id if authenticated else -1, SERVERDATA_AUTH_RESPONSE)))
+                elif request.type == SERVERDATA_RESPONSE_VALUE or not authenticated:
+                    continue  # Palworld ignores these rather than answering
+                elif request.type == SERVERDATA_EXECCOMMAND:
+                    command = request.payload.decode(ENCODING)
+                    self.commands.append(command)
+                    if self.random.random() < self.packet_loss:
+                        continue
+                    await self._delay()
+                    response = self.respond(command).encode(ENCODING, errors="replace")
+                    writer.write(bytes(Packet(request.id if self.echo_ids else 0, SERVERDATA_RESPONSE_VALUE,
+                                              response)))
+                await writer.drain()
+        except ConnectionError:
+            return
+        finally:
+            writer.close()
+
+    def _authenticate(self, password: str) -> bool:
+        if self.auth_failures > 0:
+            self.auth_failures -= 1
+            return False
+        return password == self.password
+
+    def respond(self, line: str) -> str:
+        """ The text Palworld would answer a command line with """
+        command, _, arguments = line.partition(" ")
+        command = command.lower()
+
+        if command == "info":
+            return "Welcome to Pal Server[v0.1.5.1] PalConnect Mock Server\n"
+        if command == "showplayers":
+            rows = "".join(f"{name},{playeruid},{steamid}\n" for name, playeruid, steamid in self.players)
+            return "name,playeruid,steamid\n" + rows
+        if command == "broadcast":
+            return f"Broadcasted: {arguments}\n"
+        if command in ("kickplayer", "banplayer"):
+            remaining = [player for player in self.players if player.steamid != arguments.strip()]
+            if len(remaining) == len(self.players):
+                return f"Failed to find player by userid: {arguments}\n"
+            self.players = remaining
+            if command == "banplayer":
+                self.banned.add(arguments.strip())
+                return f"Baned: {arguments}\n"
+            return f"Kicked: {arguments}\n"
+        if command == "save":
+            return "Complete Save\n"
+        if command == "shutdown":
+            seconds, _, message = arguments.partition(" ")
+            return f"The server will shut down in {seconds} seconds. {message}\n"
+        if command == "doexit":
+            return "Shutdown server\n"
+        if command in ("teleporttoplayer", "teleporttome"):
+            return "Failed to execute command because the server is running in dedicated mode.\n"
+        return f"Unknown command: {line}\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock Palworld RCON server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=25575)
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response")
+    parser.add_argument("--packet-loss", type=float, default=0.0, help="Probability a command is never answered")
+    parser.add_argument("--auth-failures", type=int, default=0, help="Reject this many logins first")
+    parser.add_argument("--no-echo-ids", action="store_true", help="Do not echo request IDs on responses")
+    parser.add_argument("--comma-names", action="store_true", help="Include player names with commas")
+    args = parser.parse_args()
+
+    async def serve():
+        server = MockRconServer(args.password, args.players, args.latency, args.packet_loss, args.auth_failures,
+                                not args.no_echo_ids, args.comma_names)
+        await server.start(args.host, args.port)
+        print(f"Mock Palworld RCON server on {server.host}:{server.port} with {len(server.players)} players")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
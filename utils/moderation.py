@@ -0,0 +1,157 @@
+"""
+moderation
+
+Kicks or bans several players in one go. Each player's command is sent concurrently - at most
+`config.moderation_max_concurrency` at a time, all at moderation priority, which the command scheduler lets past
+its usual `config.scheduler_concurrency` - and one combined Broadcast names everyone it worked for, instead of one
+announcement per player.
+
+Every successful ban is also kept on the local ban list (`utils.bans`), with the player's name and the reason.
+That list is enforced here too: `enforce_bans` removes banned players a player list refresh shows online, and
+`sync_bans` sends a server the bans it has not been given yet.
+
+A failure only affects its own player: the outcome for every player is reported back, so one bad SteamID does not
+stop the rest of a raid being cleaned up. A "Failed ..." response, such as for a player who already left, counts
+as a failure.
+"""
+import asyncio
+
+from utils.application_utilities import async_send_command
+from utils.bans import ban_list, is_steamid
+from utils.players import Player
+from utils.pal_exceptions import CommandFailed
+from utils.scheduler import Priority
+import config
+
+__all__ = (
+    "ACTIONS",
+    "moderate",
+    "moderation_broadcast",
+    "enforce_bans",
+    "sync_bans",
+    "describe_sync"
+)
+
+
+# Command -> (verb, past tense, Broadcast wording)
+ACTIONS = {
+    "KickPlayer": ("kick", "Kicked", "kicked from the server"),
+    "BanPlayer": ("ban", "Banned", "banned from the server")
+}
+
+
+def moderation_broadcast(command: str, players: list) -> str:
+    """ The combined announcement, e.g. "Alice, Bob and Carol were kicked from the server!" """
+    names = [player.name for player in players]
+    joined = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+    return f"{joined} {'was' if len(names) == 1 else 'were'} {ACTIONS[command][2]}!"
+
+
+async def moderate(credentials: dict, command: str, players: list, max_concurrency: int = None,
+                   announce: bool = True, reason: str = "") -> tuple:
+    """Kick or ban several players concurrently.
+
+    Args:
+        credentials: (dict): RCON connection details (ipaddr, port, password).
+        command: (str): "KickPlayer" or "BanPlayer".
+        players: (list): `Player` records to act on.
+        max_concurrency: (int): Commands outstanding at once. Defaults to `config.moderation_max_concurrency`,
+            which is also the most the command scheduler sends to one server at once.
+        announce: (bool): Broadcast the names of everyone the command worked for.
+        reason: (str): Why they are banned, kept on the local ban list.
+
+    Returns:
+        tuple: (outcomes, announcement). `outcomes` are (Player, response or exception) pairs in the order of
+            `players`; `announcement` is the Broadcast's response or exception, or None if nothing was announced.
+    """
+    if command not in ACTIONS:
+        raise ValueError(f"Not a moderation command: {command}")
+    semaphore = asyncio.Semaphore(max(1, config.moderation_max_concurrency if max_concurrency is None
+                                      else max_concurrency))
+
+    async def act(player: Player):
+        async with semaphore:
+            try:
+                response = await async_send_command(credentials, command, player.steamid or player.playeruid,
+                                                    priority=Priority.MODERATION)
+            except Exception as err:
+                return err
+            # The server reports a player it cannot find in the response, rather than as an error
+            return CommandFailed(response.strip()) if response.startswith("Failed") else response
+
+    outcomes = list(zip(players, await asyncio.gather(*(act(player) for player in players))))
+
+    succeeded = [player for player, outcome in outcomes if not isinstance(outcome, Exception)]
+    if command == "BanPlayer":
+        server = f"{credentials['ipaddr']}:{credentials['port']}"
+        for player in succeeded:
+            if not is_steamid(player.steamid):
+                continue  # Banned by playeruid, which the ban list cannot match or sync
+            ban = ban_list.get(player.steamid)
+            # The command path has recorded the ban already; fill in what only this caller knows
+            if ban is None or reason or (player.name and ban.name != player.name):
+                ban_list.add(player.steamid, player.name, reason, server)
+    announcement = None
+    if announce and succeeded:
+        try:
+            announcement = await async_send_command(credentials, "Broadcast", moderation_broadcast(command, succeeded),
+                                                    priority=Priority.MODERATION)
+        except Exception as err:
+            announcement = err
+    return outcomes, announcement
+
+
+async def enforce_bans(credentials: dict, players) -> list:
+    """Remove players on the local ban list from a server.
+
+    Only the players passed in are checked, each in O(1) - pass the players who joined in a `RosterDiff`, and a
+    refresh costs nothing more while nobody joins. A ban the server has not been given yet is sent as BanPlayer,
+    which also kicks; an evader the server should already have banned is kicked.
+
+    Args:
+        credentials: (dict): RCON connection details (ipaddr, port, password).
+        players: Players to check, such as `RosterDiff.joined`.
+
+    Returns:
+        list: (Player, response or exception) pairs for the evaders found, empty if there were none.
+    """
+    evaders = ban_list.evaders(players)
+    if not evaders:
+        return []
+    server = f"{credentials['ipaddr']}:{credentials['port']}"
+    unapplied = [player for player, ban in evaders if server not in ban.applied]
+    applied = [player for player, ban in evaders if server in ban.applied]
+
+    outcomes = []
+    for command, group in (("BanPlayer", unapplied), ("KickPlayer", applied)):
+        if group:
+            outcomes += (await moderate(credentials, command, group))[0]
+    return outcomes
+
+
+async def sync_bans(credentials: dict, max_concurrency: int = None) -> list:
+    """Send a server every ban on the local ban list it has not been given yet.
+
+    Bans already applied to the server are not sent again, so a sync after a few new bans costs a few commands.
+    Each ban the server accepts is marked as applied to it.
+
+    Returns:
+        list: (Ban, response or exception) pairs, oldest ban first.
+    """
+    missing = ban_list.missing(f"{credentials['ipaddr']}:{credentials['port']}")
+    if not missing:
+        return []
+    outcomes, _ = await moderate(credentials, "BanPlayer", [Player(ban.name, "", ban.steamid) for ban in missing],
+                                 max_concurrency, announce=False)
+    ban_list.flush()
+    return [(ban, outcome) for ban, (_, outcome) in zip(missing, outcomes)]
+
+
+def describe_sync(outcomes: list) -> str:
+    """ Summary of a `sync_bans` result """
+    if not outcomes:
+        return "No missing bans"
+    failed = [(ban, outcome) for ban, outcome in outcomes if isinstance(outcome, Exception)]
+    lines = [f"{len(outcomes) - len(failed)} of {len(outcomes)} missing bans sent"]
+    lines += [f"  {ban.steamid} {ban.name} - {type(outcome).__name__}: {outcome}" for ban, outcome in failed]
+    return "\n".join(lines)
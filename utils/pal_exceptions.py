@@ -10,14 +10,54 @@ Classes:
 - UserAbort: Indicates that a required action has been aborted by the user.
 - WrongPassword: Indicates a wrong password.
 - InvalidIpAddress: Raised when an invalid IP address is found.
-
-Dependencies:
-- rcon: Core RCON library for server communication.
+- QueueFull: Raised when a command cannot be queued for a busy server, or was dropped from its queue.
+- CommandFailed: Raised when the server answers a command with a failure, e.g. kicking a player who is not online.
+- StaleConnection: Raised when a pooled connection turns out to be closed before a command was written to it.
 
 """
 
+__all__ = (
+    "InvalidIpAddress",
+    "WrongPassword",
+    "SessionTimeout",
+    "EmptyResponse",
+    "QueueFull",
+    "CommandFailed",
+    "StaleConnection"
+)
+
 
 # Custom Exceptions
 class InvalidIpAddress(Exception):
     """ Raised when an invalid IP address is found """
     pass
+
+
+class WrongPassword(Exception):
+    """ Raised when the server rejects the RCON password """
+    pass
+
+
+class SessionTimeout(Exception):
+    """ Raised when the server answers out of step with the session, e.g. a mismatched auth response """
+    pass
+
+
+class EmptyResponse(Exception):
+    """ Raised when the server closes the connection before sending a full response """
+    pass
+
+
+class QueueFull(Exception):
+    """ Raised when too many commands are already waiting for a server, or a waiting command was dropped """
+    pass
+
+
+class CommandFailed(Exception):
+    """ Raised when the server answers a command with a failure message instead of carrying it out """
+    pass
+
+
+class StaleConnection(ConnectionError):
+    """ Raised when a connection was already closed by the server before a command could be written to it """
+    pass
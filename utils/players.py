@@ -0,0 +1,146 @@
+"""
+players
+
+Parses Palworld's ShowPlayers response into `Player` records.
+
+The response is a CSV header followed by one row per player:
+    name,playeruid,steamid
+    Zoë,1234567890,76561197960265729
+Palworld does not quote names, so a name containing commas arrives as extra fields. The parser reads the column
+order from the header and gives every field beyond the header's width to the name column. Rows that do contain
+quotes are read with the csv module instead, except that a name opening a quote it never closes keeps its row and
+loses the stray quote. The last row is kept whether or not the response ends in a newline.
+
+`PlayerListParser` is incremental - text can be fed in as it arrives - and `parse_players` parses a whole
+response in one go.
+"""
+import io
+import csv
+from logging import getLogger
+from typing import NamedTuple
+
+__all__ = (
+    "Player",
+    "PlayerListParser",
+    "parse_players"
+)
+
+
+LOGGER = getLogger(__file__)
+
+
+class Player(NamedTuple):
+    """ One row of ShowPlayers. Being a tuple, it compares and hashes by value """
+    name: str
+    playeruid: str
+    steamid: str
+
+
+_new_player = tuple.__new__  # Skips NamedTuple's argument handling, which dominates parsing large rosters
+
+
+class PlayerListParser:
+    """ Header-driven, incremental ShowPlayers parser """
+
+    def __init__(self):
+        self._pending = ""
+        self._width = None  # Number of columns in the header, once it has been read
+        self._before = 0  # Columns before the name column
+        self._after = 0  # Columns after the name column
+        self._positions = None  # Index of each Player field in a row, or None if the header lacks it
+        self._in_order = False  # Rows are exactly (name, playeruid, steamid), so no reordering is needed
+
+    def feed(self, text: str, final: bool = False) -> list:
+        """Parse the next piece of a response.
+
+        Args:
+            text: (str): The next piece of the response. It may end part way through a row.
+            final: (bool): This is the end of the response, so a row without a trailing newline is complete.
+
+        Returns:
+            list: The `Player` records of every row completed by this piece.
+        """
+        if self._pending:
+            text = self._pending + text
+            self._pending = ""
+        if not final:
+            end = text.rfind("\n") + 1
+            text, self._pending = text[:end], text[end:]
+
+        players = []
+        append = players.append
+        for line in io.StringIO(text):
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+            if self._width is None and self._read_header(line):
+                continue
+            player = self._parse_row(line)
+            if player is not None:
+                append(player)
+        return players
+
+    def close(self) -> list:
+        """ Parse whatever is left of the response as its last row """
+        return self.feed("", final=True)
+
+    def _read_header(self, line: str) -> bool:
+        """ Take the column layout from the header. Returns False if the line is a player row instead """
+        columns = [column.strip().lower() for column in line.split(",")]
+        is_header = "name" in columns and ("playeruid" in columns or "steamid" in columns)
+        if not is_header:
+            LOGGER.debug("ShowPlayers response has no header, assuming name,playeruid,steamid")
+            columns = list(Player._fields)
+
+        name_index = columns.index("name")
+        self._width = len(columns)
+        self._before = name_index
+        self._after = self._width - name_index - 1
+        self._positions = tuple(columns.index(field) if field in columns else None for field in Player._fields)
+        self._in_order = columns == list(Player._fields)
+        return is_header
+
+    def _split(self, line: str) -> list:
+        """ Split a row around the name column, leaving any commas that belong to the name inside it """
+        head = line.split(",", self._before) if self._before else [line]
+        tail = head.pop().rsplit(",", self._after) if self._after else [head.pop()]
+        return head + tail
+
+    def _parse_row(self, line: str):
+        if '"' in line:
+            fields = next(csv.reader((line,)))
+            if len(fields) > self._width:  # Quoted elsewhere, but the name still has bare commas
+                extra = len(fields) - self._width
+                name = ",".join(fields[self._before:self._before + extra + 1])
+                fields = fields[:self._before] + [name] + fields[self._before + extra + 1:]
+            if len(fields) != self._width:  # An unbalanced quote, e.g. a name that merely starts with one
+                fields = self._split(line)
+                if len(fields) == self._width:
+                    fields[self._before] = _strip_unmatched_quote(fields[self._before])
+        else:
+            fields = self._split(line)
+
+        if len(fields) != self._width:
+            LOGGER.debug(f"Skipping malformed ShowPlayers row: {line!r}")
+            return None
+        if self._in_order:
+            return _new_player(Player, fields)
+        return _new_player(Player, ("" if index is None else fields[index] for index in self._positions))
+
+
+def _strip_unmatched_quote(name: str) -> str:
+    """Drop the opening quote of a name whose closing quote is missing.
+
+    The row is kept rather than skipped, so the player still shows up (and can be kicked by SteamID); only the
+    stray quote is lost from the name, e.g. '"Quote' is read as 'Quote'.
+    """
+    return name[1:] if name.startswith('"') and name.count('"') % 2 else name
+
+
+def parse_players(response: str) -> list:
+    """Parse a complete ShowPlayers response.
+
+    Returns:
+        list: A `Player` for every row, in the order the server listed them.
+    """
+    return PlayerListParser().feed(response, final=True)
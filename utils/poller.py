@@ -0,0 +1,132 @@
+"""
+poller
+
+Runs a coroutine repeatedly on `utils.event_loop.rcon_loop`, adapting how often it runs to what it finds.
+
+- When a poll reports a change (e.g. players joining or leaving) the next poll comes after `min_interval`.
+- Each poll that finds nothing new stretches the delay by `backoff`, from `interval` up to `max_interval`.
+- Each consecutive error doubles the delay from `interval`, again capped at `max_interval`.
+- Every delay is spread by +/- `jitter` so that several clients do not poll a server in lock-step.
+
+Pollers are tasks rather than threads: they cost nothing while waiting, and can be paused, resumed, woken early
+and cancelled from any thread.
+"""
+import asyncio
+import random
+
+from utils.event_loop import rcon_loop
+import config
+
+__all__ = (
+    "AdaptivePoller",
+)
+
+
+class AdaptivePoller:
+    """Call `poll()` on an adaptive schedule.
+
+    Args:
+        poll: Coroutine function taking no arguments. Its result is treated as "something changed" when truthy.
+        interval: (float): Delay between polls while things are steady. Defaults to `config.player_poll_interval`.
+        min_interval: (float): Delay after a poll that saw a change. Defaults to `config.player_poll_min_interval`.
+        max_interval: (float): Longest delay when idle or failing. Defaults to `config.player_poll_max_interval`.
+        backoff: (float): Factor the delay grows by after each poll that saw no change.
+        jitter: (float): Fraction by which every delay is randomly spread.
+        initial_delay: (float): Delay before the first poll.
+        on_error: Called with the exception when a poll fails. The poller keeps going.
+        name: (str): Name of the underlying task.
+    """
+
+    def __init__(self, poll, interval: float = None, min_interval: float = None, max_interval: float = None,
+                 backoff: float = None, jitter: float = None, initial_delay: float = 0.0, on_error=None,
+                 name: str = "poller"):
+        self.poll = poll
+        self.interval = config.player_poll_interval if interval is None else interval
+        self.min_interval = config.player_poll_min_interval if min_interval is None else min_interval
+        self.max_interval = config.player_poll_max_interval if max_interval is None else max_interval
+        self.backoff = config.player_poll_backoff if backoff is None else backoff
+        self.jitter = config.player_poll_jitter if jitter is None else jitter
+        self.initial_delay = initial_delay
+        self.on_error = on_error
+        self.name = name
+
+        self.delay = self.interval
+        self.errors = 0
+        self._task = None
+        self._running = None
+        self._wake = None
+
+    @property
+    def paused(self) -> bool:
+        return self._running is not None and not self._running.is_set()
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> "AdaptivePoller":
+        """ Start polling. Safe to call from any thread """
+        rcon_loop.call_soon(self._start)
+        return self
+
+    def _start(self):
+        if self.active:
+            return
+        self._running = asyncio.Event()
+        self._running.set()
+        self._wake = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name=self.name)
+
+    def pause(self):
+        rcon_loop.call_soon(lambda: self._running and self._running.clear())
+
+    def resume(self):
+        rcon_loop.call_soon(lambda: self._running and self._running.set())
+
+    def wake(self):
+        """ Poll as soon as possible instead of waiting out the current delay """
+        rcon_loop.call_soon(lambda: self._wake and self._wake.set())
+
+    def set_interval(self, interval: float):
+        """ Change the steady-state interval, taking effect from the next poll """
+        self.interval = interval
+        self.max_interval = max(self.max_interval, interval)
+        self.wake()
+
+    def stop(self):
+        """ Cancel the poller. A poll that is in flight is cancelled too """
+        rcon_loop.call_soon(lambda: self._task and self._task.cancel())
+
+    def _next_delay(self, changed: bool, failed: bool) -> float:
+        if failed:
+            self.errors += 1
+            delay = min(self.interval * 2 ** self.errors, self.max_interval)
+        elif changed:
+            self.errors = 0
+            delay = self.min_interval
+        else:
+            self.errors = 0
+            delay = min(max(self.delay * self.backoff, self.interval), self.max_interval)
+        self.delay = delay
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _sleep(self, delay: float):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), delay)
+        except TimeoutError:
+            pass
+
+    async def _run(self):
+        await self._sleep(self.initial_delay)
+        while True:
+            await self._running.wait()
+            try:
+                changed, failed = bool(await self.poll()), False
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                changed, failed = False, True
+                if self.on_error is not None:
+                    self.on_error(err)
+            await self._sleep(self._next_delay(changed, failed))
@@ -0,0 +1,234 @@
+"""
+rcon_protocol
+
+A native asyncio implementation of the Source RCON protocol, as spoken by Palworld.
+
+Every packet on the wire is framed as:
+    <size: int32> <id: int32> <type: int32> <payload: bytes> <0x00 0x00>
+where `size` counts everything after itself, and all integers are little-endian.
+
+Palworld quirks handled here:
+- It never answers the empty SERVERDATA_RESPONSE_VALUE packet that most clients send to detect the end of a
+  multi-packet response, so every command is answered by exactly one packet read.
+- It does not reliably echo the request ID on command responses, so IDs are only enforced during auth.
+- Payloads are ISO-8859-1, not UTF-8.
+"""
+import time
+import asyncio
+import itertools
+import struct
+
+from utils.pal_exceptions import WrongPassword, SessionTimeout, EmptyResponse, StaleConnection
+
+__all__ = (
+    "SERVERDATA_AUTH",
+    "SERVERDATA_AUTH_RESPONSE",
+    "SERVERDATA_EXECCOMMAND",
+    "SERVERDATA_RESPONSE_VALUE",
+    "ENCODING",
+    "Packet",
+    "RconConnection"
+)
+
+
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+
+ENCODING = "ISO-8859-1"
+
+_HEADER = struct.Struct("<iii")
+_TERMINATOR = b"\x00\x00"
+_MAX_PACKET_SIZE = 1 << 20  # Palworld does not split large responses, so allow well past the 4 KiB Source limit
+
+
+class Packet:
+    """ A single RCON packet """
+
+    __slots__ = ("id", "type", "payload")
+
+    def __init__(self, packet_id: int, packet_type: int, payload: bytes = b""):
+        self.id = packet_id
+        self.type = packet_type
+        self.payload = payload
+
+    def __bytes__(self) -> bytes:
+        size = _HEADER.size - 4 + len(self.payload) + len(_TERMINATOR)
+        return _HEADER.pack(size, self.id, self.type) + self.payload + _TERMINATOR
+
+    def __repr__(self) -> str:
+        return f"Packet(id={self.id}, type={self.type}, payload={self.payload!r})"
+
+    @classmethod
+    def make_command(cls, packet_id: int, command: str, *arguments) -> "Packet":
+        payload = " ".join((command, *map(str, arguments))).encode(ENCODING)
+        return cls(packet_id, SERVERDATA_EXECCOMMAND, payload)
+
+    @classmethod
+    def make_login(cls, packet_id: int, password: str) -> "Packet":
+        return cls(packet_id, SERVERDATA_AUTH, password.encode(ENCODING))
+
+    @classmethod
+    async def read(cls, reader: asyncio.StreamReader) -> "Packet":
+        """Read exactly one packet off the stream.
+
+        Raises:
+            EmptyResponse: The server closed the connection before a full packet arrived.
+        """
+        try:
+            header = await reader.readexactly(_HEADER.size)
+            size, packet_id, packet_type = _HEADER.unpack(header)
+            if not _HEADER.size - 4 + len(_TERMINATOR) <= size <= _MAX_PACKET_SIZE:
+                raise ConnectionError(f"Malformed packet size: {size}")
+            body = await reader.readexactly(size - (_HEADER.size - 4))
+        except asyncio.IncompleteReadError as err:
+            raise EmptyResponse("Server closed the connection") from err
+
+        return cls(packet_id, packet_type, body[:-len(_TERMINATOR)])
+
+
+class RconConnection:
+    """An authenticated RCON connection driven by asyncio streams.
+
+    Commands on one connection are serialised; open several connections (see `utils.connection_pool`)
+    to run commands in parallel.
+
+    Args:
+        reader: (asyncio.StreamReader): Read side of an open connection.
+        writer: (asyncio.StreamWriter): Write side of an open connection.
+        timeout: (float): Seconds to wait for each response before raising TimeoutError.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float = None):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self.timeout = timeout
+        self.closed = False
+        self.connect_time = 0.0  # Seconds spent on the TCP connect and on authentication, set by `open`
+        self.auth_time = 0.0
+
+    @classmethod
+    async def open(cls, ipaddr: str, port: int, password: str, timeout: float = None) -> "RconConnection":
+        """Connect to a server and authenticate.
+
+        Raises:
+            WrongPassword: The server rejected the password.
+            TimeoutError: The server did not answer within `timeout` seconds.
+        """
+        start = time.perf_counter()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ipaddr, port), timeout)
+        connection = cls(reader, writer, timeout)
+        connected = time.perf_counter()
+        try:
+            await connection.login(password)
+        except BaseException:
+            await connection.close()
+            raise
+        connection.connect_time = connected - start
+        connection.auth_time = time.perf_counter() - connected
+        return connection
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    async def _check_open(self):
+        """Fail before writing if the server has already hung up, so the caller knows the command was not sent.
+
+        Raises:
+            StaleConnection: The server closed or reset the connection while it sat idle.
+        """
+        if self.closed or self._reader.at_eof() or self._writer.is_closing():
+            await self.close()
+            raise StaleConnection("Server closed the connection while it was idle")
+
+    async def _send(self, packet: Packet):
+        self._writer.write(bytes(packet))
+        await self._writer.drain()
+
+    async def _receive(self) -> Packet:
+        return await asyncio.wait_for(Packet.read(self._reader), self.timeout)
+
+    async def login(self, password: str):
+        async with self._lock:
+            request = Packet.make_login(self.next_id(), password)
+            await self._guard(self._send(request))
+
+            # Source servers may send an empty RESPONSE_VALUE ahead of the auth response
+            response = await self._guard(self._receive())
+            while response.type != SERVERDATA_AUTH_RESPONSE:
+                response = await self._guard(self._receive())
+
+        if response.id == -1:
+            raise WrongPassword("Invalid Password")
+        if response.id != request.id:
+            raise SessionTimeout("Auth response ID did not match the request")
+
+    async def run(self, command: str, *arguments) -> str:
+        """Send a command and wait for its response.
+
+        Returns:
+            str: The decoded response payload.
+        """
+        async with self._lock:
+            await self._check_open()
+            await self._guard(self._send(Packet.make_command(self.next_id(), command, *arguments)))
+            response = await self._guard(self._receive())
+
+        return response.payload.decode(ENCODING)
+
+    async def run_batch(self, commands: list) -> list:
+        """Pipeline several commands: write them back-to-back, then collect the responses.
+
+        Responses are matched to requests by packet ID. Palworld does not always echo the ID, so a response with
+        an unknown ID is given to the oldest request that is still waiting.
+
+        Args:
+            commands: (list): Ordered (command, arguments) pairs, where arguments is a tuple of strings.
+
+        Returns:
+            list: Decoded responses, in the same order as `commands`.
+        """
+        if not commands:
+            return []
+
+        async with self._lock:
+            requests = [Packet.make_command(self.next_id(), command, *arguments) for command, arguments in commands]
+            await self._check_open()
+            self._writer.write(b"".join(map(bytes, requests)))
+            await self._guard(self._writer.drain())
+
+            positions = {request.id: position for position, request in enumerate(requests)}
+            results = [None] * len(requests)
+            waiting = 0
+            for _ in requests:
+                response = await self._guard(self._receive())
+                position = positions.pop(response.id, None)
+                if position is None:
+                    while results[waiting] is not None:
+                        waiting += 1
+                    position = waiting
+                    del positions[requests[position].id]
+                results[position] = response.payload.decode(ENCODING)
+
+        return results
+
+    async def _guard(self, awaitable):
+        """ Close the connection if an operation on it fails, since the stream is then in an unknown state """
+        try:
+            return await awaitable
+        except BaseException:
+            await self.close()
+            raise
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
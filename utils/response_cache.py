@@ -0,0 +1,88 @@
+"""
+response_cache
+
+Sits in front of the connection pool for read-only commands (Info, ShowPlayers).
+
+- Responses are reused for a per-command TTL (`config.cache_ttls`), so several panels asking for the same thing
+  within a few seconds cost one request.
+- Identical requests that arrive while one is already in flight wait for it instead of sending their own
+  (single-flight). Cancelling one waiter does not cancel the request for the others.
+- Commands that change server state (`config.cache_invalidated_by`) drop the cached responses they affect, and a
+  read that was already in flight when the state changed is not cached.
+
+Like the connection pool, the cache lives on `utils.event_loop.rcon_loop` and is not thread-safe.
+"""
+import time
+import asyncio
+
+import config
+
+__all__ = (
+    "ResponseCache",
+    "response_cache"
+)
+
+
+class ResponseCache:
+    """TTL cache with single-flight coalescing for idempotent RCON commands.
+
+    Args:
+        ttls: (dict): Command -> seconds a response stays fresh. Commands not listed are never cached.
+        invalidated_by: (dict): Mutating command -> commands whose cached responses it makes stale.
+    """
+
+    def __init__(self, ttls: dict = None, invalidated_by: dict = None):
+        self.ttls = dict(config.cache_ttls if ttls is None else ttls)
+        self.invalidated_by = dict(config.cache_invalidated_by if invalidated_by is None else invalidated_by)
+        self._entries = {}  # key -> (expires, response)
+        self._inflight = {}  # key -> asyncio.Task
+        self._generations = {}  # server -> number of invalidations so far
+
+    async def fetch(self, server: tuple, command: str, arguments: tuple, request):
+        """Return a response for `command`, from the cache when possible.
+
+        Args:
+            server: (tuple): Identifies the server, e.g. the connection pool key.
+            command: (str): The sanitised command name.
+            arguments: (tuple): The sanitised arguments.
+            request: Coroutine function taking no arguments that performs the real request.
+        """
+        ttl = self.ttls.get(command)
+        if ttl is None:
+            try:
+                return await request()
+            finally:
+                if command in self.invalidated_by:
+                    self.invalidate(server, *self.invalidated_by[command])
+
+        key = (server, command, tuple(arguments))
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(request())
+            generation = self._generations.get(server, 0)
+            task.add_done_callback(lambda done: self._store(key, ttl, generation, done))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    def _store(self, key: tuple, ttl: float, generation: int, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self._generations.get(key[0], 0) == generation:
+            self._entries[key] = (time.monotonic() + ttl, task.result())
+
+    def invalidate(self, server: tuple, *commands: str):
+        """ Drop cached responses for a server - only for the given commands, or all of them if none are given """
+        self._generations[server] = self._generations.get(server, 0) + 1
+        for key in [key for key in self._entries if key[0] == server and (not commands or key[1] in commands)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+response_cache = ResponseCache()
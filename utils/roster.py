@@ -0,0 +1,108 @@
+"""
+roster
+
+Tracks who is online on a server from successive ShowPlayers snapshots.
+
+Players are keyed by SteamID (falling back to playeruid while Palworld has not reported one yet), so each
+snapshot is compared against the previous one in O(n) and turned into a minimal diff: who joined, who left, and
+who is still online under a different name. Subscribers are notified with every non-empty diff.
+"""
+from utils.players import Player
+
+__all__ = (
+    "player_key",
+    "RosterDiff",
+    "Roster"
+)
+
+
+def player_key(player: Player) -> str:
+    """ Stable identity for a player record """
+    return player.steamid or player.playeruid
+
+
+class RosterDiff:
+    """The change between two roster snapshots.
+
+    Attributes:
+        joined: (list): Players that came online.
+        left: (list): Players that went offline.
+        renamed: (list): (old, new) player pairs for players that are still online under another name.
+    """
+
+    __slots__ = ("joined", "left", "renamed")
+
+    def __init__(self, joined: list = None, left: list = None, renamed: list = None):
+        self.joined = joined or []
+        self.left = left or []
+        self.renamed = renamed or []
+
+    def __bool__(self) -> bool:
+        return bool(self.joined or self.left or self.renamed)
+
+    def __repr__(self) -> str:
+        return f"RosterDiff(joined={self.joined}, left={self.left}, renamed={self.renamed})"
+
+
+class Roster:
+    """ The set of players currently online on one server """
+
+    def __init__(self):
+        self._players = {}
+        self._subscribers = []
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._players
+
+    def __iter__(self):
+        return iter(self._players.values())
+
+    @property
+    def players(self) -> list:
+        return list(self._players.values())
+
+    def get(self, key: str, default=None):
+        return self._players.get(key, default)
+
+    def subscribe(self, callback):
+        """Call `callback(diff)` after every snapshot that changes the roster.
+
+        Returns:
+            Callable: Removes the subscription when called.
+        """
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def update(self, snapshot) -> RosterDiff:
+        """Replace the roster with a new ShowPlayers snapshot.
+
+        Args:
+            snapshot: Iterable of `Player` records.
+
+        Returns:
+            RosterDiff: What changed since the previous snapshot.
+        """
+        previous = self._players
+        current = {player_key(player): player for player in snapshot}
+
+        diff = RosterDiff()
+        for key, player in current.items():
+            old = previous.get(key)
+            if old is None:
+                diff.joined.append(player)
+            elif old != player:
+                diff.renamed.append((old, player))
+        diff.left = [player for key, player in previous.items() if key not in current]
+
+        self._players = current
+        if diff:
+            for callback in list(self._subscribers):
+                callback(diff)
+        return diff
+
+    def clear(self) -> RosterDiff:
+        """ Forget every player, e.g. after losing the connection. Subscribers see everyone leave """
+        return self.update(())
@@ -0,0 +1,295 @@
+"""
+scheduler
+
+Decides when each command reaches its server. Every request that misses the response cache is queued here
+instead of going straight to the connection pool, so a lagging server is not buried under requests and an urgent
+command does not wait behind a pile of player list polls.
+
+- Priorities: interactive commands (the console) go before moderation (kicks and their broadcasts), which go
+  before polling (background ShowPlayers). Within a priority, commands keep the order they were queued in.
+- Rate limit: each server has a token bucket of `config.scheduler_burst` commands, refilled at
+  `config.scheduler_rate` per second, and at most `config.scheduler_concurrency` of its commands are in flight.
+  Moderation commands may go past that, up to `config.moderation_max_concurrency`, so kicking a dozen raiders
+  does not take a dozen round trips.
+- Queue depth: at most `config.scheduler_max_queue` commands wait per server. When it is full, the lowest
+  priority command waiting is dropped to make room for a more urgent one; otherwise the new command is refused.
+  Either way the caller gets `QueueFull`.
+- Stale polls: a poll queued while an identical one is still waiting replaces it, and whoever was waiting on the
+  old poll gets the new poll's response.
+- Cancellation: a request runs as long as someone is waiting for it. When its last waiter is cancelled it is taken
+  off the queue, or cancelled if it has already started. A waiter is never cancelled by another one.
+
+Like the connection pool, the scheduler lives on `utils.event_loop.rcon_loop` and is not thread-safe.
+"""
+import time
+import heapq
+import asyncio
+from enum import IntEnum
+from logging import getLogger
+
+from utils.pal_exceptions import QueueFull
+import config
+
+__all__ = (
+    "Priority",
+    "TokenBucket",
+    "CommandScheduler",
+    "command_scheduler"
+)
+
+
+LOGGER = getLogger(__file__)
+
+
+class Priority(IntEnum):
+    """ Lower values are sent first """
+    INTERACTIVE = 0
+    MODERATION = 1
+    POLLING = 2
+
+
+class TokenBucket:
+    """Allows `burst` commands at once, then `rate` per second.
+
+    Args:
+        rate: (float): Tokens added per second. None or 0 turns the limit off.
+        burst: (float): Most tokens the bucket holds.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def delay(self, cost: float = 1) -> float:
+        """ Seconds until `cost` tokens are available - 0 if they are now """
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        missing = min(cost, self.burst) - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, cost: float = 1):
+        if self.rate:
+            self.tokens -= min(cost, self.burst)
+
+
+class _Job:
+    """ A queued request. Ordered by priority, then by when it was queued """
+
+    __slots__ = ("priority", "sequence", "request", "cost", "coalesce", "future", "queued", "waiters",
+                 "replaced_by", "task")
+
+    def __init__(self, priority: Priority, sequence: int, request, cost: int, coalesce, future: asyncio.Future):
+        self.priority = priority
+        self.sequence = sequence
+        self.request = request
+        self.cost = cost
+        self.coalesce = coalesce
+        self.future = future
+        self.queued = True  # False once it has started, been replaced, dropped or abandoned by its callers
+        self.waiters = 1  # Callers still waiting, including those of the jobs it replaced
+        self.replaced_by = None  # The job that took over its waiters, if it was replaced
+        self.task = None  # The running request, once it has started
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class _ServerQueue:
+    """ The waiting commands, rate limit and dispatcher of one server """
+
+    __slots__ = ("heap", "depth", "coalesced", "bucket", "in_flight", "wake", "dispatcher")
+
+    def __init__(self, rate: float, burst: float):
+        self.heap = []  # Jobs no longer queued are left in place and skipped when popped
+        self.depth = 0  # Jobs still queued
+        self.coalesced = {}  # coalesce key -> the queued poll with that key
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.wake = asyncio.Event()  # Set when a command finishes or is queued, while the dispatcher waits for a slot
+        self.dispatcher = None
+
+    def unqueue(self, job: _Job):
+        if job.queued:
+            job.queued = False
+            self.depth -= 1
+            if job.coalesce is not None and self.coalesced.get(job.coalesce) is job:
+                del self.coalesced[job.coalesce]
+
+    def peek(self) -> _Job | None:
+        """ The queued job that would be sent next """
+        while self.heap and not self.heap[0].queued:
+            heapq.heappop(self.heap)
+        return self.heap[0] if self.heap else None
+
+    def pop(self) -> _Job | None:
+        job = self.peek()
+        if job is not None:
+            heapq.heappop(self.heap)
+            self.unqueue(job)
+        return job
+
+    def lowest(self) -> _Job | None:
+        """ The queued job that would be sent last """
+        return max((job for job in self.heap if job.queued), default=None)
+
+
+class CommandScheduler:
+    """Per-server priority queues in front of the connection pool.
+
+    Args:
+        rate: (float): Commands per second per server once the burst is spent. Defaults to `config.scheduler_rate`.
+        burst: (int): Commands per server sent without waiting after a quiet spell. Defaults to
+            `config.scheduler_burst`.
+        max_queue: (int): Commands waiting per server. Defaults to `config.scheduler_max_queue`.
+        concurrency: (int): Commands in flight per server. Defaults to `config.scheduler_concurrency`.
+        moderation_concurrency: (int): Commands in flight per server while the next one is a moderation command.
+            Defaults to `config.moderation_max_concurrency`, and is never below `concurrency`.
+    """
+
+    def __init__(self, rate: float = None, burst: int = None, max_queue: int = None, concurrency: int = None,
+                 moderation_concurrency: int = None):
+        self.rate = config.scheduler_rate if rate is None else rate
+        self.burst = config.scheduler_burst if burst is None else burst
+        self.max_queue = config.scheduler_max_queue if max_queue is None else max_queue
+        self.concurrency = config.scheduler_concurrency if concurrency is None else concurrency
+        self.moderation_concurrency = config.moderation_max_concurrency if moderation_concurrency is None \
+            else moderation_concurrency
+        self._queues = {}
+        self._sequence = 0
+
+    def depth(self, server: tuple) -> int:
+        """ Number of commands waiting for a server """
+        queue = self._queues.get(server)
+        return queue.depth if queue is not None else 0
+
+    async def submit(self, server: tuple, request, priority: Priority = Priority.INTERACTIVE, cost: int = 1,
+                     coalesce=None):
+        """Queue a request and wait for its result.
+
+        Args:
+            server: (tuple): Identifies the server, e.g. the connection pool key.
+            request: Coroutine function taking no arguments that performs the real request.
+            priority: (Priority): Where the request goes in the queue.
+            cost: (int): Tokens it uses, e.g. the number of commands in a batch.
+            coalesce: Hashable key of an idempotent request, e.g. (command, arguments). A newer request with
+                the same key replaces this one while it is still waiting.
+
+        Raises:
+            QueueFull: The server's queue is full of requests at least as urgent, or this one was dropped to
+                make room for a more urgent one.
+        """
+        queue = self._queues.get(server)
+        if queue is None:
+            queue = self._queues[server] = _ServerQueue(self.rate, self.burst)
+
+        loop = asyncio.get_running_loop()
+        self._sequence += 1
+        job = _Job(priority, self._sequence, request, cost, coalesce, loop.create_future())
+
+        stale = queue.coalesced.get(coalesce) if coalesce is not None else None
+        if stale is not None:
+            queue.unqueue(stale)
+            stale.replaced_by = job
+            job.waiters += stale.waiters
+            job.future.add_done_callback(lambda done: _copy_outcome(done, stale.future))
+            LOGGER.debug(f"Replaced a stale queued request for {server[:2]}")
+        elif queue.depth >= self.max_queue:
+            lowest = queue.lowest()
+            if lowest is None or lowest.priority <= priority:
+                raise QueueFull(f"{queue.depth} commands already waiting for {server[0]}:{server[1]}")
+            queue.unqueue(lowest)
+            lowest.future.set_exception(QueueFull(f"Dropped for a more urgent command to {server[0]}:{server[1]}"))
+            LOGGER.debug(f"Dropped a {lowest.priority.name} request for {server[:2]}")
+
+        queue.depth += 1
+        if coalesce is not None:
+            queue.coalesced[coalesce] = job
+        heapq.heappush(queue.heap, job)
+        queue.wake.set()  # A moderation command may start even though every usual slot is taken
+        if queue.dispatcher is None or queue.dispatcher.done():
+            queue.dispatcher = loop.create_task(self._dispatch(queue), name=f"scheduler-{server[0]}:{server[1]}")
+        try:
+            # Shielded, so one waiter being cancelled does not cancel the result the others are waiting for
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            _abandon(queue, job)
+            raise
+
+    async def _dispatch(self, queue: _ServerQueue):
+        """ Start queued jobs, best first, as fast as the rate limit and concurrency allow """
+        loop = asyncio.get_running_loop()
+        while queue.depth:
+            job = queue.peek()
+            if job is None:
+                break
+            if queue.in_flight >= self._limit(job):
+                queue.wake.clear()
+                await queue.wake.wait()
+                continue
+            delay = queue.bucket.delay(job.cost)
+            if delay:
+                await asyncio.sleep(delay)  # A more urgent job queued meanwhile is picked on the next pass
+                continue
+            queue.pop()
+            queue.bucket.take(job.cost)
+            queue.in_flight += 1
+            job.task = loop.create_task(self._run(queue, job))
+
+    def _limit(self, job: _Job) -> int:
+        """ Commands that may be in flight to a server for `job` to start """
+        if job.priority == Priority.MODERATION:
+            return max(self.concurrency, self.moderation_concurrency)
+        return self.concurrency
+
+    @staticmethod
+    async def _run(queue: _ServerQueue, job: _Job):
+        try:
+            result = await job.request()
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as err:
+            if not job.future.done():
+                job.future.set_exception(err)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            queue.in_flight -= 1
+            queue.wake.set()
+
+
+def _abandon(queue: _ServerQueue, job: _Job):
+    """ One waiter of `job` gave up. Once nobody is left waiting, drop the job or cancel its running request """
+    while job.replaced_by is not None:
+        job = job.replaced_by
+    job.waiters -= 1
+    if job.waiters > 0:
+        return
+    queue.unqueue(job)
+    if job.task is not None:
+        job.task.cancel()
+    elif not job.future.done():
+        job.future.cancel()
+
+
+def _copy_outcome(source: asyncio.Future, target: asyncio.Future):
+    """ Give a replaced job's waiters the outcome of the job that replaced it """
+    if target.done():
+        return
+    if source.cancelled():
+        # Only happens once every waiter has gone, but a replaced job's future is never cancelled all the same
+        target.set_exception(ConnectionError("Request abandoned by every caller"))
+        target.exception()  # Nobody is left to retrieve it
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+command_scheduler = CommandScheduler()
@@ -0,0 +1,62 @@
+"""
+startup
+
+Measures how long the window takes to come up, and warms up imports in the background.
+
+The clock starts when this module is first imported, which `main.pyw` does before anything else. Phases are
+recorded with `startup.mark(name)` and printed once the window is fully loaded when timing is enabled:
+- `python main.pyw --startup-time` prints them and closes the window, for scripted measurements.
+- The PALCONNECT_STARTUP_TIME environment variable prints them and keeps the window open.
+"""
+import os
+import sys
+import time
+import importlib
+import threading
+
+__all__ = (
+    "StartupTimer",
+    "startup",
+    "preload"
+)
+
+
+class StartupTimer:
+    """ Records the time of each startup phase, relative to when the timer was created """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.marks = []  # (name, seconds since origin)
+        self.enabled = bool(os.environ.get("PALCONNECT_STARTUP_TIME"))
+        self.quit_when_loaded = False
+
+    def mark(self, name: str):
+        self.marks.append((name, time.perf_counter() - self.origin))
+
+    def report(self, file=None) -> str:
+        """ Print the recorded phases, each with its time since startup and since the previous phase """
+        lines, previous = ["Startup timing (ms)   total    step"], 0.0
+        for name, seconds in self.marks:
+            lines.append(f"  {name:<18} {seconds * 1000:7.1f} {(seconds - previous) * 1000:7.1f}")
+            previous = seconds
+        text = "\n".join(lines)
+        print(text, file=file or sys.stderr, flush=True)
+        return text
+
+
+def preload(*modules: str):
+    """Import modules on a daemon thread, so that the first use on the main thread finds them loaded.
+
+    If the main thread needs a module before the thread gets to it, Python's import lock makes it wait for that
+    one import rather than loading it twice.
+    """
+    def run():
+        for module in modules:
+            importlib.import_module(module)
+
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+startup = StartupTimer()
@@ -0,0 +1,373 @@
+"""
+tasks
+
+Scheduled tasks that PalConnect runs by itself, instead of external cron jobs sending commands:
+- save: Save the world every `interval` seconds.
+- announce: Broadcast `message` every `interval` seconds.
+- restart: Broadcast a countdown `warnings` seconds before `at`, then Save and send `Shutdown {seconds} {message}`.
+  Repeats every `interval` seconds if one is given, e.g. a daily restart.
+
+Every task of an engine is driven by one timer heap on `utils.event_loop.rcon_loop` - a single asyncio task that
+sleeps until the earliest event is due - rather than a thread or timer per task. Task definitions are kept in
+`config.tasks_path` as JSON, along with when each task next runs, so a restart of PalConnect keeps the schedule.
+Runs missed while PalConnect was closed are skipped, not made up. A running engine picks up changes made to the
+file by someone else within `config.tasks_check_interval` seconds, even while it has no tasks.
+
+The same engine runs in the window (see `core.app`) and headless (`python -m palconnect daemon`), and tasks are
+managed with `python -m palconnect tasks`.
+"""
+import os
+import re
+import json
+import time
+import heapq
+import asyncio
+from logging import getLogger
+
+from utils.application_utilities import async_send_batch
+from utils.event_loop import rcon_loop
+from utils.scheduler import Priority
+import config
+
+__all__ = (
+    "ScheduledTask",
+    "TaskEngine",
+    "load_tasks",
+    "save_tasks",
+    "describe_tasks",
+    "parse_duration",
+    "parse_start",
+    "format_duration"
+)
+
+
+LOGGER = getLogger(__file__)
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*([dhms]?)", re.IGNORECASE)
+_UNITS = {"d": 86400, "h": 3600, "m": 60, "s": 1, "": 1}
+
+
+def parse_duration(text: str) -> float:
+    """Read a duration such as "90", "45s", "30m", "1h30m" or "1d".
+
+    Raises:
+        ValueError: Not a duration.
+    """
+    text = str(text).strip()
+    parts = _DURATION.findall(text)
+    if not parts or "".join(number + unit for number, unit in parts) != re.sub(r"\s+", "", text):
+        raise ValueError(f"Not a duration: {text!r}. Use e.g. 90, 45s, 30m, 1h30m or 1d")
+    return sum(float(number) * _UNITS[unit.lower()] for number, unit in parts)
+
+
+def parse_start(text: str, now: float = None) -> float:
+    """Read when a task first runs: a time of day ("04:00", the next time it comes round) or a delay ("+10m").
+
+    Returns:
+        float: Seconds since the epoch.
+    """
+    now = time.time() if now is None else now
+    text = text.strip()
+    if text.startswith("+"):
+        return now + parse_duration(text[1:])
+    match = re.fullmatch(r"(\d{1,2}):(\d{2})", text)
+    if match is None or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        raise ValueError(f"Not a start time: {text!r}. Use a time of day such as 04:00, or a delay such as +10m")
+    start = time.localtime(now)
+    at = time.mktime((start.tm_year, start.tm_mon, start.tm_mday, int(match.group(1)), int(match.group(2)), 0,
+                      0, 0, -1))
+    return at if at > now else at + 86400
+
+
+def format_duration(seconds: float) -> str:
+    """ "10 minutes", "1 hour 30 minutes", "30 seconds" """
+    seconds, parts = int(round(seconds)), []
+    for name, size in (("day", 86400), ("hour", 3600), ("minute", 60), ("second", 1)):
+        count, seconds = divmod(seconds, size)
+        if count:
+            parts.append(f"{count} {name}{'s' if count != 1 else ''}")
+    return " ".join(parts) or "0 seconds"
+
+
+class ScheduledTask:
+    """One scheduled task. See the module docstring for what each kind does.
+
+    Args:
+        name: (str): Unique name of the task.
+        kind: (str): "save", "announce" or "restart".
+        interval: (float): Seconds between runs. Required for save and announce; a restart without one runs once.
+        at: (float): When the task next runs, in seconds since the epoch. Defaults to `interval` from now, so a
+            one-off restart must give it.
+        message: (str): The announcement, or the message shown with a restart's countdown and Shutdown.
+        seconds: (int): The Shutdown delay of a restart. Defaults to `config.tasks_shutdown_seconds`.
+        warnings: (list): Seconds before a restart to broadcast a countdown. Defaults to
+            `config.tasks_restart_warnings`.
+        enabled: (bool): Disabled tasks are kept but never run.
+
+    Raises:
+        ValueError: Unknown kind, a recurring kind without an interval, or a one-off task without a start time.
+    """
+
+    KINDS = ("save", "announce", "restart")
+
+    def __init__(self, name: str, kind: str, interval: float = None, at: float = None, message: str = "",
+                 seconds: int = None, warnings: list = None, enabled: bool = True):
+        if kind not in self.KINDS:
+            raise ValueError(f"{name}: unknown task kind {kind!r}. Known: {', '.join(self.KINDS)}")
+        if kind != "restart" and not interval:
+            raise ValueError(f"{name}: a {kind} task needs an interval")
+        if kind == "announce" and not message.strip():
+            raise ValueError(f"{name}: an announce task needs a message")
+        if interval is not None and interval <= 0:
+            raise ValueError(f"{name}: the interval must be positive")
+        if at is None and not interval:
+            raise ValueError(f"{name}: a one-off {kind} task needs a start time")
+
+        self.name = name
+        self.kind = kind
+        self.interval = interval
+        self.at = time.time() + (interval or 0) if at is None else at
+        self.message = message
+        self.seconds = config.tasks_shutdown_seconds if seconds is None else int(seconds)
+        self.warnings = sorted(config.tasks_restart_warnings if warnings is None else warnings, reverse=True)
+        self.enabled = enabled
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScheduledTask":
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        data = {"name": self.name, "kind": self.kind, "interval": self.interval, "at": self.at,
+                "message": self.message, "enabled": self.enabled}
+        if self.kind == "restart":
+            data.update(seconds=self.seconds, warnings=self.warnings)
+        return data
+
+    def events(self, now: float) -> list:
+        """ (when, warning seconds or None for the run itself) for every event of the next run still to come """
+        events = [(self.at - warning, warning) for warning in self.warnings if warning > 0] \
+            if self.kind == "restart" else []
+        events.append((self.at, None))
+        return [event for event in events if event[0] > now or event[1] is None]
+
+    def commands(self, warning: float | None) -> list:
+        """ The (command, arguments) pairs to send for an event """
+        if self.kind == "save":
+            return [("Save", ())]
+        if self.kind == "announce":
+            return [("Broadcast", (self.message,))]
+        message = self.message or config.tasks_restart_message
+        if warning is not None:
+            return [("Broadcast", (f"{message} in {format_duration(warning + self.seconds)}",))]
+        return [("Save", ()), ("Shutdown", (str(self.seconds), message))]
+
+    def advance(self, now: float) -> bool:
+        """Move `at` to the next run after `now`.
+
+        Returns:
+            bool: False for a one-off restart, which has no next run.
+        """
+        if not self.interval:
+            return False
+        if self.at <= now:
+            self.at += ((now - self.at) // self.interval + 1) * self.interval
+        return True
+
+    def describe(self) -> str:
+        every = f"every {format_duration(self.interval)}" if self.interval else "once"
+        state = f"next {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.at))}" if self.enabled else "disabled"
+        detail = f" - {self.message}" if self.message else ""
+        return f"{self.name}: {self.kind} {every}, {state}{detail}"
+
+
+def load_tasks(path: str = None) -> list:
+    """ Read task definitions. A missing file means no tasks """
+    path = config.tasks_path if path is None else path
+    try:
+        with open(path, encoding="utf-8") as file:
+            return [ScheduledTask.from_dict(data) for data in json.load(file)]
+    except FileNotFoundError:
+        return []
+
+
+def save_tasks(tasks, path: str = None):
+    """ Write task definitions, replacing the file in one step so a crash cannot leave it half written """
+    path = config.tasks_path if path is None else path
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump([task.to_dict() for task in tasks], file, indent=2)
+    os.replace(temporary, path)
+
+
+def describe_tasks(tasks) -> str:
+    """ One line per task, for the console and `palconnect tasks list` """
+    return "\n".join(task.describe() for task in tasks) or "No scheduled tasks"
+
+
+class TaskEngine:
+    """Runs scheduled tasks against one server from a single timer heap on `rcon_loop`.
+
+    Args:
+        credentials: (dict): RCON connection details (ipaddr, port, password).
+        path: (str): Task definitions file. Defaults to `config.tasks_path`.
+        on_run: Called on `rcon_loop` with (task, warning, responses or exception) after each event.
+    """
+
+    def __init__(self, credentials: dict, path: str = None, on_run=None):
+        self.credentials = credentials
+        self.path = config.tasks_path if path is None else path
+        self.on_run = on_run
+        self.tasks = {}
+        self._heap = []  # (when, sequence, generation, name, warning)
+        self._sequence = 0
+        self._generations = {}  # name -> generation of its events in the heap; older entries are skipped
+        self._wake = None
+        self._task = None
+        self._running = set()  # Events being sent. Kept referenced so they are not garbage collected mid-run
+        self._mtime = None  # Modification time of the definitions file when it was last read or written
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> "TaskEngine":
+        """ Load the task definitions and start running them. Safe to call from any thread """
+        rcon_loop.call_soon(self._start)
+        return self
+
+    def stop(self):
+        """ Stop running tasks. Safe to call from any thread """
+        rcon_loop.call_soon(self._stop)
+
+    def add(self, task: ScheduledTask):
+        """ Add or replace a task and save the definitions. Safe to call from any thread """
+        rcon_loop.call_soon(self._add, task)
+
+    def remove(self, name: str):
+        """ Remove a task and save the definitions. Safe to call from any thread """
+        rcon_loop.call_soon(self._remove, name)
+
+    def _start(self):
+        if self.active:
+            return
+        self._wake = asyncio.Event()
+        self._load()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="task-engine")
+
+    def _load(self):
+        """ (Re)read the definitions and schedule every task from scratch """
+        now = time.time()
+        try:
+            tasks = load_tasks(self.path)
+        except (OSError, ValueError, TypeError) as err:
+            LOGGER.error(f"Could not read scheduled tasks from {self.path} - {err}")
+            tasks = list(self.tasks.values())
+        self._mtime = self._modified()
+
+        for name in self.tasks:
+            self._generations[name] = self._generations.get(name, 0) + 1
+        self.tasks = {task.name: task for task in tasks}
+        for task in tasks:
+            if task.at <= now and not task.advance(now):
+                task.enabled = False  # A one-off restart that was due while PalConnect was closed
+            self._schedule(task, now)
+
+    def _modified(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _reload_if_changed(self) -> bool:
+        """ Pick up changes made to the file by someone else, before they could be overwritten """
+        if self._modified() == self._mtime:
+            return False
+        self._load()
+        return True
+
+    def _stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for running in self._running:
+            running.cancel()
+
+    def _add(self, task: ScheduledTask):
+        self._reload_if_changed()
+        self.tasks[task.name] = task
+        self._schedule(task, time.time())
+        self._save()
+
+    def _remove(self, name: str):
+        self._reload_if_changed()
+        if self.tasks.pop(name, None) is not None:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            self._save()
+            self._poke()
+
+    def _save(self):
+        try:
+            save_tasks(self.tasks.values(), self.path)
+            self._mtime = self._modified()
+        except OSError as err:
+            LOGGER.error(f"Could not save scheduled tasks - {err}")
+
+    def _schedule(self, task: ScheduledTask, now: float):
+        """ Replace a task's events in the heap with those of its next run """
+        generation = self._generations[task.name] = self._generations.get(task.name, 0) + 1
+        if task.enabled:
+            for when, warning in task.events(now):
+                self._sequence += 1
+                heapq.heappush(self._heap, (when, self._sequence, generation, task.name, warning))
+        self._poke()
+
+    def _poke(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            self._reload_if_changed()
+            while self._heap and self._heap[0][2] != self._generations.get(self._heap[0][3]):
+                heapq.heappop(self._heap)  # Events of removed or rescheduled tasks
+
+            self._wake.clear()
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                # Capped, even with nothing scheduled, so that a change of the system clock or of the file is noticed
+                check = config.tasks_check_interval
+                try:
+                    await asyncio.wait_for(self._wake.wait(), check if delay is None else min(delay, check))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if self._reload_if_changed():
+                continue
+            _, _, _, name, warning = heapq.heappop(self._heap)
+            task = self.tasks[name]
+            if warning is None:
+                if not task.advance(time.time()):
+                    task.enabled = False
+                self._schedule(task, time.time())
+                self._save()
+            # Sent on its own task, so a server that is slow to answer does not hold up the other tasks' timers
+            running = asyncio.get_running_loop().create_task(self._fire(task, warning))
+            self._running.add(running)
+            running.add_done_callback(self._running.discard)
+
+    async def _fire(self, task: ScheduledTask, warning: float | None):
+        LOGGER.info(f"Running scheduled task {task.name}{'' if warning is None else f' ({warning}s warning)'}")
+        try:
+            outcome = await async_send_batch(self.credentials, task.commands(warning), priority=Priority.MODERATION)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            LOGGER.warning(f"Scheduled task {task.name} failed - {type(err).__name__}: {err}")
+            outcome = err
+        if self.on_run is not None:
+            try:
+                self.on_run(task, warning, outcome)
+            except Exception as err:
+                LOGGER.error(f"Scheduled task callback failed - {err}")
@@ -0,0 +1,259 @@
+"""
+transcript
+
+An append-only, on-disk record of everything a session does: every command sent with its response or error,
+and every player list snapshot.
+
+Records are JSON lines written by a background thread, so callers only pay for a queue put. The current segment
+is rotated once it reaches `config.transcript_max_bytes` or `config.transcript_max_age` seconds; rotated segments
+are gzipped, and a compact entry describing each one (time range, commands used, players seen) is appended to
+`index.jsonl`. `search()` reads the index first and only opens segments that can contain a match.
+"""
+import os
+import gzip
+import json
+import time
+import queue
+import shutil
+import threading
+
+import config
+
+__all__ = (
+    "TranscriptWriter",
+    "transcript",
+    "search"
+)
+
+
+INDEX_NAME = "index.jsonl"
+# Commands whose argument is a SteamID or playeruid. Other numbers, such as the seconds of a Shutdown, are not players
+PLAYER_COMMANDS = frozenset(("kickplayer", "banplayer", "teleporttoplayer", "teleporttome"))
+_SEGMENT_PREFIX = "transcript-"
+_CLOSE = object()
+
+
+def _player_arguments(record: dict) -> tuple:
+    """ The players a command record names """
+    return tuple(record.get('args', ())) if record.get('command', "").lower() in PLAYER_COMMANDS else ()
+
+
+class _SegmentSummary:
+    """ What the index records about a segment, gathered while it is written """
+
+    __slots__ = ("start", "end", "records", "commands", "players", "servers")
+
+    def __init__(self):
+        self.start = None
+        self.end = None
+        self.records = 0
+        self.commands = set()
+        self.players = set()
+        self.servers = set()
+
+    def add(self, record: dict):
+        self.start = record['t'] if self.start is None else self.start
+        self.end = record['t']
+        self.records += 1
+        self.servers.add(record['server'])
+        if 'command' in record:
+            self.commands.add(record['command'])
+        self.players.update(record.get('players', ()))
+        self.players.update(_player_arguments(record))
+
+    def to_index(self, segment: str) -> dict:
+        return {
+            "segment": segment,
+            "start": self.start,
+            "end": self.end,
+            "records": self.records,
+            "servers": sorted(self.servers),
+            "commands": sorted(self.commands),
+            "players": sorted(self.players)
+        }
+
+
+class TranscriptWriter:
+    """Writes session records to rotating, gzipped JSON-lines segments on a background thread.
+
+    Args:
+        directory: (str): Where segments and the index are kept. Defaults to `config.transcript_path`.
+        max_bytes: (int): Rotate the current segment once it is this large.
+        max_age: (float): Rotate the current segment once it is this many seconds old.
+        flush_interval: (float): Seconds between flushes of buffered records to disk.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None, max_age: float = None,
+                 flush_interval: float = None):
+        self.directory = config.transcript_path if directory is None else directory
+        self.max_bytes = config.transcript_max_bytes if max_bytes is None else max_bytes
+        self.max_age = config.transcript_max_age if max_age is None else max_age
+        self.flush_interval = config.transcript_flush_interval if flush_interval is None else flush_interval
+        self.enabled = config.transcript_enabled
+
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._segment = None
+        self._size = 0
+        self._opened = 0.0
+        self._summary = None
+
+    # - Producer side, safe to call from any thread
+
+    def record_command(self, server: str, command: str, arguments=(), response: str = None, error: str = None):
+        record = {"t": time.time(), "server": server, "kind": "command", "command": command,
+                  "args": [str(argument) for argument in arguments]}
+        if error is not None:
+            record['error'] = error
+        else:
+            record['response'] = response
+        self._put(record)
+
+    def record_players(self, server: str, players):
+        """ Record a player list snapshot as the SteamIDs (or playeruids) of everyone online """
+        self._put({"t": time.time(), "server": server, "kind": "players",
+                   "players": [player.steamid or player.playeruid for player in players]})
+
+    def _put(self, record: dict):
+        if not self.enabled:
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="transcript", daemon=True)
+                    self._thread.start()
+        self._queue.put(record)
+
+    def close(self, timeout: float = 5.0):
+        """ Flush outstanding records and close the current segment """
+        if self._thread is not None:
+            self._queue.put(_CLOSE)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # - Writer thread
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._recover()
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = None
+
+            if record is _CLOSE:
+                self._rotate()
+                return
+            if record is not None:
+                self._write(record)
+
+            if self._file is not None and time.monotonic() - last_flush >= self.flush_interval:
+                self._file.flush()
+                last_flush = time.monotonic()
+                if time.time() - self._opened >= self.max_age:
+                    self._rotate()
+
+    def _write(self, record: dict):
+        if self._file is None:
+            self._opened = time.time()
+            self._segment = self._new_segment_name()
+            self._file = open(os.path.join(self.directory, self._segment), "ab", buffering=1 << 16)
+            self._summary = _SegmentSummary()
+            self._size = 0
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        self._file.write(line)
+        self._size += len(line)
+        self._summary.add(record)
+        if self._size >= self.max_bytes:
+            self._rotate()
+
+    def _new_segment_name(self) -> str:
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self._opened))
+        name, sequence = f"{_SEGMENT_PREFIX}{stamp}.jsonl", 0
+        while os.path.exists(os.path.join(self.directory, f"{name}.gz")):
+            sequence += 1  # Several rotations within the same second
+            name = f"{_SEGMENT_PREFIX}{stamp}-{sequence}.jsonl"
+        return name
+
+    def _rotate(self):
+        """ Close the current segment, gzip it and add it to the index """
+        if self._file is None:
+            return
+        self._file.close()
+        self._seal(self._segment, self._summary)
+        self._file = self._segment = self._summary = None
+
+    def _seal(self, segment: str, summary: _SegmentSummary):
+        path = os.path.join(self.directory, segment)
+        with open(path, "rb") as source, gzip.open(f"{path}.gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(path)
+        if summary.records:
+            with open(os.path.join(self.directory, INDEX_NAME), "a", encoding="utf-8") as index:
+                index.write(json.dumps(summary.to_index(f"{segment}.gz"), separators=(",", ":")) + "\n")
+
+    def _recover(self):
+        """ Seal segments left uncompressed by a session that did not shut down cleanly """
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(".jsonl"):
+                summary = _SegmentSummary()
+                with open(os.path.join(self.directory, name), encoding="utf-8") as segment:
+                    for line in segment:
+                        try:
+                            summary.add(json.loads(line))
+                        except (ValueError, KeyError):
+                            continue  # Torn write at the end of the segment
+                self._seal(name, summary)
+
+
+def search(directory: str = None, start: float = None, end: float = None, command: str = None,
+           player: str = None, server: str = None):
+    """Search sealed transcript segments, opening only those whose index entry can match.
+
+    Args:
+        directory: (str): Transcript directory. Defaults to `config.transcript_path`.
+        start: (float): Only records at or after this UNIX time.
+        end: (float): Only records at or before this UNIX time.
+        command: (str): Only records of this command (case-insensitive).
+        player: (str): Only records mentioning this SteamID or playeruid.
+        server: (str): Only records for this server ("ipaddr:port").
+
+    Yields:
+        dict: Matching records, oldest first.
+    """
+    directory = config.transcript_path if directory is None else directory
+    index_path = os.path.join(directory, INDEX_NAME)
+    if not os.path.exists(index_path):
+        return
+    command = command.lower() if command else None
+
+    with open(index_path, encoding="utf-8") as index:
+        entries = [json.loads(line) for line in index if line.strip()]
+
+    for entry in entries:
+        if start is not None and entry['end'] < start or end is not None and entry['start'] > end:
+            continue
+        if command and command not in (name.lower() for name in entry['commands']):
+            continue
+        if player and player not in entry['players'] or server and server not in entry['servers']:
+            continue
+
+        with gzip.open(os.path.join(directory, entry['segment']), "rt", encoding="utf-8") as segment:
+            for line in segment:
+                record = json.loads(line)
+                if start is not None and record['t'] < start or end is not None and record['t'] > end:
+                    continue
+                if command and record.get('command', '').lower() != command:
+                    continue
+                if player and player not in record.get('players', ()) and player not in _player_arguments(record):
+                    continue
+                if server and record['server'] != server:
+                    continue
+                yield record
+
+
+transcript = TranscriptWriter()
@@ -0,0 +1,111 @@
+"""
+ui_dispatch
+
+Tk widgets may only be touched from the thread running the Tk main loop. Background work (the RCON loop,
+pollers, writers) posts UI updates to a `UiDispatcher` instead, and the main loop drains the queue every
+`config.ui_drain_interval` ms through `after()`, spending at most `config.ui_frame_budget` ms per drain.
+
+Updates can be coalesced so that a burst turns into a single redraw:
+- `post(..., key=k)` keeps only the latest pending update for `k`.
+- `post_batched(k, flush, item)` collects every item posted under `k` and hands them to `flush` in one call.
+"""
+import time
+import threading
+from collections import deque
+
+import config
+
+__all__ = (
+    "UiDispatcher",
+)
+
+
+# Kinds of queue entry
+_CALL = "call"
+_KEYED = "keyed"
+_BATCHED = "batched"
+
+
+class UiDispatcher:
+    """A thread-safe queue of UI updates, drained on the Tk main loop.
+
+    Args:
+        root: The Tk root window, used for `after()` scheduling.
+        interval: (int): Milliseconds between drains. Defaults to `config.ui_drain_interval`.
+        budget: (float): Milliseconds a drain may run before yielding back to Tk. Defaults to `config.ui_frame_budget`.
+    """
+
+    def __init__(self, root, interval: int = None, budget: float = None):
+        self.root = root
+        self.interval = config.ui_drain_interval if interval is None else interval
+        self.budget = (config.ui_frame_budget if budget is None else budget) / 1000
+        self._queue = deque()
+        self._keyed = {}
+        self._batches = {}
+        self._lock = threading.Lock()
+        self._after_id = None
+
+    def post(self, callback, *args, key=None):
+        """Run `callback(*args)` on the Tk main loop. Safe to call from any thread.
+
+        Args:
+            key: If given, replaces any update still pending under the same key instead of queueing another one.
+        """
+        with self._lock:
+            if key is None:
+                self._queue.append((_CALL, (callback, args)))
+            else:
+                if key not in self._keyed:
+                    self._queue.append((_KEYED, key))
+                self._keyed[key] = (callback, args)
+
+    def post_batched(self, key, flush, item):
+        """Queue `item` to be handed to `flush(items)` together with everything else posted under `key`.
+
+        Safe to call from any thread.
+        """
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                self._batches[key] = (flush, [item])
+                self._queue.append((_BATCHED, key))
+            else:
+                batch[1].append(item)
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _next(self):
+        with self._lock:
+            if not self._queue:
+                return None
+            kind, entry = self._queue.popleft()
+            if kind is _KEYED:
+                return self._keyed.pop(entry)
+            if kind is _BATCHED:
+                flush, items = self._batches.pop(entry)
+                return flush, (items,)
+            return entry
+
+    def drain(self):
+        """ Run pending updates until the queue is empty or the frame budget is spent """
+        deadline = time.perf_counter() + self.budget
+        while time.perf_counter() < deadline:
+            update = self._next()
+            if update is None:
+                return
+            callback, args = update
+            try:
+                callback(*args)
+            except Exception as err:
+                print(f"UI update failed - {type(err).__name__}: {err}")
+
+    def _drain(self):
+        self.drain()
+        self._after_id = self.root.after(self.interval, self._drain)
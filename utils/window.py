@@ -0,0 +1,30 @@
+"""
+window
+
+Small window helpers the login screen needs before anything else is loaded. Kept free of the RCON stack (asyncio,
+the connection pool, the transcript) so that importing them does not slow down the first paint.
+"""
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import customtkinter
+
+__all__ = (
+    "center_window",
+    "open_site"
+)
+
+
+def center_window(screen: "customtkinter.CTk", width: int, height: int, scale_factor: float = 1.0) -> str:
+    screen_width = screen.winfo_screenwidth()
+    screen_height = screen.winfo_screenheight()
+    x = int(((screen_width/2) - (width/2)) * scale_factor)
+    y = int(((screen_height/2) - (height/1.5)) * scale_factor)
+
+    return f"{width}x{height}+{x}+{y}"
+
+
+def open_site(url):
+    """ Opens provided website """
+    import webbrowser  # Deferred, as only the login screen's social buttons need it
+    webbrowser.open_new(url)
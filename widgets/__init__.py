@@ -1,2 +1,4 @@
 from .spinbox import *
 from .scrollable_frames import *
+from .console import *
+from .cached_image import *
@@ -0,0 +1,63 @@
+import customtkinter
+
+from utils.assets import asset_cache
+
+__all__ = (
+    "CachedImage",
+)
+
+
+class CachedImage(customtkinter.CTkImage):
+    """A CTkImage drawn from the on-disk asset cache instead of from decoded PIL images.
+
+    CTkImage keeps the full-size PIL images in memory and resamples them whenever a widget needs a new scaled size.
+    This class takes file paths instead, and asks `utils.assets.asset_cache` for a copy already scaled to each size,
+    so neither launching nor changing the window scaling decodes or resamples the source once the cache is warm.
+
+    Args:
+        light_image: (str): Path of the image shown in light mode. Falls back to `dark_image` if not given.
+        dark_image: (str): Path of the image shown in dark mode. Falls back to `light_image` if not given.
+        size: (tuple): (width, height) before scaling, as for CTkImage.
+        cache: (AssetCache): Defaults to `utils.assets.asset_cache`.
+    """
+
+    def __init__(self, light_image: str = None, dark_image: str = None, size: tuple = (20, 20), cache=None):
+        self._light_path = light_image or dark_image
+        self._dark_path = dark_image or light_image
+        self._cache = asset_cache if cache is None else cache
+        self._photo_images = {}  # (path, scaled size) -> tkinter.PhotoImage
+        super().__init__(size=size)
+
+    def _check_images(self):
+        if self._light_path is None:
+            raise ValueError("CachedImage: no image given, light_image is None and dark_image is None.")
+
+    @property
+    def paths(self) -> tuple:
+        return tuple(dict.fromkeys((self._light_path, self._dark_path)))
+
+    def scaled_size(self, widget_scaling: float) -> tuple:
+        """ Pixel size the image is drawn at for a widget scaling factor """
+        return self._get_scaled_size(widget_scaling)
+
+    def create_scaled_photo_image(self, widget_scaling: float, appearance_mode: str):
+        path = self._light_path if appearance_mode == "light" else self._dark_path
+        key = (path, self._get_scaled_size(widget_scaling))
+        photo_image = self._photo_images.get(key)
+        if photo_image is None:
+            photo_image = self._photo_images[key] = self._cache.photo_image(*key)
+        return photo_image
+
+    def cget(self, attribute_name: str):
+        if attribute_name == "light_image":
+            return self._light_path
+        if attribute_name == "dark_image":
+            return self._dark_path
+        return super().cget(attribute_name)
+
+    def configure(self, **kwargs):
+        if "light_image" in kwargs or "dark_image" in kwargs:
+            self._light_path = kwargs.pop("light_image", self._light_path)
+            self._dark_path = kwargs.pop("dark_image", self._dark_path)
+            self._photo_images.clear()
+        super().configure(**kwargs)
@@ -0,0 +1,71 @@
+import tkinter
+
+import customtkinter
+
+from utils.console_buffer import ConsoleBuffer
+
+__all__ = (
+    "ConsoleTextbox",
+)
+
+
+class ConsoleTextbox(customtkinter.CTkTextbox):
+    """A read-only, bounded console.
+
+    Only the newest `max_lines` lines are kept in the widget; older lines spill to the `ConsoleBuffer` backlog and
+    are loaded back a chunk at a time when the user scrolls to the top. Appends are applied in one
+    normal -> insert -> trim -> disabled cycle however many lines they contain.
+    """
+
+    def __init__(self, master, max_lines: int = None, **kwargs):
+        super().__init__(master, state="disabled", **kwargs)
+        self.buffer = ConsoleBuffer(max_lines)
+        self._loading = False
+
+        # Watch the view so that reaching the top pulls older lines in from the backlog
+        self._textbox.configure(yscrollcommand=self._on_yscroll)
+
+    def append(self, text: str, *tags):
+        """Append one or more lines and scroll to them, unless the user is reading further up.
+
+        Args:
+            text: (str): Lines to append.
+            tags: Text tags to apply to the new lines.
+        """
+        at_bottom = self.yview()[1] >= 1.0
+        trimmed = self.buffer.append(text, trim=at_bottom)
+        lines = text.splitlines()
+        if not lines:
+            return
+
+        self.configure(state="normal")
+        self.insert(tkinter.END, "\n".join(lines) + "\n", tags)
+        if trimmed:
+            self.delete("1.0", f"{trimmed + 1}.0")
+        if at_bottom:
+            self.see(tkinter.END)
+        self.configure(state="disabled")
+
+    def load_older(self):
+        """ Prepend the next chunk of backlog lines, keeping the lines the user is looking at in place """
+        self._loading = False
+        lines = self.buffer.load_older()
+        if not lines:
+            return
+
+        first_visible = self.index("@0,0")
+        self.configure(state="normal")
+        self.insert("1.0", "\n".join(lines) + "\n")
+        self.configure(state="disabled")
+        line, column = first_visible.split(".")
+        self.yview(f"{int(line) + len(lines)}.{column}")
+
+    def _on_yscroll(self, first, last):
+        self._y_scrollbar.set(first, last)
+        if float(first) <= 0.0 and self.buffer.has_older and not self._loading:
+            self._loading = True
+            self.after_idle(self.load_older)
+
+    def destroy(self):
+        self.buffer.close()
+        super().destroy()
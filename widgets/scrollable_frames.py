@@ -85,3 +85,203 @@ class ScrollableLabelButtonFrame(customtkinter.CTkScrollableFrame):
                 self.label_list.remove(label)
                 self.button_list.remove(button)
                 return
+
+
+class VirtualizedItemList(customtkinter.CTkFrame):
+    """A scrollable choice list that only ever creates enough radio buttons to fill its visible height.
+
+    Rows are recycled as the list scrolls, so the widget count stays fixed however many items are added. Items
+    are identified by a key (e.g. a SteamID) rather than by their text; `radiobutton_variable` holds the key of
+    the selected item, and changes arrive in batches through `apply_diff()`.
+
+    With `multiple=True` the rows are check boxes instead, any number of items can be checked, and
+    `get_checked_items()` returns their keys. Checked items stay checked while they scroll out of view.
+    """
+
+    def __init__(self, master, width: int = 300, height: int = 200, row_height: int = 28, label_text: str = None,
+                 command=None, multiple: bool = False, **kwargs):
+        super().__init__(master, width=width, height=height, **kwargs)
+        self.grid_propagate(False)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.command = command
+        self.row_height = row_height
+        self.multiple = multiple
+        self.radiobutton_variable = customtkinter.StringVar()
+        self.radiobutton_variable.trace_add("write", lambda *_: self._render())
+        self._checked = set()  # Keys of the checked items, when `multiple`
+
+        self._items = {}  # key -> text, in display order
+        self._order = []  # position -> key
+        self._position = {}  # key -> position, so a change touches only the items after it
+        self._offset = 0
+
+        body_height = height - 10
+        if label_text:
+            self.label = customtkinter.CTkLabel(self, text=label_text, corner_radius=6,
+                                                fg_color=("gray78", "gray23"))
+            self.label.grid(row=0, column=0, columnspan=2, sticky="ew", padx=5, pady=(5, 0))
+            body_height -= 33
+
+        self._body = customtkinter.CTkFrame(self, height=body_height, fg_color="transparent")
+        self._body.grid(row=1, column=0, sticky="nsew", padx=(5, 0), pady=5)
+        self._scrollbar = customtkinter.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.grid(row=1, column=1, sticky="ns", pady=5)
+
+        self._rows = []
+        self._row_state = []  # What each recycled row currently shows, to skip redundant redraws
+        row_class = customtkinter.CTkCheckBox if multiple else customtkinter.CTkRadioButton
+        for i in range(max(1, body_height // row_height)):
+            row = row_class(self._body, text="", command=lambda i=i: self._on_select(i))
+            self._rows.append(row)
+            self._row_state.append(None)
+
+        for widget in (self, self._body, *self._rows):
+            widget.bind("<MouseWheel>", self._on_mousewheel)
+            widget.bind("<Button-4>", lambda event: self.scroll(-1))
+            widget.bind("<Button-5>", lambda event: self.scroll(1))
+
+        self._render()
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def apply_diff(self, added=(), removed=(), updated=()):
+        """Apply a batch of changes and redraw once.
+
+        Args:
+            added: Iterable of (key, text) pairs to append.
+            removed: Iterable of keys to remove.
+            updated: Iterable of (key, text) pairs whose text changed.
+        """
+        removed = [key for key in removed if self._items.pop(key, None) is not None]
+        if removed:
+            positions = sorted((self._position.pop(key) for key in removed), reverse=True)
+            for position in positions:
+                del self._order[position]
+            for position in range(positions[-1], len(self._order)):  # Only the items after the first one removed
+                self._position[self._order[position]] = position
+            self._checked.difference_update(removed)
+        for key, text in added:
+            if key not in self._items:
+                self._position[key] = len(self._order)
+                self._order.append(key)
+            self._items[key] = text
+        for key, text in updated:
+            if key in self._items:
+                self._items[key] = text
+
+        if self.radiobutton_variable.get() not in self._items:
+            self.radiobutton_variable.set("")  # Renders through the variable trace
+        else:
+            self._render()
+
+    def sync(self, items: dict):
+        """Make the list show exactly `items` (key -> text), redrawing only what differs.
+
+        Args:
+            items: (dict): The complete set of items that should be shown, in display order.
+        """
+        self.apply_diff(added=[(key, text) for key, text in items.items() if key not in self._items],
+                        removed=[key for key in self._items if key not in items],
+                        updated=[(key, text) for key, text in items.items() if self._items.get(key, text) != text])
+
+    def add_item(self, item: str, key: str = None):
+        self.apply_diff(added=((item if key is None else key, item),))
+
+    def remove_item(self, key: str):
+        self.apply_diff(removed=(key,))
+
+    def get_checked_item(self) -> str:
+        """ Key of the selected item, or an empty string if nothing is selected """
+        if self.multiple:
+            return next(iter(self.get_checked_items()), "")
+        return self.radiobutton_variable.get()
+
+    def get_checked_items(self) -> list:
+        """ Keys of every checked item, in display order """
+        if not self.multiple:
+            return [key for key in (self.radiobutton_variable.get(),) if key]
+        return sorted(self._checked, key=self._position.__getitem__)
+
+    def set_checked(self, keys, checked: bool = True):
+        """ Check or uncheck items by key """
+        keys = [key for key in keys if key in self._items]
+        if self.multiple:
+            if checked:
+                self._checked.update(keys)
+            else:
+                self._checked.difference_update(keys)
+            self._render()
+        elif checked:
+            self.radiobutton_variable.set(keys[0] if keys else "")
+        elif self.radiobutton_variable.get() in keys:
+            self.radiobutton_variable.set("")
+
+    def clear_selection(self):
+        self._checked.clear()
+        self.radiobutton_variable.set("")  # Renders through the variable trace
+
+    def scroll(self, rows: int):
+        self._scroll_to(self._offset + rows)
+
+    def _scroll_to(self, offset: int):
+        offset = max(0, min(offset, len(self._order) - len(self._rows)))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(round(float(amount) * len(self._order)))
+        elif action == "scroll":
+            self.scroll(int(amount) * (len(self._rows) if unit == "pages" else 1))
+
+    def _on_mousewheel(self, event):
+        self.scroll(-1 if event.delta > 0 else 1)
+
+    def _on_select(self, row: int):
+        position = self._offset + row
+        if position < len(self._order):
+            key = self._order[position]
+            if self.multiple:
+                self._checked.symmetric_difference_update((key,))
+                self._render()
+            else:
+                self.radiobutton_variable.set(key)
+            if self.command is not None:
+                self.command()
+
+    def _render(self):
+        self._offset = max(0, min(self._offset, len(self._order) - len(self._rows)))
+        selected = self.radiobutton_variable.get()
+        checked = self._checked
+
+        for i, row in enumerate(self._rows):
+            position = self._offset + i
+            if position < len(self._order):
+                key = self._order[position]
+                state = (key, self._items[key], key in checked if self.multiple else key == selected)
+            else:
+                state = None
+
+            if state == self._row_state[i]:
+                continue
+            if state is None:
+                row.place_forget()
+            else:
+                if self._row_state[i] is None:
+                    row.place(x=5, y=i * self.row_height)
+                row.configure(text=state[1])
+                row.select() if state[2] else row.deselect()
+            self._row_state[i] = state
+
+        total = len(self._order)
+        if total > len(self._rows):
+            self._scrollbar.set(self._offset / total, (self._offset + len(self._rows)) / total)
+        else:
+            self._scrollbar.set(0, 1)